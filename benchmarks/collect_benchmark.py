@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from neurosky_mm2_headset.modules.neurosky_data_collector import NeuroSkyDataCollector
+from neurosky_mm2_headset.modules.session_manager import SessionManager
+from neurosky_mm2_headset.modules.thinkgear_simulator import FakeSerialPort, ThinkGearStream
+
+COLLECT_SECONDS = 20.0
+COUNTER_PERIOD = 4000  # Valores distintos del contador (unos 8 s a 512 Hz)
+
+
+class CounterEEG:
+    """Fuente para ThinkGearStream cuyo valor crudo es un contador (1..COUNTER_PERIOD), nunca 0."""
+
+    def __init__(self):
+        self._n = 0
+
+    def next(self, n):
+        values = (self._n + np.arange(n)) % COUNTER_PERIOD + 1
+        self._n += n
+        return values.astype(np.int16), []
+
+
+class DeliveredCounter:
+    """Manejador de raw_value_handlers que cuenta las muestras que entrega la interfaz."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, interface, value):
+        self.count += 1
+
+
+class MemoryStore:
+    """Sustituto en memoria del backend de SessionManager que solo guarda los valores recibidos."""
+
+    def __init__(self):
+        self.values = []
+
+    def start_session(self, user_id, start_time=None):
+        return 1
+
+    def end_session(self, session_id, end_time=None):
+        pass
+
+    def save_data_batch(self, session_id, data_batch):
+        self.values.extend(d['raw_value'] for d in data_batch)
+        return True
+
+
+def counter_port(speed=1.0):
+    stream = ThinkGearStream(seed=0)
+    stream.eeg = CounterEEG()
+    # Una muestra por bloque: como en el puerto real, cada paquete llega en su instante y no en ráfagas
+    return FakeSerialPort(stream, speed=speed, chunk_seconds=1 / stream.fs)
+
+
+def completeness(collected, delivered, name):
+    """
+    Compara las lecturas de un recolector con las muestras que entregó la interfaz. Como la fuente
+    es un contador, cada lectura identifica la muestra de la que salió.
+    """
+    collected = np.asarray(collected, dtype=np.int64)
+    collected = collected[np.argmax(collected != 0):] if np.any(collected != 0) else collected[:0]
+    steps = np.diff(collected) % COUNTER_PERIOD
+    unique = 1 + int(np.count_nonzero(steps)) if collected.size else 0
+    return {
+        'collector': name,
+        'delivered': delivered,
+        'readings': int(collected.size),
+        'unique_samples': unique,
+        'completeness': unique / delivered if delivered else 0.0,
+        'duplicates': int(collected.size - unique),
+        'max_gap_samples': int(steps.max()) if steps.size else 0,
+    }
+
+
+def bench_data_collector(seconds):
+    delivered = DeliveredCounter()
+    fd, csv_path = tempfile.mkstemp(prefix='neurosky_collect_', suffix='.csv')
+    os.close(fd)
+    try:
+        collector = NeuroSkyDataCollector(port=counter_port(), csv_file=csv_path, save_to_csv=True)
+        collector.connect()
+        collector.interface.raw_value_handlers.append(delivered)
+        collector.collect_data()
+        time.sleep(seconds)
+        collector.stop()
+        data = np.loadtxt(csv_path, delimiter=',', skiprows=1, ndmin=2)
+    finally:
+        os.remove(csv_path)
+    return completeness(data[:, 1] if data.size else [], delivered.count, 'NeuroSkyDataCollector')
+
+
+def bench_session_manager(seconds):
+    delivered = DeliveredCounter()
+    store = MemoryStore()
+    manager = SessionManager(store, counter_port())
+    manager.start_new_session('benchmark')
+    if manager.interface is None:
+        return None
+    manager.interface.raw_value_handlers.append(delivered)
+    time.sleep(seconds)
+    manager.end_session()
+    return completeness(store.values, delivered.count, 'SessionManager')
+
+
+def run(seconds=COLLECT_SECONDS):
+    return [r for r in (bench_data_collector(seconds), bench_session_manager(seconds)) if r is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Muestras que los recolectores guardan frente a las que entrega el casco.')
+    parser.add_argument('--seconds', type=float, default=COLLECT_SECONDS)
+    parser.add_argument('--json', default=None, help='Guarda los resultados en este archivo JSON.')
+    args = parser.parse_args()
+
+    results = run(args.seconds)
+    print(f"{'recolector':<22} {'entregadas':>10} {'lecturas':>9} {'únicas':>8} {'completitud':>12} "
+          f"{'duplicadas':>11} {'hueco máx':>10}")
+    for r in results:
+        print(f"{r['collector']:<22} {r['delivered']:>10} {r['readings']:>9} {r['unique_samples']:>8} "
+              f"{100 * r['completeness']:>11.1f}% {r['duplicates']:>11} {r['max_gap_samples']:>10}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import time
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.thinkgear_simulator import FakeSerialPort, ReplayStream, ThinkGearStream
+
+STREAM_SECONDS = 120.0
+REPEATS = 3
+
+
+def make_capture(seconds=STREAM_SECONDS, seed=0):
+    """Flujo ThinkGear sintético con el mismo formato que una captura del dongle."""
+    stream = ThinkGearStream(seed=seed)
+    data, _ = stream.next_chunk(int(seconds * stream.fs))
+    return data
+
+
+def split_payloads(data):
+    """Payloads de los paquetes con checksum válido de un flujo de bytes, como los entrega el listener."""
+    payloads = []
+    i = 0
+    end = len(data) - 3
+    while i < end:
+        if data[i] != 0xAA or data[i + 1] != 0xAA:
+            i += 1
+            continue
+        length = data[i + 2]
+        payload = data[i + 3:i + 3 + length]
+        if length < 170 and len(payload) == length and i + 3 + length < len(data) \
+                and data[i + 3 + length] == ~sum(payload) & 0xFF:
+            payloads.append(payload)
+            i += 4 + length
+        else:
+            i += 1
+    return payloads
+
+
+def bench_parse_payload(payloads, repeats=REPEATS):
+    """Solo SerialListener.parse_payload, sin E/S, con un manejador de señal cruda vacío."""
+    interface = NeuroSkyInterface(None, open_serial=False)
+    interface.raw_value_handlers.append(lambda interface, value: None)
+    listener = NeuroSkyInterface.SerialListener(interface)
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for payload in payloads:
+            listener.parse_payload(payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'benchmark': 'parse_payload', 'packets': len(payloads), 'seconds': best,
+            'packets_per_second': len(payloads) / best}
+
+
+def bench_listener(data, repeats=REPEATS):
+    """SerialListener.run completo (lectura byte a byte, checksum y parse_payload) sobre FakeSerialPort."""
+    best = None
+    decoded = 0
+    for _ in range(repeats):
+        interface = NeuroSkyInterface(FakeSerialPort(ReplayStream(data), speed=None), open_serial=False)
+        counter = [0]
+
+        def count(interface, value):
+            counter[0] += 1
+
+        interface.raw_value_handlers.append(count)
+        start = time.perf_counter()
+        interface.serial_open()
+        interface.listener.join()
+        elapsed = time.perf_counter() - start
+        decoded = counter[0]
+        best = elapsed if best is None else min(best, elapsed)
+    return {'benchmark': 'listener', 'bytes': len(data), 'samples': decoded, 'seconds': best,
+            'samples_per_second': decoded / best, 'realtime_factor': decoded / 512.0 / best}
+
+
+def run(seconds=STREAM_SECONDS, capture_file=None, repeats=REPEATS):
+    if capture_file:
+        with open(capture_file, 'rb') as f:
+            data = f.read()
+    else:
+        data = make_capture(seconds)
+    return [bench_parse_payload(split_payloads(data), repeats), bench_listener(data, repeats)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento de la decodificación de paquetes ThinkGear.')
+    parser.add_argument('--seconds', type=float, default=STREAM_SECONDS, help='Duración del flujo sintético (s).')
+    parser.add_argument('--capture', default=None,
+                        help='Bytes grabados del dongle (por ejemplo cat /dev/ttyUSB0 > captura.bin).')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--json', default=None, help='Guarda los resultados en este archivo JSON.')
+    args = parser.parse_args()
+
+    results = run(args.seconds, args.capture, args.repeats)
+    parse, listener = results
+    print(f"parse_payload: {parse['packets_per_second']:.0f} paquetes/s ({parse['packets']} paquetes)")
+    print(f"listener: {listener['samples_per_second']:.0f} muestras/s, {listener['realtime_factor']:.1f}x tiempo real")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import matplotlib
+matplotlib.use('Agg')  # Sin pantalla: todo se dibuja fuera de la ventana
+
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+import matplotlib.pyplot as plt
+from neurosky_mm2_headset.modules.live_plots import animate
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays
+from neurosky_mm2_headset.modules.session_manager import SessionManager, SAMPLE_ATTEMPT_FREQ
+
+LIVE_MODES = ('raw', 'frequency', 'spectrogram')
+VIEWER_MODES = ('session_psd', 'session_spectrogram', 'psd_sliders', 'spectrogram_sliders')
+WINDOW_SECONDS = (2.0, 10.0, 60.0)  # Ventanas de las gráficas en vivo y de los sliders
+LIVE_FRAMES = 200
+FRAME_SECONDS = 0.1  # [s] Muestras nuevas por cuadro en vivo (igual que LIVE_FRAME_INTERVAL)
+VIEWER_FRAMES = 30  # Movimientos de slider por vista
+SESSION_FRAMES = 3  # Figuras completas por vista de sesión
+MEMORY_FRAMES = 5  # Cuadros repetidos con tracemalloc para el pico de memoria
+SESSION_MINUTES = 20.0
+SAMPLE_FREQ = SAMPLE_ATTEMPT_FREQ
+
+
+class ReplayInterface:
+    """Sustituye a NeuroSkyInterface en las vistas en vivo: solo expone poor_signal."""
+    poor_signal = 0
+
+
+def synthetic_eeg(seconds, fs=SAMPLE_FREQ, seed=0):
+    """Señal cruda sintética: alfa y beta, ruido 1/f y algunos parpadeos."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    t = np.arange(n) / fs
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    spectrum[1:] /= np.sqrt(np.arange(1, spectrum.size))
+    noise = np.fft.irfft(spectrum, n)
+    signal = 80 * noise / noise.std() + 40 * np.sin(2 * np.pi * 10 * t) + 15 * np.sin(2 * np.pi * 20 * t)
+    for start in rng.integers(0, max(1, n - int(0.3 * fs)), size=max(1, int(seconds / 10))):
+        signal[start:start + int(0.3 * fs)] += 400 * np.hanning(int(0.3 * fs))
+    return np.clip(np.round(signal), -2048, 2047)
+
+
+def load_session_csv(path):
+    """Sesión exportada con SessionManager.export_session_to_csv (timestamp, raw_value)."""
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    return SessionArrays(data[:, 0], data[:, 1])
+
+
+def frame_stats(mode, window, frame_times, peak_bytes, drawn):
+    frame_times = np.array(frame_times) * 1000
+    total = frame_times.sum() / 1000
+    return {
+        'mode': mode,
+        'window_seconds': window,
+        'frames': len(frame_times),
+        'drawn_frames': drawn,
+        'frames_per_second': len(frame_times) / total if total > 0 else 0.0,
+        'frame_p50_ms': float(np.percentile(frame_times, 50)),
+        'frame_p90_ms': float(np.percentile(frame_times, 90)),
+        'frame_p99_ms': float(np.percentile(frame_times, 99)),
+        'frame_max_ms': float(frame_times.max()),
+        'peak_memory_mb': peak_bytes / 2 ** 20,
+    }
+
+
+def live_frames(mode, window, raw_values, frames, frame_seconds=FRAME_SECONDS):
+    """
+    Cuadros de SessionManager.live_plot alimentados con raw_values como si llegaran en vivo. Cada
+    cuadro pasa por la animación real (animate, FuncAnimation con blitting), igual que en pantalla.
+    :return: (duración de cada cuadro [s], cuadros que dibujaron algo)
+    """
+    manager = SessionManager(None, None)
+    manager.interface = ReplayInterface()
+    manager.set_plot_type(mode)
+    block = int(frame_seconds * SAMPLE_FREQ)
+
+    fig, update = manager.live_plot(window_seconds=window)
+    returned = []
+
+    def recorded_update(frame):
+        artists = update(frame)
+        returned.append(bool(artists))
+        return artists
+
+    animation = animate(fig, recorded_update)
+    fig.canvas.draw()
+    animation._init_draw()
+    # Se llena la ventana antes de medir para que todos los cuadros tengan datos completos
+    warmup = int(window * SAMPLE_FREQ)
+    for start in range(0, warmup, block * 10):
+        manager._new_samples.extend(raw_values[start:min(warmup, start + block * 10)].tolist())
+        animation._draw_next_frame(-1, blit=True)
+
+    times = []
+    returned.clear()
+    position = warmup
+    for frame in range(frames):
+        chunk = np.take(raw_values, np.arange(position, position + block), mode='wrap')
+        position += block
+        manager._new_samples.extend(chunk.tolist())
+        start = time.perf_counter()
+        animation._draw_next_frame(frame, blit=True)
+        times.append(time.perf_counter() - start)
+    animation.pause()
+    plt.close(fig)
+    return times, sum(returned)
+
+
+def viewer_frames(mode, window, session, frames):
+    """
+    Vistas de una sesión. Las de sliders se crean una vez y cada cuadro mueve el slider de
+    posición (con el intervalo igual a la ventana) y redibuja la figura; en las demás cada
+    cuadro es la creación y el dibujo completo de la figura.
+    :return: (duración de cada cuadro [s], cuadros dibujados), o None si la vista no se pudo crear.
+    """
+    manager = SessionManager(None, None)
+    times = []
+    if mode in ('session_psd', 'session_spectrogram'):
+        plot = manager.plot_power_spectrum if mode == 'session_psd' else manager.plot_spectrogram
+        for _ in range(frames):
+            start = time.perf_counter()
+            fig = plot(session, show=False)
+            if fig is None:
+                return None
+            fig.canvas.draw()
+            times.append(time.perf_counter() - start)
+            plt.close(fig)
+        return times, len(times)
+
+    plot = manager.plot_power_spectrum_with_sliders if mode == 'psd_sliders' else manager.plot_spectrogram_with_sliders
+    result = plot(session, show=False)
+    if result is None:
+        return None
+    fig, slider_interval, slider_pos = result
+    slider_interval.set_val(max(slider_interval.valmin, window / 60))
+    fig.canvas.draw()
+    for position in np.linspace(slider_pos.valmin, slider_pos.valmax, frames):
+        start = time.perf_counter()
+        slider_pos.set_val(position)
+        fig.canvas.draw()
+        times.append(time.perf_counter() - start)
+    plt.close(fig)
+    return times, len(times)
+
+
+def measure(mode, window, run_frames, frames):
+    """
+    Mide los tiempos sin tracemalloc (que los distorsiona) y después repite unos pocos cuadros
+    con tracemalloc para obtener el pico de memoria de la vista.
+    """
+    result = run_frames(frames)
+    if result is None:
+        return None
+    times, drawn = result
+    tracemalloc.start()
+    run_frames(min(frames, MEMORY_FRAMES))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return frame_stats(mode, window, times, peak, drawn)
+
+
+def run(modes=LIVE_MODES + VIEWER_MODES, windows=WINDOW_SECONDS, session_minutes=SESSION_MINUTES,
+        session_file=None, frames=LIVE_FRAMES):
+    if session_file:
+        session = load_session_csv(session_file)
+    else:
+        raw_values = synthetic_eeg(session_minutes * 60)
+        session = SessionArrays(np.arange(raw_values.size) / SAMPLE_FREQ, raw_values)
+    raw_values = np.asarray(session.raw_values, dtype=np.float64)
+
+    results = []
+    for mode in modes:
+        if mode in LIVE_MODES:
+            for window in windows:
+                results.append(measure(mode, window, lambda n: live_frames(mode, window, raw_values, n), frames))
+        elif mode in ('session_psd', 'session_spectrogram'):
+            results.append(measure(mode, len(raw_values) / SAMPLE_FREQ,
+                                   lambda n: viewer_frames(mode, None, session, n), SESSION_FRAMES))
+        else:
+            for window in windows:
+                results.append(measure(mode, window, lambda n: viewer_frames(mode, window, session, n),
+                                       VIEWER_FRAMES))
+    # Las vistas que no se pudieron crear (sesión demasiado corta) no tienen resultado
+    return [r for r in results if r is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento del dibujo de las gráficas sin pantalla (Agg).')
+    parser.add_argument('--modes', nargs='+', choices=LIVE_MODES + VIEWER_MODES, default=list(LIVE_MODES + VIEWER_MODES))
+    parser.add_argument('--windows', nargs='+', type=float, default=list(WINDOW_SECONDS),
+                        help='Ventanas visibles (s) de las gráficas en vivo y de los sliders.')
+    parser.add_argument('--frames', type=int, default=LIVE_FRAMES, help='Cuadros por gráfica en vivo.')
+    parser.add_argument('--session-minutes', type=float, default=SESSION_MINUTES,
+                        help='Duración de la sesión sintética (min).')
+    parser.add_argument('--session-file', default=None,
+                        help='CSV exportado con export_session_to_csv para reproducir una sesión real.')
+    parser.add_argument('--json', default=None, help='Guarda los resultados en este archivo JSON.')
+    args = parser.parse_args()
+
+    results = run(args.modes, args.windows, args.session_minutes, args.session_file, args.frames)
+    print(f"{'modo':<20} {'ventana (s)':>11} {'cuadros/s':>10} {'p50 (ms)':>9} {'p90 (ms)':>9} "
+          f"{'p99 (ms)':>9} {'máx (ms)':>9} {'memoria (MB)':>13}")
+    for r in results:
+        print(f"{r['mode']:<20} {r['window_seconds']:>11.1f} {r['frames_per_second']:>10.1f} "
+              f"{r['frame_p50_ms']:>9.2f} {r['frame_p90_ms']:>9.2f} {r['frame_p99_ms']:>9.2f} "
+              f"{r['frame_max_ms']:>9.2f} {r['peak_memory_mb']:>13.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import scipy
+
+SUITES = ('decode', 'collect', 'storage', 'spectral', 'render', 'stream')
+DEFAULT_SUITES = ('decode', 'collect', 'storage', 'spectral')
+DEFAULT_OUTPUT = 'benchmark_results.json'
+TOLERANCE = 0.10  # Cambio relativo a partir del cual una métrica cuenta como regresión
+
+# Por suite: campos que identifican cada fila y métricas comparadas (1: mayor es mejor, -1: menor es mejor)
+METRICS = {
+    'decode': (('benchmark',), {'packets_per_second': 1, 'samples_per_second': 1}),
+    'collect': (('collector',), {'completeness': 1}),
+    'storage': (('backend',), {'write_samples_per_second': 1, 'read_samples_per_second': 1,
+                               'batch_latency_p99_ms': -1}),
+    'spectral': (('function', 'duration'), {'samples_per_second': 1}),
+    'render': (('mode', 'window_seconds'), {'frame_p50_ms': -1, 'frame_p99_ms': -1, 'peak_memory_mb': -1}),
+    'stream': (('clients',), {'acquisition_rate': 1, 'delivery_min': 1, 'handler_p99_us': -1}),
+}
+
+# Tamaño de las cargas de trabajo: completo y rápido (--quick)
+CONFIGS = {
+    'full': {'decode_seconds': 120, 'collect_seconds': 20, 'storage_seconds': 600,
+             'spectral_durations': ['1min', '1h', '8h'], 'render_frames': 200, 'stream_seconds': 20},
+    'quick': {'decode_seconds': 30, 'collect_seconds': 8, 'storage_seconds': 120,
+              'spectral_durations': ['1min', '1h'], 'render_frames': 50, 'stream_seconds': 5},
+}
+
+
+def run_suite(name, config, mongo_uri=None, capture_file=None):
+    """Ejecuta una suite y devuelve su lista de resultados. Los módulos se importan solo si se usan."""
+    if name == 'decode':
+        from neurosky_mm2_headset.benchmarks import decode_benchmark
+        return decode_benchmark.run(config['decode_seconds'], capture_file)
+    if name == 'collect':
+        from neurosky_mm2_headset.benchmarks import collect_benchmark
+        return collect_benchmark.run(config['collect_seconds'])
+    if name == 'storage':
+        from neurosky_mm2_headset.benchmarks import storage_benchmark
+        return storage_benchmark.run(config['storage_seconds'], mongo_uri)
+    if name == 'spectral':
+        from neurosky_mm2_headset.benchmarks import spectral_benchmark
+        return spectral_benchmark.run(config['spectral_durations'])
+    if name == 'render':
+        from neurosky_mm2_headset.benchmarks import render_benchmark
+        return render_benchmark.run(frames=config['render_frames'])
+    if name == 'stream':
+        from neurosky_mm2_headset.benchmarks import stream_server_load
+        result = stream_server_load.run(seconds=config['stream_seconds'])
+        result.pop('server')
+        return [result]
+    raise ValueError(f'Suite desconocida: {name}')
+
+
+def environment():
+    """Versiones y máquina, para saber con qué se compara una línea base."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'commit': commit,
+    }
+
+
+def run(suites=DEFAULT_SUITES, quick=False, mongo_uri=None, capture_file=None):
+    config = CONFIGS['quick' if quick else 'full']
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': environment(),
+        'config': dict(config, quick=quick, mongo=bool(mongo_uri), capture=capture_file),
+        'results': {},
+        'errors': {},
+        'durations': {},
+    }
+    for name in suites:
+        print(f'Ejecutando {name}...')
+        start = time.perf_counter()
+        try:
+            report['results'][name] = run_suite(name, config, mongo_uri, capture_file)
+        except Exception as e:
+            print(f'Error en la suite {name}: {e}')
+            report['errors'][name] = str(e)
+        report['durations'][name] = time.perf_counter() - start
+    return report
+
+
+def _row_key(row, fields):
+    return tuple(row.get(field) for field in fields)
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    Compara cada métrica con la de la línea base.
+    :return: Lista de {'suite', 'key', 'metric', 'baseline', 'current', 'change', 'status'} donde change
+             es el cambio relativo con signo a favor (positivo es mejor) y status es 'regression',
+             'improvement' u 'ok'.
+    """
+    comparisons = []
+    for suite, rows in report['results'].items():
+        if suite not in METRICS or suite not in baseline.get('results', {}):
+            continue
+        fields, metrics = METRICS[suite]
+        baseline_rows = {_row_key(row, fields): row for row in baseline['results'][suite]}
+        for row in rows:
+            key = _row_key(row, fields)
+            base = baseline_rows.get(key)
+            if base is None:
+                continue
+            for metric, direction in metrics.items():
+                if metric not in row or metric not in base or not base[metric]:
+                    continue
+                change = direction * (row[metric] - base[metric]) / abs(base[metric])
+                status = 'regression' if change < -tolerance else 'improvement' if change > tolerance else 'ok'
+                comparisons.append({'suite': suite, 'key': key, 'metric': metric, 'baseline': base[metric],
+                                    'current': row[metric], 'change': change, 'status': status})
+    return comparisons
+
+
+def print_report(report):
+    for suite, rows in report['results'].items():
+        fields, metrics = METRICS[suite]
+        print(f'\n[{suite}] ({report["durations"][suite]:.1f} s)')
+        for row in rows:
+            values = ', '.join(f'{metric}={row[metric]:.4g}' for metric in metrics if metric in row)
+            print(f"  {' '.join(str(v) for v in _row_key(row, fields)):<32} {values}")
+
+
+def print_comparison(comparisons):
+    print(f"\n{'suite':<9} {'caso':<30} {'métrica':<26} {'base':>12} {'actual':>12} {'cambio':>8}")
+    for c in comparisons:
+        mark = {'regression': '  REGRESIÓN', 'improvement': '  mejora'}.get(c['status'], '')
+        print(f"{c['suite']:<9} {' '.join(str(v) for v in c['key']):<30} {c['metric']:<26} {c['baseline']:>12.4g} "
+              f"{c['current']:>12.4g} {100 * c['change']:>+7.1f}%{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ejecuta los benchmarks y los compara con una línea base.')
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(DEFAULT_SUITES))
+    parser.add_argument('--quick', action='store_true', help='Cargas de trabajo reducidas.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Archivo JSON de resultados.')
+    parser.add_argument('--baseline', default=None, help='Resultados anteriores (JSON) con los que comparar.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Cambio relativo que cuenta como regresión (0.1 = 10 %%).')
+    parser.add_argument('--mongo-uri', default=None, help='MongoDB local para medir MongoDBManager.save_data_batch.')
+    parser.add_argument('--capture', default=None, help='Bytes grabados del dongle para la suite decode.')
+    args = parser.parse_args()
+
+    report = run(args.suites, args.quick, args.mongo_uri, args.capture)
+    print_report(report)
+
+    regressions = []
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'No se pudo leer la línea base {args.baseline}: {e}')
+            baseline = None
+        if baseline is not None:
+            if baseline.get('config') != report['config']:
+                print('Aviso: la línea base se midió con otra configuración; la comparación puede no ser válida.')
+            if baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+                print('Aviso: la línea base se midió en otra arquitectura.')
+            comparisons = compare(report, baseline, args.tolerance)
+            report['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance, 'metrics': comparisons}
+            print_comparison(comparisons)
+            regressions = [c for c in comparisons if c['status'] == 'regression']
+            print(f'\n{len(regressions)} regresiones de {len(comparisons)} métricas comparadas.')
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f'Resultados guardados en {args.output}')
+    if regressions or report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+import numpy as np
+from neurosky_mm2_headset.modules.band_power import epoch_band_powers
+from neurosky_mm2_headset.modules.resampling import resample_session
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays
+from neurosky_mm2_headset.modules.session_spectral import SegmentedPSDCache, pooled_spectrogram, welch_psd
+from neurosky_mm2_headset.modules.thinkgear_simulator import SyntheticEEG
+
+DURATIONS = {'1min': 60, '1h': 3600, '8h': 8 * 3600}
+REPEATS = {'1min': 20, '1h': 3, '8h': 1}  # Repeticiones por duración; se toma la más rápida
+FUNCTIONS = ('welch_psd', 'pooled_spectrogram', 'epoch_band_powers', 'psd_cache', 'resample_session')
+SAMPLE_FREQ = 512.0
+NPERSEG = 512
+NOVERLAP = 256
+PSD_QUERIES = 100  # Intervalos al azar consultados en la caché de PSD
+GENERATE_BLOCK_SECONDS = 600  # La señal sintética se genera por bloques para no duplicar la memoria
+
+
+def synthetic_session(seconds, fs=SAMPLE_FREQ, seed=0):
+    """Sesión sintética: señal de SyntheticEEG y timestamps con la fluctuación de la lectura por sondeo."""
+    eeg = SyntheticEEG(int(fs), seed=seed)
+    n = int(seconds * fs)
+    raw_values = np.empty(n, dtype=np.int16)
+    block = int(GENERATE_BLOCK_SECONDS * fs)
+    for start in range(0, n, block):
+        raw_values[start:start + block], _ = eeg.next(min(block, n - start))
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.arange(n) / fs + rng.uniform(0, 0.2 / fs, n)
+    return SessionArrays(timestamps, raw_values)
+
+
+def run_function(name, session, fs=SAMPLE_FREQ):
+    raw_values = session.raw_values
+    if name == 'welch_psd':
+        welch_psd(raw_values, fs)
+    elif name == 'pooled_spectrogram':
+        pooled_spectrogram(raw_values, fs, NPERSEG, NOVERLAP)
+    elif name == 'epoch_band_powers':
+        epoch_band_powers(raw_values, fs)
+    elif name == 'psd_cache':
+        cache = SegmentedPSDCache(raw_values, fs)
+        rng = np.random.default_rng(0)
+        for _ in range(PSD_QUERIES):
+            start, end = np.sort(rng.integers(0, len(raw_values), 2))
+            cache.psd(start, end)
+    elif name == 'resample_session':
+        resample_session(session, fs)
+    else:
+        raise ValueError(f'Función desconocida: {name}')
+
+
+def run(durations=tuple(DURATIONS), functions=FUNCTIONS, repeats=None):
+    """:param repeats: Repeticiones de cada medición (por defecto REPEATS según la duración)."""
+    results = []
+    for label in durations:
+        seconds = DURATIONS[label]
+        session = synthetic_session(seconds)
+        for name in functions:
+            times = []
+            for _ in range(repeats or REPEATS[label]):
+                start = time.perf_counter()
+                run_function(name, session)
+                times.append(time.perf_counter() - start)
+            best = min(times)
+            results.append({
+                'function': name,
+                'duration': label,
+                'samples': len(session.raw_values),
+                'seconds': best,
+                'samples_per_second': len(session.raw_values) / best,
+            })
+        del session
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento de las funciones espectrales con sesiones de 1 min, 1 h y 8 h.')
+    parser.add_argument('--durations', nargs='+', choices=list(DURATIONS), default=list(DURATIONS))
+    parser.add_argument('--functions', nargs='+', choices=FUNCTIONS, default=list(FUNCTIONS))
+    parser.add_argument('--repeats', type=int, default=None, help='Repeticiones (por defecto según la duración).')
+    parser.add_argument('--json', default=None, help='Guarda los resultados en este archivo JSON.')
+    args = parser.parse_args()
+
+    results = run(args.durations, args.functions, args.repeats)
+    print(f"{'función':<20} {'duración':>9} {'tiempo (s)':>11} {'muestras/s':>14}")
+    for r in results:
+        print(f"{r['function']:<20} {r['duration']:>9} {r['seconds']:>11.3f} {r['samples_per_second']:>14.0f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
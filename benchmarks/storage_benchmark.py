@@ -0,0 +1,93 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from neurosky_mm2_headset.modules.storage_backends import SQLiteStorageBackend, FileStorageBackend
+
+SESSION_SECONDS = 600
+SAMPLE_FREQ = 512.0
+BATCH_SIZE = 1000  # Mismo tamaño de lote que SessionManager.collect_data
+
+
+def make_workload(seconds=SESSION_SECONDS, fs=SAMPLE_FREQ, batch_size=BATCH_SIZE, seed=0):
+    """Lotes de muestras {'timestamp', 'raw_value'} como los que genera SessionManager."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    timestamps = 1.7e9 + np.arange(n) / fs
+    raw_values = rng.integers(-2048, 2048, n)
+    return [[{'timestamp': t, 'raw_value': v} for t, v in zip(timestamps[i:i + batch_size].tolist(),
+                                                              raw_values[i:i + batch_size].tolist())]
+            for i in range(0, n, batch_size)]
+
+
+def run_backend(name, backend, batches):
+    """Escribe la sesión lote a lote, la lee completa y devuelve las métricas de rendimiento."""
+    samples = sum(len(b) for b in batches)
+    session_id = backend.start_session('benchmark')
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches:
+        t0 = time.perf_counter()
+        backend.save_data_batch(session_id, batch)
+        latencies.append(time.perf_counter() - t0)
+    write_seconds = time.perf_counter() - start
+    backend.end_session(session_id)
+
+    start = time.perf_counter()
+    arrays = backend.get_session_arrays(session_id)
+    read_seconds = time.perf_counter() - start
+    read_samples = len(arrays.raw_values) if arrays is not None else 0
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'backend': name,
+        'samples': samples,
+        'write_samples_per_second': samples / write_seconds,
+        'batch_latency_p50_ms': float(np.percentile(latencies, 50)),
+        'batch_latency_p99_ms': float(np.percentile(latencies, 99)),
+        'read_samples_per_second': read_samples / read_seconds if read_seconds > 0 else 0.0,
+        'read_complete': read_samples == samples,
+    }
+
+
+def run(seconds=SESSION_SECONDS, mongo_uri=None):
+    batches = make_workload(seconds)
+    workdir = tempfile.mkdtemp(prefix='neurosky_storage_')
+    results = []
+    try:
+        sqlite_backend = SQLiteStorageBackend(os.path.join(workdir, 'sessions.db'))
+        results.append(run_backend('sqlite', sqlite_backend, batches))
+        sqlite_backend.close()
+        results.append(run_backend('files', FileStorageBackend(os.path.join(workdir, 'files')), batches))
+        if mongo_uri:
+            from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+            mongo_backend = MongoDBManager(mongo_uri, db_name='neurosky_benchmark')
+            if mongo_backend.is_available():
+                results.append(run_backend('mongo', mongo_backend, batches))
+                mongo_backend.client.drop_database('neurosky_benchmark')
+                mongo_backend.close()
+            else:
+                print('MongoDB no está disponible; se omite del benchmark.')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento de escritura y lectura de los backends de sesiones.')
+    parser.add_argument('--seconds', type=float, default=SESSION_SECONDS, help='Duración de la sesión simulada (s).')
+    parser.add_argument('--mongo-uri', default=None, help='URI de MongoDB para incluirlo en la comparación.')
+    args = parser.parse_args()
+
+    results = run(args.seconds, args.mongo_uri)
+    print(f"{'backend':<8} {'escritura (m/s)':>16} {'p50 lote (ms)':>14} {'p99 lote (ms)':>14} {'lectura (m/s)':>14}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['write_samples_per_second']:>16.0f} {r['batch_latency_p50_ms']:>14.3f} "
+              f"{r['batch_latency_p99_ms']:>14.3f} {r['read_samples_per_second']:>14.0f}"
+              f"{'' if r['read_complete'] else '  (lectura incompleta)'}")
+
+
+if __name__ == '__main__':
+    main()
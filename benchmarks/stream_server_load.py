@@ -0,0 +1,143 @@
+import argparse
+import json
+import socket
+import threading
+import time
+import numpy as np
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.stream_server import (CLIENT_BUFFER_BYTES, DROP_CLIENT, DROP_FRAMES, STREAM_SAMPLE_FREQ, StreamServer,
+                                                        decode_payload, read_frames)
+
+CLIENTS = 50
+SLOW_CLIENTS = 2
+DURATION_SECONDS = 20.0
+MIN_DELIVERY = 0.999  # Fracción mínima de muestras que debe recibir cada cliente normal
+MIN_ACQUISITION_RATE = 0.99  # Fracción mínima de la frecuencia nominal que debe mantener la adquisición
+
+
+def produce(interface, seconds, fs=STREAM_SAMPLE_FREQ):
+    """
+    Emula al hilo del serial: llama a los manejadores como parse_payload, a fs Hz para la señal
+    cruda y a 1 Hz para eSense y bandas.
+    :return: (muestras producidas, duración real [s], tiempo en manejadores de cada muestra [s])
+    """
+    rng = np.random.default_rng(0)
+    raw_values = rng.integers(-2048, 2048, int(seconds * fs)).tolist()
+    handler_times = np.empty(len(raw_values))
+    start = time.perf_counter()
+    for i, value in enumerate(raw_values):
+        target = start + i / fs
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t0 = time.perf_counter()
+        interface.raw_value = value
+        for handler in interface.raw_value_handlers:
+            handler(interface, value)
+        if i % int(fs) == 0:
+            for handler in interface.attention_handlers:
+                handler(interface, i % 100)
+            for handler in interface.meditation_handlers:
+                handler(interface, (i // 2) % 100)
+            for handler in interface.waves_handlers:
+                handler(interface, {band: i + k for k, band in enumerate(NeuroSkyInterface.ASIC_BANDS)})
+        handler_times[i] = time.perf_counter() - t0
+    return len(raw_values), time.perf_counter() - start, handler_times
+
+
+def consume(address, counts, index, ready):
+    """Cliente normal: lee y decodifica todas las tramas y cuenta las muestras crudas."""
+    sock = socket.create_connection(address)
+    ready.release()
+    try:
+        for frame_type, payload in read_frames(sock):
+            kind, _, data = decode_payload(frame_type, payload)
+            if kind == 'raw':
+                counts[index] += len(data[0])
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def slow_client(address):
+    """Cliente que se conecta y nunca lee: su búfer en el servidor se llena."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(address)
+    return sock
+
+
+def run(clients=CLIENTS, slow_clients=SLOW_CLIENTS, seconds=DURATION_SECONDS, drop_policy=DROP_FRAMES,
+        client_buffer=CLIENT_BUFFER_BYTES):
+    interface = NeuroSkyInterface(None, open_serial=False)
+    interface.poor_signal = 0
+    server = StreamServer(interface, port=0, client_buffer=client_buffer, drop_policy=drop_policy)
+    server.start()
+
+    counts = [0] * clients
+    ready = threading.Semaphore(0)
+    threads = [threading.Thread(target=consume, args=(server.address, counts, i, ready), daemon=True)
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        ready.acquire()
+    slow = [slow_client(server.address) for _ in range(slow_clients)]
+    while server.stats['clients'] < clients + slow_clients:
+        time.sleep(0.01)
+
+    produced, elapsed, handler_times = produce(interface, seconds)
+    # Muestras en bloques completos; el último bloque incompleto no se envía
+    expected = produced // server.raw_block * server.raw_block
+    time.sleep(1.0)
+    stats = dict(server.stats)
+    server.stop()
+    for thread in threads:
+        thread.join(timeout=5)
+    for sock in slow:
+        sock.close()
+
+    received = np.array(counts)
+    handler_us = handler_times * 1e6
+    return {
+        'clients': clients,
+        'slow_clients': slow_clients,
+        'samples': produced,
+        'acquisition_rate': produced / elapsed / STREAM_SAMPLE_FREQ,
+        'handler_p50_us': float(np.percentile(handler_us, 50)),
+        'handler_p99_us': float(np.percentile(handler_us, 99)),
+        'handler_max_us': float(handler_us.max()),
+        'delivery_min': float(received.min() / expected) if expected else 0.0,
+        'delivery_mean': float(received.mean() / expected) if expected else 0.0,
+        'server': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del servidor de streaming con muchos clientes.')
+    parser.add_argument('--clients', type=int, default=CLIENTS)
+    parser.add_argument('--slow-clients', type=int, default=SLOW_CLIENTS)
+    parser.add_argument('--seconds', type=float, default=DURATION_SECONDS)
+    parser.add_argument('--drop-policy', choices=(DROP_FRAMES, DROP_CLIENT), default=DROP_FRAMES)
+    parser.add_argument('--client-buffer', type=int, default=CLIENT_BUFFER_BYTES,
+                        help='Búfer de envío por cliente (bytes); con uno pequeño se prueba la política con clientes lentos.')
+    parser.add_argument('--json', default=None, help='Guarda el resultado en este archivo JSON.')
+    args = parser.parse_args()
+
+    r = run(args.clients, args.slow_clients, args.seconds, args.drop_policy, args.client_buffer)
+    print(f"Clientes: {r['clients']} normales y {r['slow_clients']} lentos, {r['samples']} muestras")
+    print(f"Adquisición: {100 * r['acquisition_rate']:.2f} % de {STREAM_SAMPLE_FREQ:.0f} Hz, manejadores "
+          f"p50 {r['handler_p50_us']:.1f} µs, p99 {r['handler_p99_us']:.1f} µs, máx {r['handler_max_us']:.1f} µs")
+    print(f"Entrega a clientes normales: mínimo {100 * r['delivery_min']:.2f} %, media {100 * r['delivery_mean']:.2f} %")
+    print(f"Servidor: {r['server']['frames']} tramas, {r['server']['bytes_sent'] / 2 ** 20:.1f} MB enviados, "
+          f"{r['server']['dropped_frames']} tramas descartadas, {r['server']['dropped_clients']} clientes desconectados")
+    ok = r['delivery_min'] >= MIN_DELIVERY and r['acquisition_rate'] >= MIN_ACQUISITION_RATE
+    print('OK' if ok else 'FALLA: la adquisición o la entrega no alcanzaron el mínimo')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
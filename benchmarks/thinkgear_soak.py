@@ -0,0 +1,85 @@
+import argparse
+import json
+import time
+import numpy as np
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.thinkgear_simulator import SIM_SAMPLE_FREQ, FakeSerialPort, ThinkGearStream
+
+HEADSETS = 24
+SPEED = 2.0  # Veces el tiempo real
+DURATION_SECONDS = 60.0  # Segundos de señal por casco
+CORRUPTION_RATE = 0.001
+
+
+def run(headsets=HEADSETS, speed=SPEED, seconds=DURATION_SECONDS, corruption_rate=CORRUPTION_RATE):
+    """
+    Conecta headsets NeuroSkyInterface a cascos simulados en el mismo proceso y los deja leer
+    seconds segundos de señal a speed veces el tiempo real.
+    :return: Lista de resultados por casco.
+    """
+    interfaces = []
+    for i in range(headsets):
+        stream = ThinkGearStream(seed=i, corruption_rate=corruption_rate)
+        interface = NeuroSkyInterface(FakeSerialPort(stream, speed=speed or None, duration=seconds),
+                                      open_serial=False)
+        interface.raw_count = 0
+        interface.esense_count = 0
+
+        def count_raw(interface, value):
+            interface.raw_count += 1
+
+        def count_esense(interface, value):
+            interface.esense_count += 1
+
+        interface.raw_value_handlers.append(count_raw)
+        interface.attention_handlers.append(count_esense)
+        interfaces.append((interface, stream))
+
+    start = time.perf_counter()
+    for interface, _ in interfaces:
+        interface.serial_open()
+    for interface, _ in interfaces:
+        interface.listener.join()
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for i, (interface, stream) in enumerate(interfaces):
+        results.append({
+            'headset': i,
+            'samples': stream.samples,
+            'decoded': interface.raw_count,
+            # Con corrupción cada paquete dañado puede llevarse consigo el paquete siguiente
+            'completeness': interface.raw_count / max(1, stream.samples),
+            'lost': stream.samples - interface.raw_count,
+            'corrupted': stream.corrupted,
+            'bad_packets': interface.bad_packets,
+            'esense': interface.esense_count,
+            'speed': stream.samples / SIM_SAMPLE_FREQ / elapsed,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de resistencia con muchos cascos ThinkGear simulados.')
+    parser.add_argument('--headsets', type=int, default=HEADSETS)
+    parser.add_argument('--speed', type=float, default=SPEED, help='Veces el tiempo real (0: sin límite)')
+    parser.add_argument('--seconds', type=float, default=DURATION_SECONDS, help='Segundos de señal por casco')
+    parser.add_argument('--corruption', type=float, default=CORRUPTION_RATE, help='Fracción de paquetes corrompidos')
+    parser.add_argument('--json', default=None, help='Guarda los resultados en este archivo JSON.')
+    args = parser.parse_args()
+
+    results = run(args.headsets, args.speed, args.seconds, args.corruption)
+    completeness = np.array([r['completeness'] for r in results])
+    speeds = np.array([r['speed'] for r in results])
+    print(f"{args.headsets} cascos, {args.seconds:.0f} s de señal cada uno")
+    print(f"Velocidad lograda: mínima {speeds.min():.2f}x, media {speeds.mean():.2f}x (pedida {args.speed:g}x)")
+    print(f"Muestras decodificadas: mínimo {100 * completeness.min():.3f} %, media {100 * completeness.mean():.3f} %")
+    print(f"Paquetes corrompidos {sum(r['corrupted'] for r in results)}, muestras perdidas "
+          f"{sum(r['lost'] for r in results)}, paquetes descartados por el parser {sum(r['bad_packets'] for r in results)}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-import serial
 import time
 import sys
 import os
@@ -7,48 +6,49 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from modules.neurosky_interface import NeuroSkyInterface
+from modules.actuator_output import ActuatorOutput
+
+MAX_SEND_RATE = 2.0  # [envíos/s] El ESP32 no necesita más para cambiar de color
+
+
+def clamp_percent(value):
+    # Asegurarnos de no salir de 0–100 (por si el driver arroja valores fuera de rango)
+    return max(0, min(100, value))
+
 
 def main():
     # Solicitar puertos
     neurosky_port = input("Puerto para NeuroSky (ej. COM3 o /dev/ttyUSB0): ").strip()
     esp32_port = input("Puerto para ESP32 (ej. COM4 o /dev/ttyUSB1): ").strip()
 
+    output = None
     try:
         # 1. Conectar al MindWave / NeuroSky
         interface = NeuroSkyInterface(neurosky_port)
         print(f"Conectado a NeuroSky en {neurosky_port}")
 
-        # 2. Conectar al ESP32 por serial
-        esp32_serial = serial.Serial(esp32_port, baudrate=115200, timeout=1)
+        # 2. Conectar al ESP32 por serial. Cada valor de meditación nuevo se envía como texto
+        #    ('valor\n', lo que espera readStringUntil('\n')) desde el hilo de la salida, sin
+        #    repetir valores iguales y como mucho MAX_SEND_RATE veces por segundo.
+        #    Para otro ESP32 basta con crear otra salida y suscribirla a otra señal.
+        output = ActuatorOutput(esp32_port, max_rate=MAX_SEND_RATE)
+        output.subscribe(interface, 'meditation', transform=clamp_percent)
         print(f"Conectado al ESP32 en {esp32_port}")
 
         while True:
-            # Leer el valor de meditación (usualmente 0–100, según la implementación)
-            meditation_value = interface.meditation
-
-            # Asegurarnos de no salir de 0–100 (por si el driver arroja valores fuera de rango)
-            if meditation_value < 0:
-                meditation_value = 0
-            elif meditation_value > 100:
-                meditation_value = 100
-
-            # Enviar al ESP32 (terminamos con '\n' para que el ESP32 use readStringUntil('\n'))
-            esp32_serial.write(f"{meditation_value}\n".encode())
-
-            # Pequeña pausa
-            time.sleep(0.5)
+            time.sleep(1)
 
     except KeyboardInterrupt:
         print("Interrupción recibida, saliendo...")
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        # Cerrar el serial y liberar si es necesario
-        try:
-            esp32_serial.close()
-        except:
-            pass
+        # Envía el último valor pendiente y cierra el serial
+        if output is not None:
+            output.close()
+            print(f"Valores enviados: {output.stats['sent']}, omitidos: "
+                  f"{output.stats['coalesced'] + output.stats['unchanged']}")
         print("Terminando script.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
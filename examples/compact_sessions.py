@@ -0,0 +1,25 @@
+from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+from neurosky_mm2_headset.modules.session_compactor import SessionCompactor, MAX_SAMPLES_PER_SECOND
+import signal
+import sys
+
+def main():
+    db_manager = MongoDBManager()
+    rate = input(f'Máximo de muestras por segundo [{int(MAX_SAMPLES_PER_SECOND)}]: ').strip()
+    rate = int(rate) if rate.isdigit() else MAX_SAMPLES_PER_SECOND
+    compactor = SessionCompactor(db_manager, max_samples_per_second=rate)
+
+    def stop(signal_received=None, frame=None):
+        print('\nDeteniendo compactación, el progreso queda guardado...')
+        compactor.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+
+    print(f'Sesiones pendientes: {len(compactor.pending_sessions())}')
+    compactor.start()
+    compactor.thread.join()
+    print(f'Resultado: {compactor.stats}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+// Recibe tramas binarias de ActuatorOutput (protocol='binary'):
+// 0xAA 0xAA, canal (1 byte), valor (float32 little-endian, 4 bytes), checksum (1 byte)
+// El checksum es el complemento a uno de la suma de los 5 bytes de canal y valor.
+
+const int numChannels = 2;
+const int ledPins[numChannels] = {13, 12};  // Un LED por canal
+const int pwmFreq = 5000;  // Frecuencia PWM en Hz
+const int pwmResolution = 8;  // Resolución de 8 bits (0-255)
+
+// Límites para el ciclo de trabajo
+const float minValue = 0.0;
+const float maxValue = 100.0;
+
+uint8_t payload[5];
+int syncCount = 0;
+int payloadIndex = 0;
+
+void setup() {
+  Serial.begin(115200);
+
+  for (int channel = 0; channel < numChannels; channel++) {
+    ledcSetup(channel, pwmFreq, pwmResolution);
+    ledcAttachPin(ledPins[channel], channel);
+    ledcWrite(channel, 0);
+  }
+}
+
+void applyValue(uint8_t channel, float value) {
+  if (channel >= numChannels) {
+    return;
+  }
+  if (value < minValue) {
+    value = minValue;
+  } else if (value > maxValue) {
+    value = maxValue;
+  }
+  int dutyCycle = map(value * 100, minValue * 100, maxValue * 100, 0, 255);
+  ledcWrite(channel, dutyCycle);
+}
+
+void loop() {
+  while (Serial.available() > 0) {
+    uint8_t byteIn = Serial.read();
+
+    // Buscar los dos bytes de sincronización
+    if (syncCount < 2) {
+      syncCount = (byteIn == 0xAA) ? syncCount + 1 : 0;
+      payloadIndex = 0;
+      continue;
+    }
+
+    if (payloadIndex < 5) {
+      payload[payloadIndex++] = byteIn;
+      continue;
+    }
+
+    // Último byte: checksum
+    uint8_t sum = 0;
+    for (int i = 0; i < 5; i++) {
+      sum += payload[i];
+    }
+    if ((uint8_t)~sum == byteIn) {
+      float value;
+      memcpy(&value, &payload[1], sizeof(float));
+      applyValue(payload[0], value);
+    }
+    syncCount = 0;
+  }
+}
@@ -0,0 +1,22 @@
+from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+from neurosky_mm2_headset.modules.csv_importer import CollectorCSVImporter, MAX_WORKERS
+import os
+
+def main():
+    path = input('Ruta del CSV o del directorio con CSV del recolector: ').strip()
+    user_id = input('Ingresa el nombre del usuario: ').strip()
+
+    db_manager = MongoDBManager()
+    importer = CollectorCSVImporter(db_manager)
+
+    if os.path.isdir(path):
+        workers = input(f'Número de hilos de importación [{MAX_WORKERS}]: ').strip()
+        workers = int(workers) if workers.isdigit() else MAX_WORKERS
+        importer.import_directory(path, user_id, max_workers=workers)
+    else:
+        result = importer.import_file(path, user_id)
+        print(f"Sesión {result['session_id']}: {result['rows']} filas importadas, "
+              f"{result['skipped']} descartadas ({result['rows_per_second']:.0f} filas/s).")
+
+if __name__ == '__main__':
+    main()
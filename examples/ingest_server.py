@@ -0,0 +1,36 @@
+import argparse
+import time
+from neurosky_mm2_headset.modules.storage_backends import open_storage_backend
+from neurosky_mm2_headset.modules.uplink import DEFAULT_INGEST_STATE, UPLINK_PORT, IngestServer
+
+STATS_INTERVAL = 30  # [s]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de ingesta central para los uplinks de los equipos de campo.')
+    parser.add_argument('--storage', choices=('mongo', 'sqlite', 'files', 'auto'), default='auto')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--path', default=None, help='Archivo SQLite o directorio de sesiones')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=UPLINK_PORT)
+    parser.add_argument('--state', default=DEFAULT_INGEST_STATE,
+                        help='Archivo con las secuencias aplicadas, para no duplicar datos tras reiniciar')
+    args = parser.parse_args()
+
+    storage = open_storage_backend(args.storage, args.mongo_uri, args.path)
+    server = IngestServer(storage, args.host, args.port, args.state)
+    server.start()
+    print(f'Servidor de ingesta escuchando en {server.address[0]}:{server.address[1]}')
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            print(server.stats)
+    except KeyboardInterrupt:
+        print('Deteniendo servidor de ingesta...')
+    finally:
+        server.stop()
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.neurosky_interface import NeuroSkyInterface
+from modules.dashboard import DEFAULT_PANELS, PANEL_TYPES, Dashboard
+from modules.artifact_detection import ArtifactDetector
+from modules.neurofeedback import NeurofeedbackEngine
+from modules.actuator_output import ActuatorOutput
+from modules.stream_server import StreamServer
+
+Fs = 512
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tablero en vivo del NeuroSky con una sola conexión.')
+    parser.add_argument('port', help='Puerto del NeuroSky (ej. COM10 o /dev/ttyUSB0)')
+    parser.add_argument('--panels', nargs='+', choices=sorted(PANEL_TYPES), default=list(DEFAULT_PANELS),
+                        help='Paneles a mostrar, en orden')
+    parser.add_argument('--esp32', help='Puerto del ESP32; si se indica, la métrica de beta se envía a los LEDs')
+    parser.add_argument('--serve', type=int, metavar='PUERTO',
+                        help='Publica también la señal decodificada en este puerto TCP local para otros clientes')
+    args = parser.parse_args()
+
+    interface = NeuroSkyInterface(args.port)
+    server = None
+    if args.serve is not None:
+        server = StreamServer(interface, port=args.serve)
+        server.start()
+    engine = None
+    output = None
+    if args.esp32:
+        # La retroalimentación usa la misma interfaz que las gráficas
+        output = ActuatorOutput(args.esp32)
+        engine = NeurofeedbackEngine(interface, Fs, detector=ArtifactDetector(Fs))
+        engine.add_sink(output.sink())
+        engine.start()
+
+    try:
+        Dashboard(interface, args.panels).show()
+    except KeyboardInterrupt:
+        print('Interrupción recibida, saliendo...')
+    finally:
+        if engine is not None:
+            engine.stop()
+        if output is not None:
+            output.close()
+        if server is not None:
+            server.stop()
+        interface.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,6 @@
 import serial
 import numpy as np
-from scipy.signal import butter, filtfilt, spectrogram
-from numpy.fft import fft
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import time
 import threading
 
@@ -12,6 +9,13 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from modules.neurosky_interface import NeuroSkyInterface
+from modules.streaming_spectral import StreamingSpectrogram
+from modules.artifact_detection import ArtifactDetector
+from modules.neurofeedback import NeurofeedbackEngine
+from modules.actuator_output import ActuatorOutput
+from modules.latency_tracing import LatencyTracer
+from modules.live_plots import LiveCurve, LiveImage, LiveLine, animate
+from collections import deque
 import signal
 
 SAMPLE_FREQ = 10000.0
@@ -22,37 +26,36 @@ POWER_LOW_CUT = 12.0
 POWER_HIGH_CUT = 30.0
 X_AXIS_TYPE = 'log'
 NORMALIZE_SXX = False
-
-def butter_bandpass(lowcut, highcut, fs, order=4):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
-
-def apply_bandpass_filter(data, lowcut, highcut, fs, order=4):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
+Fs = 512
+FEEDBACK_HOP_SECONDS = 0.1  # [s] Periodo de la métrica enviada al ESP32
+FEEDBACK_DEADBAND = 0.5  # Cambios menores de la métrica no se reenvían al ESP32
+HEADLESS = '--headless' in sys.argv  # Sin gráficas: solo la métrica hacia el ESP32
+TRACE_LATENCY = '--trace' in sys.argv  # Mide la latencia desde el serial del auricular hasta el ESP32
+LATENCY_BUDGET = 0.25  # [s] Latencia máxima prometida para la retroalimentación
+LATENCY_REPORT_FILE = 'latency_trace.json'
+SPECTROGRAM_SEGMENT = Fs
+SPECTROGRAM_HOP = Fs - int(Fs * 0.95)
 
 class RealTimePowerSpectrum:
     def __init__(self, port, serial_port=None):
         self.port = port
-        self.raw_data = []
+        self.raw_data = deque(maxlen=MAX_LIVE_SAMPLES)
         self.low_beta_value = 0
         self.high_beta_value = 0
         self.collecting = False
         self.collection_thread = None
-        self.serial_connection = None
-        self.sxx_mean_history = []
-        self.spectrogram_sxx_max_history = []
+        self.actuator = None
+        self.engine = None
+        self.sample_queues = []
+        self.tracer = LatencyTracer(budget=LATENCY_BUDGET) if TRACE_LATENCY else None
 
         if serial_port:
-            self.serial_connection = serial.Serial(serial_port, baudrate=115200, timeout=1)
+            # Escritura en su propio hilo, limitada y sin reenviar valores repetidos
+            self.actuator = ActuatorOutput(serial_port, deadband=FEEDBACK_DEADBAND, tracer=self.tracer)
 
     def connect_interface(self):
         try:
-            self.interface = NeuroSkyInterface(self.port)
+            self.interface = NeuroSkyInterface(self.port, tracer=self.tracer)
         except serial.SerialException as e:
             print(f'Error al conectar con el dispositivo NeuroSky: {e}')
             self.interface = None
@@ -66,175 +69,124 @@ class RealTimePowerSpectrum:
             print('No se pudo iniciar la sesión debido a problemas de conexión con el MindWave.')
             sys.exit(1) 
 
+        # La métrica de beta se calcula en su propio hilo, con o sin gráficas.
+        # Parpadeos, saturación, señal plana o mal contacto no deben dominar la métrica.
+        self.engine = NeurofeedbackEngine(self.interface, Fs, POWER_LOW_CUT, POWER_HIGH_CUT,
+                                          hop_seconds=FEEDBACK_HOP_SECONDS, detector=ArtifactDetector(Fs))
+        if self.actuator:
+            self.engine.add_sink(self.actuator.sink())
+        self.engine.start()
+
         self.collecting = True
         self.collection_thread = threading.Thread(target=self.collect_data)
         self.collection_thread.start()
 
     def stop_collection(self):
         self.collecting = False
+        if self.engine:
+            self.engine.stop()
         if self.collection_thread:
             self.collection_thread.join()
+        if self.actuator:
+            self.actuator.close()
+            self.actuator = None
+        if self.tracer:
+            print(self.tracer.format_report())
+            self.tracer.export(LATENCY_REPORT_FILE)
+            self.tracer = None
 
     def collect_data(self):
         while self.collecting:
             try:
                 raw_value = self.interface.raw_value
+                if self.tracer:
+                    self.tracer.mark('collector', self.interface.raw_value_origin)
                 self.raw_data.append(raw_value)
+                for queue in self.sample_queues:
+                    queue.append(raw_value)
 
                 if 'low-beta' in self.interface.waves.keys():
                     self.low_beta_value = self.interface.waves['low-beta']
                 if 'high-beta' in self.interface.waves.keys():
                     self.high_beta_value = self.interface.waves['high-beta']
 
-                if len(self.raw_data) > MAX_LIVE_SAMPLES:
-                    self.raw_data.pop(0)
                 time.sleep(TIME_SLEEP)
             except Exception as e:
                 print(f'Error durante la recolección de datos: {e}')
                 self.collecting = False
                 sys.exit(1) 
 
+    def new_sample_queue(self):
+        # Cada vista incremental tiene su propia cola de muestras nuevas
+        queue = deque(maxlen=10 * GRAPH_INTERVAL)
+        self.sample_queues.append(queue)
+        return queue
+
+    def drain_new_samples(self, queue):
+        n = len(queue)
+        return np.array([queue.popleft() for _ in range(n)], dtype=np.float64)
+
     def initialize_plot(self):
+        # Los artistas se crean una sola vez; cada cuadro solo actualiza datos (con blitting)
         fig1, ax1 = plt.subplots(figsize=(10, 6))
         ax1.set_title('Espectro de Potencia en Tiempo Real')
         ax1.set_xlabel('Frecuencia (Hz)')
         ax1.set_ylabel('Amplitud (dB)')
+        ax1.set_xscale(X_AXIS_TYPE)
+        ax1.set_xlim([POWER_LOW_CUT, POWER_HIGH_CUT])
+        ax1.set_ylim([-60, 0] if NORMALIZE_SXX else [-10, 500])
+        spectrum_curve = None
+        last_result = None
 
         fig2, ax2 = plt.subplots(figsize=(10, 6))
         ax2.set_title('Señal Cruda en Tiempo Real')
         ax2.set_xlabel('Tiempo (s)')
         ax2.set_ylabel('Amplitud')
+        ax2.set_ylim(-500, 500)
+        raw_line = LiveLine(ax2, GRAPH_INTERVAL, dt=1 / SAMPLE_FREQ)
+        raw_samples = self.new_sample_queue()
 
         fig3, ax3 = plt.subplots(figsize=(10, 6))
         ax3.set_title('Espectrograma en Tiempo Real')
         ax3.set_xlabel('Tiempo [s]')
         ax3.set_ylabel('Frecuencia [Hz]')
-        cbar = None
+        stft = StreamingSpectrogram(Fs, SPECTROGRAM_SEGMENT, SPECTROGRAM_HOP,
+                                    (GRAPH_INTERVAL - SPECTROGRAM_SEGMENT) // SPECTROGRAM_HOP + 1, fmax=30)
+        spectrogram_image = LiveImage(ax3, stft.freqs, stft.n_columns, SPECTROGRAM_HOP / Fs,
+                                      vmin=0, vmax=10 * np.log10(5000))
+        ax3.set_ylim([0, 30])
+        fig3.colorbar(spectrogram_image.image, ax=ax3).set_label('Amplitud (dB)')
+        spectrogram_samples = self.new_sample_queue()
 
         def update_spectrum(frame):
-            if len(self.raw_data) >= GRAPH_INTERVAL:
-                raw_values = np.array(self.raw_data[-GRAPH_INTERVAL:])
-                Fs = 512
-                filtered_signal = apply_bandpass_filter(raw_values, POWER_LOW_CUT, POWER_HIGH_CUT, Fs, 2)
-                print(f'Filtered signal mean: {filtered_signal.mean()}')  
-
-                dt = 1 / Fs  
-                N = filtered_signal.shape[0]
-                T = N * dt
-
-                xf = fft(filtered_signal - filtered_signal.mean())
-                Sxx = 2 * dt ** 2 / T * (xf * xf.conj())
-                Sxx = Sxx[:int(len(filtered_signal) / 2)]
-
-                Sxx = np.maximum(Sxx.real, 1e-10)
-                print(f'Filtered Sxx mean: {Sxx.mean()}')  
-
-                df = 1 / T
-                fNQ = 1 / dt / 2
-                faxis = np.arange(0, fNQ, df)
-
-                limit_index = np.where((faxis >= 12) & (faxis <= 30))[0]
-                faxis_limited = faxis[limit_index]
-                Sxx_limited = Sxx[limit_index]
-
-                '''
-                Cálculo del valor promedio para las bandas de beta baja y beta alta
-                low_beta_index = np.where((faxis_limited >= 12) & (faxis_limited <= 15))[0]
-                low_beta_power = Sxx_limited[low_beta_index].mean()
-
-                high_beta_index = np.where((faxis_limited >= 15) & (faxis_limited <= 30))[0]
-                high_beta_power = Sxx_limited[high_beta_index].mean()
-                '''
-
-                Sxx_mean = Sxx_limited.mean()
-                print(f'Filtered Sxx_limited mean: {Sxx_mean}')  # Debug print
-                '''
-                print(f'Low Beta Value: {self.low_beta_value}')
-                print(f'Low Beta Calculated: {low_beta_power}')
-                print(f'High Beta Value: {self.high_beta_value}')
-                print(f'High Beta Calculated: {high_beta_power}')
-                '''
-
-                self.sxx_mean_history.append(Sxx_mean)
-                if len(self.sxx_mean_history) > 100:
-                    self.sxx_mean_history.pop(0)
-
-                log_sxx_mean_history = np.log10(self.sxx_mean_history)
-
-                min_log_sxx = np.min(log_sxx_mean_history)
-                max_log_sxx = np.max(log_sxx_mean_history)
-
-                if max_log_sxx - min_log_sxx == 0:
-                    scaled_value = 50
-                else:
-                    current_log_sxx = np.log10(Sxx_mean)
-                    normalized_value = (current_log_sxx - min_log_sxx) / (max_log_sxx - min_log_sxx)
-                    gamma = 2  
-                    scaled_value = 100 * normalized_value ** gamma
-                    scaled_value = max(0, min(100, scaled_value))
-
-                print(f'Scaled Value: {scaled_value}')  
-                if self.serial_connection:
-                    try:
-                        self.serial_connection.write(f"{scaled_value}\n".encode())
-                    except Exception as e:
-                        print(f'Error enviando dato al serial: {e}')
-
-                ax1.clear()
-                ax1.set_title('Espectro de Potencia en Tiempo Real')
-                ax1.set_xlabel('Frecuencia (Hz)')
-                ax1.set_ylabel('Amplitud (dB)')
-                ax1.set_xlim([12, 30])
-                ax1.set_ylim([-60, 0] if NORMALIZE_SXX else [-10, 500])
-                ax1.plot(faxis_limited, 10 * np.log10(Sxx_limited) if NORMALIZE_SXX else Sxx_limited)
-                ax1.set_xscale(X_AXIS_TYPE)
-
-            return ax1,
+            # La métrica y el envío al ESP32 los hace el motor en su propio hilo; aquí solo se dibuja
+            nonlocal spectrum_curve, last_result
+            result = self.engine.latest() if self.engine else None
+            if result is None or result is last_result:
+                # Sin curva todavía no hay artistas animados que conservar
+                return spectrum_curve.artists() if spectrum_curve is not None else ()
+            last_result = result
+            if spectrum_curve is None:
+                spectrum_curve = LiveCurve(ax1, result.freqs)
+            return spectrum_curve.update(10 * np.log10(result.psd) if NORMALIZE_SXX else result.psd)
                 
         def update_raw_signal(frame):
-            if len(self.raw_data) >= GRAPH_INTERVAL:
-                raw_values = np.array(self.raw_data[-GRAPH_INTERVAL:])
-                time_axis = np.arange(len(raw_values)) / SAMPLE_FREQ
-
-                ax2.clear()
-                ax2.set_title('Señal Cruda en Tiempo Real')
-                ax2.set_xlabel('Tiempo (s)')
-                ax2.set_ylabel('Amplitud')
-                ax2.plot(time_axis, raw_values)
-                ax2.set_xlim([time_axis[0], time_axis[-1]])
-                ax2.set_ylim(-500, 500)
-
-            return ax2,
+            raw_block = self.drain_new_samples(raw_samples)
+            if not raw_block.size:
+                return raw_line.artists()
+            raw_line.extend(raw_block)
+            return raw_line.update()
 
         def update_spectrogram(frame):
-            if len(self.raw_data) >= GRAPH_INTERVAL:
-                raw_values = np.array(self.raw_data[-GRAPH_INTERVAL:])
-                Fs = 512
-                f, t, Sxx = spectrogram(raw_values, fs=Fs, nperseg=int(Fs), noverlap=int(Fs*0.95))
-
-                max_Sxx = np.max(Sxx)
-                self.spectrogram_sxx_max_history.append(max_Sxx)
-                if len(self.spectrogram_sxx_max_history) > 100:
-                    self.spectrogram_sxx_max_history.pop(0)
-
-                ax3.clear()
-                ax3.set_title('Espectrograma en Tiempo Real')
-                ax3.set_xlabel('Tiempo [s]')
-                ax3.set_ylabel('Frecuencia [Hz]')
-                pcm = ax3.pcolormesh(t, f, 10 * np.log10(Sxx), cmap='jet', vmin=0, vmax=10 * np.log10(5000))
-                ax3.set_ylim([0, 30])
-                nonlocal cbar
-                if cbar is None:
-                    cbar = fig3.colorbar(pcm, ax=ax3)
-                    cbar.set_label('Amplitud (dB)')
-                else:
-                    cbar.update_normal(pcm)
-
-            return ax3,
+            n_new = stft.push(self.drain_new_samples(spectrogram_samples))
+            if not n_new:
+                return spectrogram_image.artists()
+            spectrogram_image.extend(stft.latest_columns(n_new))
+            return spectrogram_image.update()
 
-        ani1 = FuncAnimation(fig1, update_spectrum, interval=1000, cache_frame_data=False)
-        ani2 = FuncAnimation(fig2, update_raw_signal, interval=100, cache_frame_data=False)
-        ani3 = FuncAnimation(fig3, update_spectrogram, interval=5000, cache_frame_data=False)
+        ani1 = animate(fig1, update_spectrum)
+        ani2 = animate(fig2, update_raw_signal)
+        ani3 = animate(fig3, update_spectrogram)
 
         def on_close(event):
             self.stop_collection()
@@ -262,6 +214,9 @@ if __name__ == "__main__":
     
     try:
         spectrum_visualizer.start_collection()
+        if HEADLESS:
+            while True:
+                time.sleep(1)
         spectrum_visualizer.initialize_plot()
     except KeyboardInterrupt:
         spectrum_visualizer.stop_collection()
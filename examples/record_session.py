@@ -1,18 +1,23 @@
-from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+from neurosky_mm2_headset.modules.storage_backends import open_storage_backend
+from neurosky_mm2_headset.modules.session_cache import SessionDataCache
 from neurosky_mm2_headset.modules.session_manager import SessionManager
 import signal
 import sys
 
 HEADSET_PORT = 'COM10'
+STORAGE_BACKEND = 'auto'  # 'mongo', 'sqlite', 'files', 'uplink' o 'auto' (SQLite local si MongoDB no responde)
+UPLINK_ADDRESS = 'localhost:5332'  # Servidor de ingesta central cuando STORAGE_BACKEND es 'uplink'
 
 def main():
-    db_manager = MongoDBManager()
+    db_manager = SessionDataCache(open_storage_backend(STORAGE_BACKEND, uplink_address=UPLINK_ADDRESS))
     session_manager = SessionManager(db_manager, HEADSET_PORT)
 
     def end_session(signal_received=None, frame=None):
         if session_manager.is_collecting:
             session_manager.end_session()
             print('\nSesión terminada.')
+        # El uplink intenta enviar lo pendiente; lo que no alcance queda en su journal
+        db_manager.close()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, end_session)
@@ -78,8 +83,8 @@ def main():
                 user_input = input('Selecciona una sesión para ver los datos: ')
 
             session_choice = int(user_input) - 1
-            session_data = db_manager.get_session_data(sessions[session_choice]['_id'])
-            if session_data:
+            session_data = db_manager.get_session_arrays(sessions[session_choice]['_id'])
+            if session_data is not None and len(session_data.raw_values) > 0:
                 print('1. Exportar a CSV')
                 print('2. Ver gráfica')
                 print('3. Ver Espectro de Potencia')
@@ -0,0 +1,32 @@
+from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+from neurosky_mm2_headset.modules.session_aggregates import SessionAggregateCache, TREND_BANDS
+from datetime import datetime, timedelta, timezone
+
+def main():
+    db_manager = MongoDBManager()
+    cache = SessionAggregateCache(db_manager)
+    removed = cache.invalidate_stale()
+    if removed:
+        print(f'Se eliminaron {removed} agregados de versiones anteriores.')
+
+    user_id = input('Ingresa el nombre del usuario: ').strip()
+    metric = input(f"Métrica ({', '.join(TREND_BANDS)}, duration) [high-beta]: ").strip() or 'high-beta'
+    months = input('Meses hacia atrás [3]: ').strip()
+    months = int(months) if months.isdigit() else 3
+    granularity = input('Agrupar por (day, week, month o vacío para cada sesión): ').strip() or None
+
+    start = datetime.now(timezone.utc) - timedelta(days=30 * months)
+    rows = cache.trend(user_id, metric, start=start, granularity=granularity)
+    if not rows:
+        print('No hay sesiones en el periodo indicado.')
+        return
+
+    for row in rows:
+        if granularity is None:
+            print(f"{row['start_time']}: {row['value']:.3f}")
+        else:
+            print(f"{row['start_time']}: media {row['mean']:.3f} (mín {row['min']:.3f}, "
+                  f"máx {row['max']:.3f}, {row['sessions']} sesiones)")
+
+if __name__ == '__main__':
+    main()
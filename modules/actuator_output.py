@@ -0,0 +1,177 @@
+import time
+import struct
+import threading
+import serial
+
+PROTOCOL_TEXT = 'text'
+PROTOCOL_BINARY = 'binary'
+FRAME_SYNC = b'\xaa\xaa'  # Igual que los paquetes ThinkGear
+FRAME_FORMAT = '<Bf'  # Canal (uint8) y valor (float32)
+ACTUATOR_BAUDRATE = 115200
+MAX_SEND_RATE = 20.0  # [envíos/s] por puerto
+MAX_PENDING_CHANNELS = 16
+WRITE_TIMEOUT = 0.5  # [s]
+
+# Señales de NeuroSkyInterface a las que se puede suscribir una salida
+INTERFACE_SIGNALS = ('attention', 'meditation', 'blink', 'poor_signal', 'raw_value')
+
+
+def encode_text(channel, value):
+    """Protocolo de texto de los sketches del ESP32: una línea con el valor ('55\\n')."""
+    return f'{value:g}\n'.encode()
+
+
+def encode_binary(channel, value):
+    """
+    Trama binaria de 8 bytes: 0xAA 0xAA, canal (uint8), valor (float32 little-endian) y
+    checksum (complemento a uno de la suma de los 5 bytes de canal y valor, como en ThinkGear).
+    """
+    payload = struct.pack(FRAME_FORMAT, channel, value)
+    return FRAME_SYNC + payload + bytes([~sum(payload) & 0xFF])
+
+
+class ActuatorOutput:
+    """
+    Salida hacia un actuador serial (ESP32) con escritura en un hilo propio.
+
+    submit() nunca bloquea: guarda el valor como pendiente de su canal. Si el canal ya tenía un
+    valor pendiente se reemplaza (solo se envía el más reciente), y si el valor no cambió
+    respecto al último enviado (con tolerancia deadband) no se envía. La cola de pendientes
+    está acotada a max_channels canales. El hilo de escritura respeta max_rate envíos por
+    segundo y junta en una sola escritura los valores pendientes de todos los canales.
+
+    Cada instancia maneja un puerto, así que varios ESP32 se controlan creando varias salidas.
+    """
+
+    def __init__(self, connection, protocol=PROTOCOL_TEXT, max_rate=MAX_SEND_RATE, deadband=0.0,
+                 max_channels=MAX_PENDING_CHANNELS, baudrate=ACTUATOR_BAUDRATE, tracer=None):
+        """
+        :param connection: Puerto (por ejemplo 'COM4' o '/dev/ttyUSB1') o un objeto serial ya abierto.
+        :param protocol: PROTOCOL_TEXT (una línea por valor) o PROTOCOL_BINARY (tramas con canal).
+        :param max_rate: Máximo de escrituras por segundo.
+        :param deadband: Cambio mínimo respecto al último valor enviado para volver a enviar.
+        :param max_channels: Máximo de canales con un valor pendiente.
+        :param baudrate: Velocidad si connection es un nombre de puerto.
+        :param tracer: LatencyTracer opcional; registra la etapa 'actuator' al terminar cada escritura.
+        """
+        if isinstance(connection, str):
+            connection = serial.Serial(connection, baudrate=baudrate, timeout=1, write_timeout=WRITE_TIMEOUT)
+        if protocol not in (PROTOCOL_TEXT, PROTOCOL_BINARY):
+            raise ValueError(f'Protocolo desconocido: {protocol}')
+        self.connection = connection
+        self.encode = encode_text if protocol == PROTOCOL_TEXT else encode_binary
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.deadband = deadband
+        self.max_channels = max_channels
+        self.tracer = tracer
+        self.stats = {'submitted': 0, 'sent': 0, 'coalesced': 0, 'unchanged': 0, 'dropped': 0, 'errors': 0}
+
+        self._pending = {}
+        self._last_sent = {}
+        self._subscriptions = []
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, value, channel=0, origin=None):
+        """
+        Programa el envío de un valor; no bloquea.
+        :param origin: Instante de llegada del paquete que originó el valor (LatencyTracer.clock()).
+        """
+        with self._condition:
+            self.stats['submitted'] += 1
+            if channel in self._pending:
+                self._pending[channel] = (value, origin)
+                self.stats['coalesced'] += 1
+                return
+            last = self._last_sent.get(channel)
+            if last is not None and abs(value - last) <= self.deadband:
+                self.stats['unchanged'] += 1
+                return
+            if len(self._pending) >= self.max_channels:
+                self.stats['dropped'] += 1
+                return
+            self._pending[channel] = (value, origin)
+            self._condition.notify()
+
+    def sink(self, channel=0, transform=None):
+        """
+        Callable para usar como sink (por ejemplo NeurofeedbackEngine.add_sink): acepta un valor
+        o un objeto con atributo value.
+        :param transform: Función opcional aplicada al valor antes de enviarlo.
+        """
+        def send(result, origin=None):
+            value = getattr(result, 'value', result)
+            origin = getattr(result, 'origin', origin)
+            self.submit(transform(value) if transform else value, channel, origin)
+        return send
+
+    def subscribe(self, interface, signal, channel=0, transform=None):
+        """
+        Envía una señal de NeuroSkyInterface cada vez que llega.
+        :param signal: Uno de INTERFACE_SIGNALS o el nombre de una banda de ASIC_EEG_POWER ('low-beta', ...).
+        """
+        if signal in INTERFACE_SIGNALS:
+            handlers = getattr(interface, 'raw_value_handlers' if signal == 'raw_value' else f'{signal}_handlers')
+            send = self.sink(channel, transform)
+
+            def handler(interface, value):
+                send(value, interface.raw_value_origin if signal == 'raw_value' else interface.packet_origin)
+        else:
+            handlers = interface.waves_handlers
+            send = self.sink(channel, transform)
+
+            def handler(interface, waves):
+                if signal in waves:
+                    send(waves[signal], interface.packet_origin)
+        handlers.append(handler)
+        self._subscriptions.append((handlers, handler))
+        return handler
+
+    def _run(self):
+        next_allowed = 0.0
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                # Mientras se espera el turno, los valores nuevos siguen reemplazando a los pendientes
+                delay = next_allowed - time.perf_counter()
+                while self._running and delay > 0:
+                    self._condition.wait(delay)
+                    delay = next_allowed - time.perf_counter()
+                if not self._running and not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+                self._last_sent.update((channel, value) for channel, (value, _) in pending.items())
+
+            frame = b''.join(self.encode(channel, value) for channel, (value, _) in pending.items())
+            try:
+                self.connection.write(frame)
+                self.stats['sent'] += len(pending)
+                if self.tracer is not None:
+                    for _, origin in pending.values():
+                        self.tracer.mark('actuator', origin)
+            except (serial.SerialException, OSError) as e:
+                self.stats['errors'] += 1
+                print(f'Error enviando datos al actuador: {e}')
+            next_allowed = time.perf_counter() + self.min_interval
+            if not self._running:
+                return
+
+    def close(self, close_connection=True):
+        """Envía los valores pendientes, detiene el hilo y quita las suscripciones."""
+        for handlers, handler in self._subscriptions:
+            if handler in handlers:
+                handlers.remove(handler)
+        self._subscriptions.clear()
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        if close_connection:
+            try:
+                self.connection.close()
+            except (serial.SerialException, OSError):
+                pass
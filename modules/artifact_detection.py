@@ -0,0 +1,146 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import fftconvolve
+
+# Banderas de artefacto (se combinan con OR en un entero por epoch)
+ARTIFACT_AMPLITUDE = 1
+ARTIFACT_SLOPE = 2
+ARTIFACT_FLATLINE = 4
+ARTIFACT_BLINK = 8
+ARTIFACT_POOR_SIGNAL = 16
+ARTIFACT_SATURATION = 32
+ARTIFACT_NAMES = {
+    ARTIFACT_AMPLITUDE: 'amplitude',
+    ARTIFACT_SLOPE: 'slope',
+    ARTIFACT_FLATLINE: 'flatline',
+    ARTIFACT_BLINK: 'blink',
+    ARTIFACT_POOR_SIGNAL: 'poor_signal',
+    ARTIFACT_SATURATION: 'saturation',
+}
+
+AMPLITUDE_THRESHOLD = 1200  # Amplitud pico a pico máxima [unidades crudas]
+SLOPE_THRESHOLD = 500  # Salto máximo entre muestras consecutivas [unidades crudas]
+SATURATION_LEVEL = 2047  # El valor crudo del ThinkGear está limitado a ±2048
+FLATLINE_STD = 0.5  # Desviación estándar mínima de un epoch con señal
+FLATLINE_SECONDS = 0.1  # [s] Duración máxima de valores idénticos consecutivos
+BLINK_SECONDS = 0.3  # [s] Duración de la plantilla de parpadeo
+BLINK_CORRELATION = 0.85  # Correlación mínima con la plantilla
+BLINK_AMPLITUDE = 150  # Amplitud pico a pico mínima de un parpadeo [unidades crudas]
+BLINK_ANALYSIS_FREQ = 128.0  # [Hz] La búsqueda de parpadeos se hace sobre la señal diezmada
+POOR_SIGNAL_THRESHOLD = 50  # poor_signal del auricular (0 = contacto perfecto, 200 = sin contacto)
+
+
+class ArtifactDetector:
+    """
+    Marca epochs de señal cruda con artefactos. Todas las pruebas son vectorizadas sobre el
+    arreglo 2D de epochs: amplitud pico a pico, pendiente máxima, saturación, línea plana
+    (desviación estándar o racha de valores idénticos), parpadeo (correlación normalizada con
+    una plantilla) y poor_signal del auricular.
+    """
+
+    def __init__(self, fs, amplitude=AMPLITUDE_THRESHOLD, slope=SLOPE_THRESHOLD, saturation=SATURATION_LEVEL,
+                 flatline_std=FLATLINE_STD, flatline_seconds=FLATLINE_SECONDS,
+                 blink_correlation=BLINK_CORRELATION, blink_amplitude=BLINK_AMPLITUDE,
+                 poor_signal=POOR_SIGNAL_THRESHOLD):
+        """
+        :param fs: Frecuencia de muestreo [Hz].
+        Los demás parámetros son los umbrales de cada prueba; None desactiva la prueba.
+        """
+        self.fs = fs
+        self.amplitude = amplitude
+        self.slope = slope
+        self.saturation = saturation
+        self.flatline_std = flatline_std
+        self.flatline_samples = None if flatline_seconds is None else max(2, int(flatline_seconds * fs))
+        self.blink_correlation = blink_correlation
+        self.blink_amplitude = blink_amplitude
+        self.poor_signal = poor_signal
+
+        self.decimation = max(1, int(fs // BLINK_ANALYSIS_FREQ))
+        template = np.hanning(max(3, int(BLINK_SECONDS * fs / self.decimation)))
+        template -= template.mean()
+        self.blink_template = template / np.linalg.norm(template)
+        self.stats = {'epochs': 0, 'rejected': 0, **{name: 0 for name in ARTIFACT_NAMES.values()}}
+
+    def classify(self, epochs, poor_signal=None):
+        """
+        :param epochs: Arreglo n_epochs × n_muestras de señal cruda (sin filtrar).
+        :param poor_signal: Valor de poor_signal para todos los epochs o un arreglo con uno por epoch.
+        :return: Arreglo uint8 con las banderas ARTIFACT_* de cada epoch (0 = epoch válido).
+        """
+        epochs = np.atleast_2d(np.asarray(epochs, dtype=np.float64))
+        flags = np.zeros(epochs.shape[0], dtype=np.uint8)
+        if epochs.size == 0:
+            return flags
+
+        if self.amplitude is not None:
+            flags[np.ptp(epochs, axis=1) > self.amplitude] |= ARTIFACT_AMPLITUDE
+        if self.slope is not None:
+            flags[np.abs(np.diff(epochs, axis=1)).max(axis=1) > self.slope] |= ARTIFACT_SLOPE
+        if self.saturation is not None:
+            flags[(np.abs(epochs) >= self.saturation).any(axis=1)] |= ARTIFACT_SATURATION
+        if self.flatline_std is not None or self.flatline_samples is not None:
+            flags[self._flatline(epochs)] |= ARTIFACT_FLATLINE
+        if self.blink_correlation is not None:
+            flags[self._blink(epochs)] |= ARTIFACT_BLINK
+        if self.poor_signal is not None and poor_signal is not None:
+            flags[np.broadcast_to(np.asarray(poor_signal) > self.poor_signal, flags.shape)] |= ARTIFACT_POOR_SIGNAL
+
+        self._count(flags)
+        return flags
+
+    def good(self, epochs, poor_signal=None):
+        """Máscara booleana de los epochs sin artefactos."""
+        return self.classify(epochs, poor_signal) == 0
+
+    def _flatline(self, epochs):
+        flat = np.zeros(epochs.shape[0], dtype=bool)
+        if self.flatline_std is not None:
+            flat |= epochs.std(axis=1) < self.flatline_std
+        if self.flatline_samples is not None:
+            # Racha más larga de muestras iguales a la anterior, por fila
+            same = np.diff(epochs, axis=1) == 0
+            count = np.cumsum(same, axis=1)
+            reset = np.maximum.accumulate(np.where(same, 0, count), axis=1)
+            flat |= (count - reset).max(axis=1) + 1 >= self.flatline_samples
+        return flat
+
+    def _blink(self, epochs):
+        n = epochs.shape[1] // self.decimation * self.decimation
+        # Promedio por bloques: diezmado con un filtro pasabajos sencillo
+        decimated = epochs[:, :n].reshape(epochs.shape[0], -1, self.decimation).mean(axis=2)
+        size = self.blink_template.size
+        blink = np.zeros(epochs.shape[0], dtype=bool)
+        if decimated.shape[1] < size:
+            return blink
+        # La plantilla tiene media cero, así que su producto con la ventana centrada es igual al
+        # producto con la ventana sin centrar; la norma de la ventana centrada sale de sumas móviles.
+        decimated -= decimated.mean(axis=1, keepdims=True)
+        products = fftconvolve(decimated, self.blink_template[None, ::-1], mode='valid', axes=1)
+        sums = np.cumsum(np.pad(decimated, ((0, 0), (1, 0))), axis=1)
+        squares = np.cumsum(np.pad(decimated ** 2, ((0, 0), (1, 0))), axis=1)
+        window_sums = sums[:, size:] - sums[:, :-size]
+        window_squares = squares[:, size:] - squares[:, :-size]
+        norms = np.sqrt(np.maximum(window_squares - window_sums ** 2 / size, 0))
+        correlation = products / np.maximum(norms, 1e-12)
+        # La amplitud solo se mide en las pocas ventanas que se parecen a la plantilla
+        rows, positions = np.nonzero(correlation > self.blink_correlation)
+        if rows.size:
+            windows = sliding_window_view(decimated, size, axis=1)[rows, positions]
+            blink[rows[np.ptp(windows, axis=1) > self.blink_amplitude]] = True
+        return blink
+
+    def _count(self, flags):
+        self.stats['epochs'] += int(flags.size)
+        self.stats['rejected'] += int(np.count_nonzero(flags))
+        for flag, name in ARTIFACT_NAMES.items():
+            self.stats[name] += int(np.count_nonzero(flags & flag))
+
+    def rejection_rate(self):
+        """Fracción de epochs descartados desde que se creó el detector."""
+        return self.stats['rejected'] / self.stats['epochs'] if self.stats['epochs'] else 0.0
+
+
+def describe_artifacts(flags):
+    """Nombres de los artefactos presentes en un valor de banderas."""
+    return [name for flag, name in ARTIFACT_NAMES.items() if int(flags) & flag]
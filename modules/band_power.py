@@ -0,0 +1,187 @@
+import threading
+from collections import deque
+import numpy as np
+from scipy.fft import rfftfreq
+from scipy.signal import get_window
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.streaming_spectral import SegmentStream, density_scale, segment_periodograms
+
+# Rangos de las bandas que el ASIC del MindWave entrega en ASIC_EEG_POWER [Hz]
+EEG_BANDS = dict(zip(NeuroSkyInterface.ASIC_BANDS, [
+    (0.5, 2.75),
+    (3.5, 6.75),
+    (7.5, 9.25),
+    (10.0, 11.75),
+    (13.0, 16.75),
+    (18.0, 29.75),
+    (31.0, 39.75),
+    (41.0, 49.75),
+]))
+
+
+class BandPowerExtractor:
+    """
+    Potencia por banda de muchos epochs a la vez: una sola llamada a rfft sobre el arreglo
+    2D de epochs y un producto matricial con las máscaras de bins precalculadas.
+    """
+
+    def __init__(self, fs, n_samples, bands=None, window='hann'):
+        """
+        :param fs: Frecuencia de muestreo [Hz].
+        :param n_samples: Muestras por epoch.
+        :param bands: Diccionario nombre -> (frecuencia baja, frecuencia alta); por defecto las del ASIC.
+        :param window: Ventana de scipy.signal.get_window.
+        """
+        self.fs = fs
+        self.n_samples = int(n_samples)
+        self.bands = dict(bands or EEG_BANDS)
+        self.band_names = list(self.bands)
+        self.window = get_window(window, self.n_samples)
+        self.scale = density_scale(self.window, fs, self.n_samples)
+        self.freqs = rfftfreq(self.n_samples, 1 / fs)
+        df = self.freqs[1] - self.freqs[0]
+        # Matriz bins × bandas: la potencia de cada banda es la integral de la PSD en sus bins
+        self.band_matrix = np.stack([((self.freqs >= low) & (self.freqs <= high)) * df
+                                     for low, high in self.bands.values()], axis=1)
+
+    def transform(self, epochs, workers=None):
+        """
+        :param epochs: Arreglo n_epochs × n_samples.
+        :param workers: Hilos para scipy.fft (None para uno, -1 para todos los núcleos).
+        :return: Arreglo n_epochs × n_bandas con la potencia de cada banda.
+        """
+        epochs = np.atleast_2d(epochs)
+        if epochs.shape[1] != self.n_samples:
+            raise ValueError(f'Se esperaban epochs de {self.n_samples} muestras, no de {epochs.shape[1]}.')
+        return segment_periodograms(epochs, self.window, self.scale, workers) @ self.band_matrix
+
+    def as_dicts(self, powers):
+        """Convierte filas de potencias en diccionarios con el formato de NeuroSkyInterface.waves."""
+        return [dict(zip(self.band_names, row)) for row in np.atleast_2d(powers).tolist()]
+
+
+def epoch_band_powers(raw_values, fs, epoch_seconds=1.0, bands=None, workers=None, detector=None):
+    """
+    Divide una señal en epochs consecutivos sin solapamiento y devuelve su potencia por banda.
+    Las muestras que no completan un epoch al final se descartan.
+    :param detector: ArtifactDetector opcional; los epochs con artefactos se omiten del resultado.
+    :return: (tiempos de inicio de cada epoch en segundos, arreglo n_epochs × n_bandas).
+    """
+    n_samples = int(epoch_seconds * fs)
+    raw_values = np.asarray(raw_values, dtype=np.float64)
+    n_epochs = raw_values.size // n_samples
+    extractor = BandPowerExtractor(fs, n_samples, bands)
+    epochs = raw_values[:n_epochs * n_samples].reshape(n_epochs, n_samples)
+    starts = np.arange(n_epochs) * epoch_seconds
+    if detector is not None:
+        good = detector.good(epochs)
+        epochs, starts = epochs[good], starts[good]
+    return starts, extractor.transform(epochs, workers)
+
+
+class StreamingBandPower(SegmentStream):
+    """Potencia por banda de epochs deslizantes calculada a medida que llega la señal cruda."""
+
+    def __init__(self, fs, epoch_seconds=1.0, hop_seconds=None, bands=None, window='hann', detector=None):
+        """
+        :param fs: Frecuencia de muestreo [Hz].
+        :param epoch_seconds: Duración de cada epoch [s].
+        :param hop_seconds: Avance entre epochs [s] (por defecto igual a epoch_seconds).
+        :param detector: ArtifactDetector opcional; los epochs con artefactos no se calculan.
+        """
+        n_samples = int(epoch_seconds * fs)
+        super().__init__(n_samples, int((hop_seconds or epoch_seconds) * fs))
+        self.fs = fs
+        self.detector = detector
+        self.extractor = BandPowerExtractor(fs, n_samples, bands, window)
+
+    def push(self, samples, poor_signal=None):
+        """
+        Agrega muestras crudas y calcula los epochs que completan.
+        :param poor_signal: poor_signal del auricular durante el bloque, para el detector.
+        :return: (tiempos de fin de cada epoch nuevo en segundos, arreglo n_nuevos × n_bandas).
+        """
+        epochs, start_index, n_new = self._new_segments(samples, None)
+        if not n_new:
+            return np.empty(0), np.empty((0, len(self.extractor.band_names)))
+        ends = (start_index + np.arange(n_new) * self.hop + self.nperseg) / self.fs
+        if self.detector is not None:
+            good = self.detector.good(epochs, poor_signal)
+            epochs, ends = epochs[good], ends[good]
+        return ends, self.extractor.transform(epochs)
+
+
+class HeadsetBandComparison:
+    """
+    Compara en vivo las potencias calculadas a partir de la señal cruda con las que entrega el
+    ASIC del auricular: cada vez que llega un paquete ASIC_EEG_POWER se calcula la potencia de
+    las bandas del último epoch de señal cruda y se guarda el par.
+    """
+
+    def __init__(self, interface, fs=512.0, epoch_seconds=1.0, max_pairs=3600):
+        self.interface = interface
+        self.extractor = BandPowerExtractor(fs, int(epoch_seconds * fs))
+        self._raw = deque(maxlen=self.extractor.n_samples)
+        self._lock = threading.Lock()
+        self.computed = deque(maxlen=max_pairs)
+        self.headset = deque(maxlen=max_pairs)
+        interface.raw_value_handlers.append(self._on_raw)
+        interface.waves_handlers.append(self._on_waves)
+
+    def _on_raw(self, interface, value):
+        self._raw.append(value)
+
+    def _on_waves(self, interface, waves):
+        if len(self._raw) < self.extractor.n_samples:
+            return
+        epoch = np.array(self._raw, dtype=np.float64)
+        with self._lock:
+            self.computed.append(self.extractor.transform(epoch)[0])
+            self.headset.append([waves.get(band, 0) for band in self.extractor.band_names])
+
+    def stop(self):
+        """Deja de recibir datos de la interfaz."""
+        self.interface.raw_value_handlers.remove(self._on_raw)
+        self.interface.waves_handlers.remove(self._on_waves)
+
+    def report(self):
+        with self._lock:
+            return compare_with_headset(np.array(self.computed), np.array(self.headset),
+                                        self.extractor.band_names)
+
+
+def compare_with_headset(computed, headset, band_names=None):
+    """
+    Compara potencias calculadas con las del ASIC, epoch a epoch (mismas filas).
+    Como el ASIC usa unidades propias, se comparan los logaritmos: correlación de Pearson y
+    desplazamiento medio (equivalente a la razón típica entre ambas escalas).
+    :return: Diccionario banda -> {'pairs', 'log_correlation', 'median_ratio'}.
+    """
+    band_names = band_names or list(EEG_BANDS)
+    computed = np.asarray(computed, dtype=np.float64).reshape(-1, len(band_names))
+    headset = np.asarray(headset, dtype=np.float64).reshape(-1, len(band_names))
+    report = {}
+    for i, band in enumerate(band_names):
+        valid = (computed[:, i] > 0) & (headset[:, i] > 0)
+        log_computed = np.log10(computed[valid, i])
+        log_headset = np.log10(headset[valid, i])
+        pairs = int(valid.sum())
+        correlation = None
+        if pairs >= 3 and log_computed.std() > 0 and log_headset.std() > 0:
+            correlation = float(np.corrcoef(log_computed, log_headset)[0, 1])
+        report[band] = {
+            'pairs': pairs,
+            'log_correlation': correlation,
+            'median_ratio': float(10 ** np.median(log_headset - log_computed)) if pairs else None,
+        }
+    return report
+
+
+def format_comparison_report(report):
+    """Texto tabulado del resultado de compare_with_headset."""
+    lines = [f"{'banda':<12} {'pares':>6} {'r(log)':>8} {'ASIC/calculado':>16}"]
+    for band, row in report.items():
+        correlation = f"{row['log_correlation']:.3f}" if row['log_correlation'] is not None else '-'
+        ratio = f"{row['median_ratio']:.3g}" if row['median_ratio'] is not None else '-'
+        lines.append(f"{band:<12} {row['pairs']:>6} {correlation:>8} {ratio:>16}")
+    return '\n'.join(lines)
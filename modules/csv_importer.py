@@ -0,0 +1,186 @@
+import os
+import time
+from itertools import islice
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+CHUNK_ROWS = 200000
+IMPORT_BATCH_SIZE = 50000
+MAX_WORKERS = 4
+
+
+# Las sesiones solo guardan la señal cruda (timestamp, raw_value); eSense y bandas no tienen columna
+IMPORTABLE_SIGNAL = 'raw'
+
+
+class CollectorCSVImporter:
+    """
+    Importa los CSV de señal cruda generados por NeuroSkyDataCollector (Timestamp,Raw) a sesiones
+    del backend de almacenamiento usando la API por lotes (start_session, save_arrays,
+    end_session). Los CSV de otras señales se rechazan sin crear sesión.
+    """
+
+    def __init__(self, db_manager, chunk_rows=CHUNK_ROWS, batch_size=IMPORT_BATCH_SIZE):
+        """
+        :param db_manager: Backend de almacenamiento (MongoDBManager, SQLiteStorageBackend, etc.).
+        :param chunk_rows: Número de filas que se leen y convierten con numpy en cada bloque.
+        :param batch_size: Número de muestras por escritura masiva en la base de datos.
+        """
+        self.db_manager = db_manager
+        self.chunk_rows = chunk_rows
+        self.batch_size = batch_size
+
+    def read_header(self, csv_file):
+        """
+        Lee la cabecera del CSV y devuelve el tipo de señal que contiene.
+        :raises ValueError: Si la cabecera no tiene el formato Timestamp,<Señal>.
+        """
+        with open(csv_file, 'r', newline='') as f:
+            header = f.readline().strip().split(',')
+        if len(header) != 2 or header[0].strip().lower() != 'timestamp':
+            raise ValueError(f'Cabecera inválida en {csv_file}: se esperaba Timestamp,<Señal>.')
+        return header[1].strip().lower()
+
+    def iter_chunks(self, csv_file):
+        """
+        Recorre el CSV por bloques de chunk_rows filas y devuelve para cada bloque los arreglos
+        (timestamps, valores, filas_descartadas). Las filas incompletas (por ejemplo la última
+        línea de una grabación interrumpida) se descartan.
+        """
+        with open(csv_file, 'r', newline='') as f:
+            f.readline()
+            while True:
+                lines = list(islice(f, self.chunk_rows))
+                if not lines:
+                    break
+                try:
+                    block = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+                    skipped = 0
+                except ValueError:
+                    block, skipped = self._parse_lines_tolerant(lines)
+                if block.shape[0] == 0:
+                    yield np.empty(0), np.empty(0, dtype=np.int64), skipped
+                    continue
+                yield block[:, 0], block[:, 1].astype(np.int64), skipped
+
+    def _parse_lines_tolerant(self, lines):
+        rows = []
+        skipped = 0
+        for line in lines:
+            parts = line.strip().split(',')
+            try:
+                if len(parts) != 2:
+                    raise ValueError
+                rows.append((float(parts[0]), float(parts[1])))
+            except ValueError:
+                skipped += 1
+        block = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return block, skipped
+
+    def import_file(self, csv_file, user_id):
+        """
+        Importa un CSV como una sesión nueva.
+        :param csv_file: Ruta del CSV generado por el recolector.
+        :param user_id: Usuario al que se asigna la sesión.
+        :return: Diccionario con session_id, filas importadas, filas descartadas, segundos y filas/s.
+        """
+        start = time.perf_counter()
+        signal_type = self.read_header(csv_file)
+
+        session_id = None
+        rows = 0
+        skipped = 0
+        last_ts = None
+        failed = False
+
+        if signal_type != IMPORTABLE_SIGNAL:
+            print(f'{csv_file} contiene la señal {signal_type!r}; las sesiones solo guardan la señal '
+                  f'cruda, así que solo se importan CSV de la señal {IMPORTABLE_SIGNAL!r}.')
+            failed = True
+            chunks = ()
+        else:
+            chunks = self.iter_chunks(csv_file)
+
+        try:
+            for timestamps, values, chunk_skipped in chunks:
+                skipped += chunk_skipped
+                if timestamps.size == 0:
+                    continue
+
+                if session_id is None:
+                    session_id = self.db_manager.start_session(
+                        user_id, start_time=datetime.fromtimestamp(timestamps[0], timezone.utc))
+                    if session_id is None:
+                        print(f'No se pudo crear la sesión para {csv_file}.')
+                        failed = True
+                        break
+
+                for i in range(0, len(timestamps), self.batch_size):
+                    batch_timestamps = timestamps[i:i + self.batch_size]
+                    if not self.db_manager.save_arrays(session_id, batch_timestamps, values[i:i + self.batch_size]):
+                        print(f'Error al guardar un lote de {csv_file}. Importación interrumpida.')
+                        failed = True
+                        break
+                    rows += len(batch_timestamps)
+                    last_ts = batch_timestamps[-1]
+                if failed:
+                    break
+        finally:
+            # La sesión se cierra aunque la lectura o la escritura fallen a mitad del archivo
+            if session_id is not None:
+                end_time = datetime.fromtimestamp(last_ts, timezone.utc) if last_ts is not None else None
+                self.db_manager.end_session(session_id, end_time=end_time)
+
+        elapsed = time.perf_counter() - start
+        return {
+            'file': csv_file,
+            'session_id': session_id,
+            'signal_type': signal_type,
+            'rows': rows,
+            'skipped': skipped,
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+            'ok': not failed and session_id is not None,
+        }
+
+    def import_directory(self, directory, user_id, max_workers=MAX_WORKERS, pattern='.csv'):
+        """
+        Importa en paralelo todos los CSV de un directorio, una sesión por archivo.
+        :param directory: Directorio con los CSV del recolector.
+        :param user_id: Usuario al que se asignan las sesiones.
+        :param max_workers: Número de hilos de importación.
+        :return: Diccionario con los resultados por archivo y el total de filas/s.
+        """
+        files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.lower().endswith(pattern))
+        start = time.perf_counter()
+        results = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.import_file, path, user_id): path for path in files}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f'Error al importar {path}: {e}')
+                    result = {'file': path, 'session_id': None, 'rows': 0, 'skipped': 0,
+                              'seconds': 0.0, 'rows_per_second': 0.0, 'ok': False}
+                results.append(result)
+                print(f"{os.path.basename(path)}: {result['rows']} filas "
+                      f"({result['rows_per_second']:.0f} filas/s)")
+
+        elapsed = time.perf_counter() - start
+        total_rows = sum(r['rows'] for r in results)
+        summary = {
+            'files': len(files),
+            'failed': sum(1 for r in results if not r['ok']),
+            'rows': total_rows,
+            'seconds': elapsed,
+            'rows_per_second': total_rows / elapsed if elapsed > 0 else 0.0,
+            'results': results,
+        }
+        print(f"Importados {summary['files'] - summary['failed']}/{summary['files']} archivos, "
+              f"{total_rows} filas en {elapsed:.2f} s ({summary['rows_per_second']:.0f} filas/s).")
+        return summary
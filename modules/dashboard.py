@@ -0,0 +1,397 @@
+import abc
+import time
+from collections import deque
+import numpy as np
+import matplotlib.pyplot as plt
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.streaming_spectral import StreamingPSD, StreamingSpectrogram
+from neurosky_mm2_headset.modules.live_plots import LIVE_FRAME_INTERVAL, LiveCurve, LiveImage, LiveLine
+
+DASHBOARD_FS = 512.0  # [Hz] Frecuencia de la señal cruda
+DASHBOARD_TICK = 50  # [ms] Cada cuánto se revisa si algún panel tiene datos nuevos
+RAW_SECONDS = 4.0  # [s] Ventana de la señal cruda
+ESENSE_POINTS = 300  # Valores de atención y meditación visibles (llegan a 1 Hz)
+BANDS_POINTS = 300  # Valores de cada banda visibles (llegan a 1 Hz)
+PSD_SEGMENT_SECONDS = 1.0  # [s]
+PSD_WINDOW_SECONDS = 4.0  # [s] Segmentos promediados en la PSD
+PSD_FMAX = 45.0  # [Hz]
+SPECTROGRAM_SECONDS = 10.0  # [s]
+SPECTROGRAM_FMAX = 30.0  # [Hz]
+BAND_Y_LIMITS = {
+    'delta': (0, 1000000),
+    'theta': (0, 500000),
+    'low-alpha': (0, 300000),
+    'high-alpha': (0, 300000),
+    'low-beta': (0, 200000),
+    'high-beta': (0, 200000),
+    'low-gamma': (0, 100000),
+    'mid-gamma': (0, 100000),
+}
+
+
+class DashboardPanel(abc.ABC):
+    """
+    Panel del tablero. Recibe datos por los manejadores de NeuroSkyInterface (sin sondear) y los
+    guarda en colas; el tablero llama a update() en el hilo de la interfaz gráfica solo cuando
+    changed() es True y pasó refresh_interval desde el último dibujo, y entonces redibuja solo
+    los ejes del panel.
+    """
+
+    refresh_interval = LIVE_FRAME_INTERVAL / 1000  # [s]
+    height = 1  # Altura relativa en la figura
+
+    def __init__(self, refresh_interval=None):
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        self.last_draw = -np.inf
+        self.draws = 0
+        self._handlers = []
+
+    def _subscribe(self, handlers, handler):
+        handlers.append(handler)
+        self._handlers.append((handlers, handler))
+
+    def attach(self, interface):
+        """Registra los manejadores del panel en la interfaz."""
+
+    def detach(self):
+        for handlers, handler in self._handlers:
+            if handler in handlers:
+                handlers.remove(handler)
+        self._handlers.clear()
+
+    @abc.abstractmethod
+    def setup(self, fig, subplot_spec):
+        """Crea los ejes y artistas del panel (una sola vez)."""
+
+    @abc.abstractmethod
+    def changed(self):
+        """True si llegaron datos desde el último dibujo."""
+
+    @abc.abstractmethod
+    def update(self):
+        """Procesa los datos nuevos; devuelve los artistas modificados, o nada si no hay que redibujar."""
+
+    @abc.abstractmethod
+    def artists(self):
+        """Todos los artistas animados del panel, sin recalcular sus datos."""
+
+    def axes(self):
+        """Ejes del panel, que se redibujan juntos."""
+        return list(dict.fromkeys(artist.axes for artist in self.artists()))
+
+
+class RawPanel(DashboardPanel):
+    """Señal cruda de los últimos seconds segundos."""
+
+    def __init__(self, seconds=RAW_SECONDS, fs=DASHBOARD_FS, ylim=(-2048, 2047), refresh_interval=None):
+        super().__init__(refresh_interval)
+        self.fs = fs
+        self.n_points = int(seconds * fs)
+        self.ylim = ylim
+        self._samples = deque(maxlen=self.n_points)
+
+    def attach(self, interface):
+        self._subscribe(interface.raw_value_handlers, lambda interface, value: self._samples.append(value))
+
+    def setup(self, fig, subplot_spec):
+        ax = fig.add_subplot(subplot_spec)
+        ax.set_title('Señal Cruda')
+        ax.set_xlabel('Tiempo (s)')
+        ax.set_ylabel('Amplitud (µV)')
+        ax.set_ylim(*self.ylim)
+        self.line = LiveLine(ax, self.n_points, dt=1 / self.fs, lw=1, color='red')
+
+    def changed(self):
+        return bool(self._samples)
+
+    def update(self):
+        n = len(self._samples)
+        self.line.extend([self._samples.popleft() for _ in range(n)])
+        return self.line.update()
+
+    def artists(self):
+        return self.line.artists()
+
+
+class ESensePanel(DashboardPanel):
+    """Atención y meditación; se redibuja solo cuando llega un valor nuevo (1 Hz)."""
+
+    refresh_interval = 0.5
+
+    def __init__(self, points=ESENSE_POINTS, refresh_interval=None):
+        super().__init__(refresh_interval)
+        self.points = points
+        self._values = {'attention': deque(maxlen=points), 'meditation': deque(maxlen=points)}
+
+    def attach(self, interface):
+        for name, values in self._values.items():
+            self._subscribe(getattr(interface, f'{name}_handlers'),
+                            lambda interface, value, values=values: values.append(value))
+
+    def setup(self, fig, subplot_spec):
+        ax = fig.add_subplot(subplot_spec)
+        ax.set_title('Atención y Meditación')
+        ax.set_xlabel('Segundos')
+        ax.set_ylabel('Nivel')
+        ax.set_ylim(0, 100)
+        self.lines = {
+            'attention': LiveLine(ax, self.points, label='Atención', color='blue'),
+            'meditation': LiveLine(ax, self.points, label='Meditación', color='green'),
+        }
+        ax.legend(loc='upper right')
+
+    def changed(self):
+        return any(self._values.values())
+
+    def update(self):
+        for name, values in self._values.items():
+            n = len(values)
+            self.lines[name].extend([values.popleft() for _ in range(n)])
+        return tuple(artist for line in self.lines.values() for artist in line.update())
+
+    def artists(self):
+        return tuple(artist for line in self.lines.values() for artist in line.artists())
+
+
+class BandsPanel(DashboardPanel):
+    """Las 8 bandas de ASIC_EEG_POWER, una por subgráfica; llegan una vez por segundo."""
+
+    refresh_interval = 0.5
+    height = 3
+
+    def __init__(self, points=BANDS_POINTS, bands=None, y_limits=None, refresh_interval=None):
+        super().__init__(refresh_interval)
+        self.points = points
+        self.bands = list(bands or NeuroSkyInterface.ASIC_BANDS)
+        self.y_limits = y_limits or BAND_Y_LIMITS
+        self._waves = deque(maxlen=points)
+
+    def attach(self, interface):
+        self._subscribe(interface.waves_handlers, lambda interface, waves: self._waves.append(dict(waves)))
+
+    def setup(self, fig, subplot_spec):
+        grid = subplot_spec.subgridspec(len(self.bands), 1, hspace=0.1)
+        self.lines = {}
+        for i, band in enumerate(self.bands):
+            ax = fig.add_subplot(grid[i])
+            ax.set_ylim(self.y_limits.get(band, (0, 1000000)))
+            if i < len(self.bands) - 1:
+                ax.tick_params(labelbottom=False)
+            self.lines[band] = LiveLine(ax, self.points, label=band)
+            ax.legend(loc='upper right')
+        ax.set_xlabel('Segundos')
+
+    def changed(self):
+        return bool(self._waves)
+
+    def update(self):
+        n = len(self._waves)
+        waves = [self._waves.popleft() for _ in range(n)]
+        for band, line in self.lines.items():
+            line.extend([w.get(band, 0) for w in waves])
+        return tuple(artist for line in self.lines.values() for artist in line.update())
+
+    def artists(self):
+        return tuple(artist for line in self.lines.values() for artist in line.artists())
+
+
+class PSDPanel(DashboardPanel):
+    """PSD de la señal cruda, incremental (solo se calculan los segmentos nuevos)."""
+
+    refresh_interval = 0.5
+
+    def __init__(self, fs=DASHBOARD_FS, segment_seconds=PSD_SEGMENT_SECONDS, window_seconds=PSD_WINDOW_SECONDS,
+                 fmin=1.0, fmax=PSD_FMAX, detector=None, refresh_interval=None):
+        super().__init__(refresh_interval)
+        nperseg = int(segment_seconds * fs)
+        hop = nperseg // 2
+        self.engine = StreamingPSD(fs, nperseg, hop, max(1, int((window_seconds * fs - nperseg) // hop) + 1),
+                                   detector=detector)
+        self.band = self.engine.band_mask(fmin, fmax)
+        self.fmin, self.fmax = fmin, fmax
+        self._samples = deque(maxlen=int(10 * window_seconds * fs))
+        self._poor_signal = None
+
+    def attach(self, interface):
+        def on_raw(interface, value):
+            self._samples.append(value)
+            self._poor_signal = interface.poor_signal
+        self._subscribe(interface.raw_value_handlers, on_raw)
+
+    def setup(self, fig, subplot_spec):
+        ax = fig.add_subplot(subplot_spec)
+        ax.set_title('Espectro de Potencia')
+        ax.set_xlabel('Frecuencia (Hz)')
+        ax.set_ylabel('Potencia (dB)')
+        ax.set_xlim(self.fmin, self.fmax)
+        ax.set_ylim(-20, 60)
+        self.curve = LiveCurve(ax, self.engine.freqs[self.band])
+
+    def changed(self):
+        return bool(self._samples)
+
+    def update(self):
+        n = len(self._samples)
+        raw_block = np.array([self._samples.popleft() for _ in range(n)], dtype=np.float64)
+        if not self.engine.push(raw_block, poor_signal=self._poor_signal) or not self.engine.ready:
+            return ()
+        return self.curve.update(10 * np.log10(np.maximum(self.engine.psd()[self.band], 1e-10)))
+
+    def artists(self):
+        return self.curve.artists()
+
+
+class SpectrogramPanel(DashboardPanel):
+    """Espectrograma de los últimos seconds segundos como imagen con búfer circular."""
+
+    refresh_interval = 0.25
+
+    def __init__(self, fs=DASHBOARD_FS, seconds=SPECTROGRAM_SECONDS, fmax=SPECTROGRAM_FMAX, vmin=0, vmax=40,
+                 refresh_interval=None):
+        super().__init__(refresh_interval)
+        nperseg = int(fs)
+        self.hop = nperseg - int(fs * 0.95)
+        self.fs = fs
+        self.stft = StreamingSpectrogram(fs, nperseg, self.hop, (int(seconds * fs) - nperseg) // self.hop + 1,
+                                         fmax=fmax)
+        self.vmin, self.vmax = vmin, vmax
+        self._samples = deque(maxlen=int(10 * seconds * fs))
+
+    def attach(self, interface):
+        self._subscribe(interface.raw_value_handlers, lambda interface, value: self._samples.append(value))
+
+    def setup(self, fig, subplot_spec):
+        ax = fig.add_subplot(subplot_spec)
+        ax.set_title('Espectrograma')
+        ax.set_xlabel('Tiempo [s]')
+        ax.set_ylabel('Frecuencia [Hz]')
+        self.image = LiveImage(ax, self.stft.freqs, self.stft.n_columns, self.hop / self.fs, self.vmin, self.vmax)
+        fig.colorbar(self.image.image, ax=ax).set_label('Amplitud (dB)')
+
+    def changed(self):
+        return bool(self._samples)
+
+    def update(self):
+        n = len(self._samples)
+        n_new = self.stft.push(np.array([self._samples.popleft() for _ in range(n)], dtype=np.float64))
+        if not n_new:
+            return ()
+        self.image.extend(self.stft.latest_columns(n_new))
+        return self.image.update()
+
+    def artists(self):
+        return self.image.artists()
+
+
+PANEL_TYPES = {
+    'raw': RawPanel,
+    'esense': ESensePanel,
+    'bands': BandsPanel,
+    'psd': PSDPanel,
+    'spectrogram': SpectrogramPanel,
+}
+DEFAULT_PANELS = ('raw', 'esense', 'bands', 'psd', 'spectrogram')
+
+
+class Dashboard:
+    """
+    Tablero en vivo con varios paneles alimentados por una sola NeuroSkyInterface.
+
+    Los datos llegan por los manejadores de la interfaz, no por sondeo. Un temporizador revisa
+    cada DASHBOARD_TICK ms qué paneles tienen datos nuevos y ya cumplieron su refresh_interval,
+    y solo los ejes de esos paneles se redibujan: se restaura su fondo guardado, se dibujan sus
+    artistas animados y se copia al lienzo solo esa región (blitting por panel). Un panel de
+    bandas que cambia una vez por segundo se redibuja una vez por segundo, y los demás paneles
+    no se tocan. El fondo se vuelve a guardar después de cada dibujo completo de la figura (el
+    primero y los cambios de tamaño de la ventana).
+    """
+
+    def __init__(self, interface, panels=DEFAULT_PANELS, tick=DASHBOARD_TICK, figsize=(12, 14)):
+        """
+        :param interface: NeuroSkyInterface compartida por todos los paneles.
+        :param panels: Nombres de PANEL_TYPES o instancias de DashboardPanel.
+        :param tick: Periodo del temporizador [ms].
+        """
+        self.interface = interface
+        self.panels = [PANEL_TYPES[panel]() if isinstance(panel, str) else panel for panel in panels]
+        self.tick = tick
+        self.figsize = figsize
+        self.fig = None
+        self.timer = None
+        self._panel_axes = {}
+        self._backgrounds = None
+        self._draw_cid = None
+        for panel in self.panels:
+            panel.attach(interface)
+
+    def setup(self):
+        self.fig = plt.figure(figsize=self.figsize)
+        grid = self.fig.add_gridspec(len(self.panels), 1, height_ratios=[panel.height for panel in self.panels],
+                                     hspace=0.5)
+        for panel, subplot_spec in zip(self.panels, grid):
+            panel.setup(self.fig, subplot_spec)
+        self._panel_axes = {panel: panel.axes() for panel in self.panels}
+        self._draw_cid = self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        return self.fig
+
+    def _on_draw(self, event):
+        # El dibujo completo no incluye los artistas animados: se guarda el fondo de cada eje y
+        # se dibujan encima los artistas de todos los paneles
+        canvas = self.fig.canvas
+        self._backgrounds = {ax: canvas.copy_from_bbox(ax.bbox)
+                             for axes in self._panel_axes.values() for ax in axes}
+        for artist in self.draw_all():
+            artist.axes.draw_artist(artist)
+
+    def draw_all(self):
+        """Artistas de todos los paneles (primer dibujo y cambios de tamaño de la ventana)."""
+        return [artist for panel in self.panels for artist in panel.artists()]
+
+    def draw_panel(self, panel):
+        """Redibuja solo los ejes de un panel sobre su fondo guardado."""
+        canvas = self.fig.canvas
+        axes = self._panel_axes[panel]
+        for ax in axes:
+            canvas.restore_region(self._backgrounds[ax])
+        for artist in panel.artists():
+            artist.axes.draw_artist(artist)
+        for ax in axes:
+            canvas.blit(ax.bbox)
+
+    def update(self, frame=None):
+        """
+        Redibuja los paneles con datos nuevos cuyo intervalo de refresco ya se cumplió.
+        :return: Artistas que cambiaron.
+        """
+        if self._backgrounds is None:
+            return []
+        now = time.perf_counter()
+        artists = []
+        for panel in self.panels:
+            if now - panel.last_draw < panel.refresh_interval or not panel.changed():
+                continue
+            drawn = panel.update()
+            if drawn:
+                self.draw_panel(panel)
+                artists.extend(drawn)
+                panel.last_draw = now
+                panel.draws += 1
+        return artists
+
+    def show(self):
+        """Abre el tablero y bloquea hasta que se cierra la ventana."""
+        if self.fig is None:
+            self.setup()
+        self.timer = self.fig.canvas.new_timer(interval=self.tick)
+        self.timer.add_callback(self.update)
+        self.timer.start()
+        plt.show()
+        self.close()
+
+    def close(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        for panel in self.panels:
+            panel.detach()
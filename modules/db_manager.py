@@ -1,29 +1,48 @@
-from pymongo import MongoClient, errors
+from pymongo import MongoClient, ASCENDING, ReturnDocument, errors
 from datetime import datetime, timezone
+import numpy as np
+from neurosky_mm2_headset.modules.session_chunks import (
+    LAYOUT_CHUNKED, CHUNK_SAMPLES, SessionArrays, encode_samples, decode_samples, samples_to_arrays, arrays_to_samples
+)
+from neurosky_mm2_headset.modules.storage_backends import StorageBackend
 
-class MongoDBManager:
-    def __init__(self, uri='mongodb://localhost:27017/', db_name='neurosky'):
+SERVER_TIMEOUT_MS = 2000
+
+class MongoDBManager(StorageBackend):
+    def __init__(self, uri='mongodb://localhost:27017/', db_name='neurosky', server_timeout_ms=SERVER_TIMEOUT_MS):
         try:
-            self.client = MongoClient(uri)
+            self.client = MongoClient(uri, serverSelectionTimeoutMS=server_timeout_ms)
+            # MongoClient conecta de forma perezosa: se comprueba el servidor ahora para no
+            # descubrir el problema cuando ya se están perdiendo muestras.
+            self.client.admin.command('ping')
             self.db = self.client[db_name]
             self.sessions = self.db.sessions
-        except errors.ConnectionError as e:
-            print(f'Error de conexión con MongoDB: {e}')
-            self.client = None
+            self.chunks = self.db.session_chunks
+            self._chunk_indexes_ready = False
         except errors.ServerSelectionTimeoutError as e:
             print(f'Tiempo de espera excedido al intentar conectar con MongoDB: {e}')
             self.client = None
+        except errors.ConnectionFailure as e:
+            print(f'Error de conexión con MongoDB: {e}')
+            self.client = None
         except Exception as e:
             print(f'Error inesperado al conectar con MongoDB: {e}')
             self.client = None
 
-    def start_session(self, user_id):
+    def is_available(self):
+        return self.client is not None
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    def start_session(self, user_id, start_time=None):
         if self.client is None:
             print('No se pudo iniciar la sesión debido a problemas de conexión con MongoDB.')
             return None
         session = {
             'user_id': user_id,
-            'start_time': datetime.now(timezone.utc),
+            'start_time': start_time or datetime.now(timezone.utc),
             'end_time': None,
             'data': []
         }
@@ -36,11 +55,11 @@ class MongoDBManager:
             print(f'Error inesperado al iniciar la sesión en MongoDB: {e}')
             return None
 
-    def end_session(self, session_id):
+    def end_session(self, session_id, end_time=None):
         if self.client is None:
             return
         try:
-            self.sessions.update_one({'_id': session_id}, {'$set': {'end_time': datetime.now(timezone.utc)}})
+            self.sessions.update_one({'_id': session_id}, {'$set': {'end_time': end_time or datetime.now(timezone.utc)}})
         except errors.OperationFailure as e:
             print(f'Error al finalizar la sesión en MongoDB: {e}')
         except Exception as e:
@@ -58,22 +77,77 @@ class MongoDBManager:
     
     def save_data_batch(self, session_id, data_batch):
         if self.client is None:
-            return
+            return False
         try:
-            self.sessions.update_one(
-                {'_id': session_id},
+            result = self.sessions.update_one(
+                {'_id': session_id, 'layout': {'$ne': LAYOUT_CHUNKED}},
                 {'$push': {'data': {'$each': data_batch}}}
             )
+            if result.matched_count == 0 and data_batch:
+                # Sesión ya escrita en chunks por save_arrays (o inexistente)
+                timestamps, raw_values = samples_to_arrays(data_batch)
+                return self.save_arrays(session_id, timestamps, raw_values)
+            return True
+        except errors.OperationFailure as e:
+            print(f'Error al guardar datos en MongoDB: {e}')
+        except Exception as e:
+            print(f'Error inesperado al guardar datos en MongoDB: {e}')
+        return False
+
+    def save_arrays(self, session_id, timestamps, raw_values):
+        """
+        Guarda un bloque de muestras en chunks binarios (session_chunks). Una sesión sin muestras
+        pasa al formato de chunks en la primera escritura, de modo que las sesiones largas no
+        alcanzan el límite de 16 MB por documento. Las sesiones que ya tienen muestras en el
+        arreglo 'data' siguen usando ese formato.
+        """
+        if self.client is None:
+            return False
+        n = len(timestamps)
+        if n == 0:
+            return True
+        try:
+            session = self.sessions.find_one_and_update(
+                {'_id': session_id, 'data': {'$size': 0}},
+                {'$set': {'layout': LAYOUT_CHUNKED, 'sample_count': 0, 'next_index': 0, 'next_seq': 0},
+                 '$unset': {'data': ''}},
+                projection={'layout': 1}, return_document=ReturnDocument.AFTER)
+            if session is None:
+                session = self.sessions.find_one({'_id': session_id}, {'layout': 1})
+                if session is None:
+                    print(f'La sesión {session_id} no existe en MongoDB.')
+                    return False
+                if session.get('layout') != LAYOUT_CHUNKED:
+                    return self.save_data_batch(session_id, arrays_to_samples(timestamps, raw_values))
+            if not self._chunk_indexes_ready:
+                self.ensure_chunk_indexes()
+                self._chunk_indexes_ready = True
+            chunk_count = -(-n // CHUNK_SAMPLES)
+            # Se reservan primero los índices para que varios escritores no compartan seq
+            reserved = self.sessions.find_one_and_update(
+                {'_id': session_id},
+                {'$inc': {'next_index': n, 'next_seq': chunk_count}},
+                projection={'next_index': 1, 'next_seq': 1}, return_document=ReturnDocument.BEFORE)
+            start_index, seq = reserved['next_index'], reserved['next_seq']
+            for i in range(0, n, CHUNK_SAMPLES):
+                self.save_chunk(session_id, seq, start_index + i,
+                                timestamps[i:i + CHUNK_SAMPLES], raw_values[i:i + CHUNK_SAMPLES])
+                seq += 1
+            self.sessions.update_one({'_id': session_id}, {'$inc': {'sample_count': n}})
+            return True
+        except ValueError as e:
+            print(f'Error al guardar datos en MongoDB: {e}')
         except errors.OperationFailure as e:
             print(f'Error al guardar datos en MongoDB: {e}')
         except Exception as e:
             print(f'Error inesperado al guardar datos en MongoDB: {e}')
+        return False
 
     def get_user_sessions(self, user_id):
         if self.client is None:
             return []
         try:
-            return self.sessions.find({'user_id': user_id})
+            return self.sessions.find({'user_id': user_id}, {'data': 0})
         except errors.OperationFailure as e:
             print(f'Error al obtener sesiones del usuario: {e}')
             return []
@@ -86,10 +160,110 @@ class MongoDBManager:
             return None
         try:
             session = self.sessions.find_one({'_id': session_id})
-            return session['data'] if session else None
+            if session is None:
+                return None
+            if session.get('layout') == LAYOUT_CHUNKED:
+                arrays = self._read_chunked_arrays(session_id)
+                return arrays_to_samples(arrays.timestamps, arrays.raw_values)
+            return session['data']
+        except errors.OperationFailure as e:
+            print(f'Error al obtener datos de la sesión: {e}')
+            return None
+        except Exception as e:
+            print(f'Error inesperado al obtener datos de la sesión: {e}')
+            return None
+
+    def get_session_arrays(self, session_id):
+        if self.client is None:
+            return None
+        try:
+            session = self.sessions.find_one({'_id': session_id}, {'layout': 1})
+            if session is None:
+                return None
+            if session.get('layout') == LAYOUT_CHUNKED:
+                return self._read_chunked_arrays(session_id)
+            session = self.sessions.find_one({'_id': session_id}, {'data': 1})
+            return samples_to_arrays(session.get('data', []))
         except errors.OperationFailure as e:
             print(f'Error al obtener datos de la sesión: {e}')
             return None
         except Exception as e:
             print(f'Error inesperado al obtener datos de la sesión: {e}')
             return None
+
+    def get_session_version(self, session_id):
+        if self.client is None:
+            return None
+        try:
+            result = list(self.sessions.aggregate([
+                {'$match': {'_id': session_id}},
+                {'$project': {
+                    'layout': 1,
+                    'end_time': 1,
+                    'sample_count': {'$ifNull': ['$sample_count', {'$size': {'$ifNull': ['$data', []]}}]},
+                }},
+            ]))
+        except errors.PyMongoError as e:
+            print(f'Error al obtener la versión de la sesión: {e}')
+            return None
+        if not result:
+            return None
+        session = result[0]
+        return f"{session.get('layout', 'legacy')}:{session['sample_count']}:{session.get('end_time')}"
+
+    def get_legacy_samples(self, session_id, skip, limit):
+        if self.client is None:
+            return None
+        session = self.sessions.find_one({'_id': session_id}, {'data': {'$slice': [skip, limit]}})
+        return session.get('data', []) if session else None
+
+    def ensure_chunk_indexes(self):
+        if self.client is None:
+            return
+        self.chunks.create_index([('session_id', ASCENDING), ('seq', ASCENDING)], unique=True)
+
+    def save_chunk(self, session_id, seq, start_index, timestamps, raw_values):
+        if self.client is None:
+            return False
+        timestamp_bytes, raw_value_bytes = encode_samples(timestamps, raw_values)
+        self.chunks.replace_one(
+            {'session_id': session_id, 'seq': seq},
+            {
+                'session_id': session_id,
+                'seq': seq,
+                'start_index': start_index,
+                'count': len(timestamps),
+                'timestamps': timestamp_bytes,
+                'raw_values': raw_value_bytes,
+            },
+            upsert=True
+        )
+        return True
+
+    def iter_session_chunks(self, session_id):
+        if self.client is None:
+            return
+        session = self.sessions.find_one({'_id': session_id}, {'layout': 1})
+        if session is None:
+            return
+        if session.get('layout') == LAYOUT_CHUNKED:
+            yield from self._iter_chunk_documents(session_id)
+        else:
+            arrays = self.get_session_arrays(session_id)
+            if arrays is not None:
+                yield arrays.timestamps, arrays.raw_values
+
+    def _iter_chunk_documents(self, session_id):
+        cursor = self.chunks.find({'session_id': session_id}).sort('seq', ASCENDING)
+        for chunk in cursor:
+            yield decode_samples(chunk['timestamps'], chunk['raw_values'])
+
+    def _read_chunked_arrays(self, session_id):
+        timestamps = []
+        raw_values = []
+        for chunk_timestamps, chunk_raw_values in self._iter_chunk_documents(session_id):
+            timestamps.append(chunk_timestamps)
+            raw_values.append(chunk_raw_values)
+        if not timestamps:
+            return SessionArrays(np.empty(0), np.empty(0, dtype=np.int16))
+        return SessionArrays(np.concatenate(timestamps), np.concatenate(raw_values))
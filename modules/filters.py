@@ -0,0 +1,59 @@
+from functools import lru_cache
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi, sosfiltfilt
+
+
+@lru_cache(maxsize=64)
+def design_bandpass_sos(lowcut, highcut, fs, order=4):
+    """
+    Diseña (una sola vez por combinación de parámetros) un filtro pasabanda Butterworth en
+    secciones de segundo orden. El arreglo devuelto es compartido entre todos los filtros
+    con los mismos parámetros: no debe modificarse.
+    """
+    nyquist = 0.5 * fs  # Frecuencia de Nyquist
+    return butter(order, [lowcut / nyquist, highcut / nyquist], btype='band', output='sos')
+
+
+def apply_bandpass_filter(data, lowcut, highcut, fs, order=4, zero_phase=False):
+    """
+    Filtra un bloque completo de señal con el pasabanda en SOS.
+    :param zero_phase: Si es True se filtra hacia adelante y hacia atrás (sosfiltfilt). Solo tiene
+                       sentido en análisis fuera de línea, porque usa muestras futuras.
+    """
+    sos = design_bandpass_sos(lowcut, highcut, fs, order)
+    if zero_phase:
+        return sosfiltfilt(sos, data)
+    return sosfilt(sos, data)
+
+
+class StreamingBandpassFilter:
+    """
+    Pasabanda causal para señales que llegan por bloques. Conserva el estado interno (zi) entre
+    llamadas, así que filtrar cada bloque cuesta O(muestras nuevas) y el resultado es el mismo
+    que filtrar la señal completa de una vez.
+    """
+
+    def __init__(self, lowcut, highcut, fs, order=4):
+        """
+        :param lowcut: Frecuencia de corte inferior [Hz].
+        :param highcut: Frecuencia de corte superior [Hz].
+        :param fs: Frecuencia de muestreo [Hz].
+        :param order: Orden del Butterworth.
+        """
+        self.sos = design_bandpass_sos(lowcut, highcut, fs, order)
+        self.zi = None
+
+    def reset(self):
+        """Olvida el estado del filtro; el siguiente bloque se trata como el inicio de la señal."""
+        self.zi = None
+
+    def process(self, samples):
+        """Filtra un bloque de muestras y devuelve el bloque filtrado."""
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.size == 0:
+            return samples
+        if self.zi is None:
+            # Estado inicial en régimen permanente para el primer valor, evita el transitorio del escalón
+            self.zi = sosfilt_zi(self.sos) * samples[0]
+        filtered, self.zi = sosfilt(self.sos, samples, zi=self.zi)
+        return filtered
@@ -0,0 +1,201 @@
+import json
+import math
+import time
+import threading
+
+# Etapas del camino de una muestra, en orden. Cada etapa mide el tiempo desde la llegada del
+# primer byte del paquete (SYNC) que trajo la muestra.
+TRACE_STAGES = ('packet', 'decode', 'handlers', 'collector', 'dsp', 'actuator')
+TRACE_PERCENTILES = (50, 90, 99, 99.9)
+SIGNIFICANT_DIGITS = 2  # Precisión relativa de los histogramas (2 dígitos = error < 1 %)
+MAX_TRACKABLE_SECONDS = 60.0  # Latencias mayores se registran como este valor
+UNIT_SECONDS = 1e-6  # Resolución de los histogramas (1 µs)
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias al estilo HDR: buckets lineales dentro de cada potencia de dos, así
+    que el error relativo es constante (según significant_digits) desde microsegundos hasta
+    minutos con unos pocos miles de contadores. record() es O(1) y no reserva memoria.
+    """
+
+    def __init__(self, significant_digits=SIGNIFICANT_DIGITS, max_seconds=MAX_TRACKABLE_SECONDS,
+                 unit=UNIT_SECONDS):
+        """
+        :param significant_digits: Dígitos significativos que se conservan de cada valor.
+        :param max_seconds: Latencia máxima representable [s].
+        :param unit: Resolución [s] del valor más pequeño distinguible.
+        """
+        self.unit = unit
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_half = 1 << (self.sub_bucket_bits - 1)
+        self.max_value = int(max_seconds / unit)
+        self.counts = [0] * (self._index(self.max_value) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.overflow = 0
+
+    def _index(self, value):
+        bucket = max(0, value.bit_length() - self.sub_bucket_bits)
+        return ((bucket + 1) << (self.sub_bucket_bits - 1)) + (value >> bucket) - self.sub_bucket_half
+
+    def _value(self, index):
+        """Valor más alto (en unidades) equivalente al bucket index."""
+        bucket = (index >> (self.sub_bucket_bits - 1)) - 1
+        if bucket < 0:
+            return index
+        sub = (index & (self.sub_bucket_half - 1)) + self.sub_bucket_half
+        return (sub << bucket) + (1 << bucket) - 1
+
+    def record(self, seconds):
+        value = int(seconds / self.unit)
+        if value < 0:
+            value = 0
+        elif value > self.max_value:
+            value = self.max_value
+            self.overflow += 1
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        """Suma los contadores de otro histograma con los mismos parámetros."""
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.overflow += other.overflow
+
+    def percentile(self, percent):
+        """Latencia [s] bajo la que está el percent % de los valores, o None si está vacío."""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index) * self.unit, self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def buckets(self):
+        """Pares (latencia máxima del bucket [s], cantidad) de los buckets con valores."""
+        return [(self._value(index) * self.unit, count) for index, count in enumerate(self.counts) if count]
+
+    def summary(self, percentiles=TRACE_PERCENTILES):
+        return {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'overflow': self.overflow,
+            **{f'p{p:g}': self.percentile(p) for p in percentiles},
+        }
+
+
+class LatencyTracer:
+    """
+    Traza opcional de la latencia de extremo a extremo, desde que llega el primer byte de un
+    paquete por el serial hasta que el valor derivado se escribe hacia el ESP32.
+
+    Los componentes la reciben por parámetro (NeuroSkyInterface, SessionManager,
+    NeuroSkyDataCollector, NeurofeedbackEngine, ActuatorOutput); sin tracer no hacen nada
+    extra. Cada componente llama a mark(etapa, origen), donde origen es el instante de llegada
+    (clock()) del paquete más reciente que contribuyó al valor, y se registra now - origen en el
+    histograma de la etapa. Comparando los percentiles de etapas consecutivas se ve dónde se va
+    el tiempo.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, stages=TRACE_STAGES, budget=None, **histogram_kwargs):
+        """
+        :param stages: Etapas conocidas; mark() también acepta etapas nuevas.
+        :param budget: Presupuesto de latencia [s]; se cuentan los valores que lo superan por etapa.
+        :param histogram_kwargs: Parámetros de LatencyHistogram.
+        """
+        self.budget = budget
+        self.histogram_kwargs = histogram_kwargs
+        self.histograms = {stage: LatencyHistogram(**histogram_kwargs) for stage in stages}
+        self.over_budget = {stage: 0 for stage in stages}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def mark(self, stage, origin):
+        """
+        Registra la latencia de una etapa.
+        :param origin: Instante de llegada del byte (clock()); None no registra nada.
+        :return: Latencia registrada [s] o None.
+        """
+        if origin is None:
+            return None
+        latency = self.clock() - origin
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram(**self.histogram_kwargs)
+                self.over_budget[stage] = 0
+            histogram.record(latency)
+            if self.budget is not None and latency > self.budget:
+                self.over_budget[stage] += 1
+        return latency
+
+    def reset(self):
+        with self._lock:
+            for stage, histogram in self.histograms.items():
+                histogram.reset()
+                self.over_budget[stage] = 0
+            self.started = time.time()
+
+    def export(self, path=None, include_buckets=True):
+        """
+        Resumen de todas las etapas (percentiles en segundos y, opcionalmente, los buckets).
+        :param path: Si se indica, además se guarda como JSON.
+        :return: Diccionario con el resumen.
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self.histograms.items():
+                stages[stage] = histogram.summary()
+                stages[stage]['over_budget'] = self.over_budget[stage]
+                if include_buckets:
+                    stages[stage]['buckets'] = histogram.buckets()
+            report = {'started': self.started, 'exported': time.time(), 'budget': self.budget, 'stages': stages}
+        if path is not None:
+            try:
+                with open(path, 'w') as f:
+                    json.dump(report, f, indent=2)
+            except OSError as e:
+                print(f'Error al guardar la traza de latencia: {e}')
+        return report
+
+    def format_report(self):
+        """Tabla de texto con los percentiles de cada etapa en milisegundos."""
+        report = self.export(include_buckets=False)
+        columns = ['count'] + [f'p{p:g}' for p in TRACE_PERCENTILES] + ['max']
+        lines = [f"{'etapa':<12}" + ''.join(f'{column:>10}' for column in columns)]
+        for stage, summary in report['stages'].items():
+            if not summary['count']:
+                continue
+            cells = [f"{summary['count']:>10}"]
+            cells += [f'{summary[column] * 1e3:>10.2f}' for column in columns[1:]]
+            lines.append(f'{stage:<12}' + ''.join(cells))
+        if self.budget is not None:
+            lines.append(f'Presupuesto: {self.budget * 1e3:.1f} ms')
+            lines += [f"  {stage}: {summary['over_budget']} valores fuera del presupuesto"
+                      for stage, summary in report['stages'].items() if summary['over_budget']]
+        return '\n'.join(lines)
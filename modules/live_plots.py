@@ -0,0 +1,138 @@
+import numpy as np
+from matplotlib.animation import FuncAnimation
+
+LIVE_FRAME_INTERVAL = 100  # [ms] Periodo de refresco de las gráficas en vivo
+LINE_MAX_POINTS = 2000  # Puntos dibujados como máximo por línea, sin importar la ventana
+SPECTROGRAM_CMAP = 'jet'
+
+
+class RollingBuffer:
+    """
+    Búfer circular de tamaño fijo guardado dos veces seguidas, de modo que view() devuelve los
+    últimos size elementos en orden cronológico como una vista contigua, sin copiar ni reservar
+    memoria en cada cuadro.
+    """
+
+    def __init__(self, size, shape=(), fill=0.0, dtype=np.float64):
+        """
+        :param size: Número de elementos que se conservan.
+        :param shape: Forma de cada elemento (() para escalares, (bins,) para columnas).
+        :param fill: Valor inicial.
+        """
+        self.size = int(size)
+        self._data = np.full((2 * self.size,) + tuple(shape), fill, dtype=dtype)
+        self._next = 0
+        self.count = 0
+
+    def extend(self, values):
+        values = np.asarray(values)
+        if len(values) > self.size:
+            values = values[-self.size:]
+        n = len(values)
+        first = min(n, self.size - self._next)
+        for offset in (0, self.size):
+            self._data[offset + self._next:offset + self._next + first] = values[:first]
+            self._data[offset:offset + n - first] = values[first:]
+        self._next = (self._next + n) % self.size
+        self.count = min(self.size, self.count + n)
+
+    def view(self):
+        """Los últimos size elementos, del más antiguo al más reciente."""
+        return self._data[self._next:self._next + self.size]
+
+
+class LiveLine:
+    """
+    Señal en vivo sobre una ventana fija de n_points muestras. La línea se crea una sola vez
+    y cada cuadro solo actualiza sus datos; si la ventana es mayor que max_points se dibuja
+    una de cada n muestras, así que el costo por cuadro no crece con la ventana.
+    """
+
+    def __init__(self, ax, n_points, dt=1.0, max_points=LINE_MAX_POINTS, fill=0.0, **line_kwargs):
+        """
+        :param ax: Ejes donde se dibuja; sus límites no se recalculan en cada cuadro.
+        :param n_points: Muestras visibles.
+        :param dt: Separación entre muestras en el eje x (1 / fs para segundos).
+        :param max_points: Máximo de puntos dibujados.
+        :param line_kwargs: Argumentos de ax.plot.
+        """
+        self.buffer = RollingBuffer(n_points, fill=fill)
+        self.stride = max(1, -(-int(n_points) // max_points))
+        x = np.arange(int(n_points)) * dt
+        self.line, = ax.plot(x[::self.stride], self.buffer.view()[::self.stride], animated=True, **line_kwargs)
+        ax.set_xlim(x[0], x[-1] if len(x) > 1 else 1)
+
+    def extend(self, samples):
+        self.buffer.extend(samples)
+
+    def update(self):
+        self.line.set_ydata(self.buffer.view()[::self.stride])
+        return self.line,
+
+    def artists(self):
+        """Artistas animados, para los cuadros sin datos nuevos."""
+        return self.line,
+
+
+class LiveCurve:
+    """Curva con eje x fijo (por ejemplo una PSD) que se actualiza con set_ydata."""
+
+    def __init__(self, ax, x, **line_kwargs):
+        self.line, = ax.plot(x, np.zeros(len(x)), animated=True, **line_kwargs)
+
+    def update(self, y):
+        self.line.set_ydata(y)
+        return self.line,
+
+    def artists(self):
+        return self.line,
+
+
+class LiveImage:
+    """
+    Espectrograma en vivo como imagen con un búfer circular de columnas: solo se convierten a dB
+    las columnas nuevas y la imagen se actualiza con set_data, en lugar de volver a crear un
+    pcolormesh en cada cuadro. El eje de tiempo es relativo (segundos hasta el presente), así
+    que no cambia y la figura puede redibujarse con blitting.
+    """
+
+    def __init__(self, ax, freqs, n_columns, column_seconds, vmin, vmax, cmap=SPECTROGRAM_CMAP, db=True):
+        """
+        :param freqs: Frecuencias de las filas [Hz].
+        :param n_columns: Columnas visibles.
+        :param column_seconds: Separación entre columnas [s].
+        :param vmin: Límite inferior de la escala de color (en dB si db es True).
+        :param vmax: Límite superior de la escala de color.
+        :param db: Si es True las columnas se guardan como 10 * log10.
+        """
+        self.db = db
+        self.buffer = RollingBuffer(n_columns, shape=(len(freqs),), fill=vmin)
+        df = (freqs[1] - freqs[0]) / 2 if len(freqs) > 1 else 0.5
+        extent = (-n_columns * column_seconds, 0, freqs[0] - df, freqs[-1] + df)
+        self.image = ax.imshow(self.buffer.view().T, origin='lower', aspect='auto', interpolation='nearest',
+                               extent=extent, cmap=cmap, vmin=vmin, vmax=vmax, animated=True)
+
+    def extend(self, columns):
+        """:param columns: Arreglo n_columnas_nuevas × bins (potencia lineal si db es True)."""
+        columns = np.asarray(columns)
+        if self.db:
+            columns = 10 * np.log10(np.maximum(columns, 1e-10))
+        self.buffer.extend(columns)
+
+    def update(self):
+        self.image.set_data(self.buffer.view().T)
+        return self.image,
+
+    def artists(self):
+        return self.image,
+
+
+def animate(fig, update, interval=LIVE_FRAME_INTERVAL, init_func=None):
+    """
+    FuncAnimation con blitting. update debe devolver en cada cuadro todos los artistas animados,
+    también cuando no hay datos nuevos (artists()): FuncAnimation restaura el fondo bajo los
+    artistas del cuadro anterior, y con una secuencia vacía redibuja la figura completa, que no
+    incluye los artistas animados. Los títulos, ejes y escalas se configuran una sola vez antes.
+    :param init_func: Devuelve todos los artistas; se usa en el primer dibujo y al cambiar el tamaño.
+    """
+    return FuncAnimation(fig, update, interval=interval, init_func=init_func, blit=True, cache_frame_data=False)
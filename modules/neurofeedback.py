@@ -0,0 +1,210 @@
+import time
+import threading
+from collections import deque, namedtuple
+import numpy as np
+from neurosky_mm2_headset.modules.filters import StreamingBandpassFilter
+from neurosky_mm2_headset.modules.streaming_spectral import StreamingPSD
+
+FEEDBACK_FS = 512.0  # [Hz] Frecuencia de la señal cruda del auricular
+FEEDBACK_LOW_CUT = 12.0  # [Hz]
+FEEDBACK_HIGH_CUT = 30.0  # [Hz]
+FEEDBACK_HOP_SECONDS = 0.1  # [s] Cada cuánto se calcula un valor nuevo
+FEEDBACK_SEGMENT_SECONDS = 1.0  # [s] Duración de cada segmento de la PSD
+FEEDBACK_WINDOW_SECONDS = 10.0  # [s] Ventana de segmentos que se promedian
+FEEDBACK_HISTORY_SECONDS = 100.0  # [s] Historia para normalizar la métrica
+FEEDBACK_GAMMA = 2
+
+# Resultado de cada paso del motor de neurorretroalimentación
+# (origin es el instante de llegada del paquete de la muestra más reciente, si hay LatencyTracer)
+FeedbackResult = namedtuple('FeedbackResult', ['time', 'value', 'power', 'latency', 'freqs', 'psd', 'origin'])
+
+
+class RollingExtrema:
+    """
+    Mínimo y máximo de los últimos maxlen valores con colas monótonas: push() es O(1)
+    amortizado y min/max son O(1), en lugar de recorrer toda la historia en cada paso.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = int(maxlen)
+        self._index = 0
+        self._min = deque()  # (índice, valor) con valores crecientes
+        self._max = deque()  # (índice, valor) con valores decrecientes
+
+    def push(self, value):
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._min.append((self._index, value))
+        self._max.append((self._index, value))
+        oldest = self._index - self.maxlen
+        if self._min[0][0] <= oldest:
+            self._min.popleft()
+        if self._max[0][0] <= oldest:
+            self._max.popleft()
+        self._index += 1
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+
+class NeurofeedbackEngine:
+    """
+    Calcula la métrica de neurorretroalimentación (potencia media de la banda lowcut–highcut,
+    normalizada en escala logarítmica respecto a su historia) en un hilo propio cada hop_seconds,
+    independiente de la interfaz gráfica.
+
+    Las muestras llegan por raw_value_handlers de NeuroSkyInterface. Cada resultado se entrega
+    primero a los sinks (salidas hacia actuadores, ver ActuatorOutput.sink) y después a los observadores (por ejemplo,
+    una gráfica); latest() devuelve el último resultado para quien prefiera consultarlo.
+    """
+
+    def __init__(self, interface=None, fs=FEEDBACK_FS, lowcut=FEEDBACK_LOW_CUT, highcut=FEEDBACK_HIGH_CUT,
+                 hop_seconds=FEEDBACK_HOP_SECONDS, segment_seconds=FEEDBACK_SEGMENT_SECONDS,
+                 window_seconds=FEEDBACK_WINDOW_SECONDS, history_seconds=FEEDBACK_HISTORY_SECONDS,
+                 gamma=FEEDBACK_GAMMA, filter_order=2, detector=None, tracer=None):
+        """
+        :param interface: NeuroSkyInterface de la que se reciben las muestras (o None para
+                          alimentar el motor con push_samples).
+        :param fs: Frecuencia de muestreo [Hz].
+        :param lowcut: Frecuencia inferior de la banda [Hz].
+        :param highcut: Frecuencia superior de la banda [Hz].
+        :param hop_seconds: Periodo del cálculo [s]; también es el avance entre segmentos.
+        :param segment_seconds: Duración de cada segmento de la PSD [s].
+        :param window_seconds: Duración de la ventana de segmentos promediados [s].
+        :param history_seconds: Historia usada para el mínimo y el máximo de la normalización [s].
+        :param gamma: Exponente aplicado al valor normalizado.
+        :param filter_order: Orden del pasabanda aplicado antes de la PSD.
+        :param detector: ArtifactDetector opcional (se aplica a la señal sin filtrar).
+        :param tracer: LatencyTracer opcional; por defecto el de la interfaz. Registra la etapa 'dsp'.
+        """
+        self.interface = interface
+        self.tracer = tracer if tracer is not None else getattr(interface, 'tracer', None)
+        self.fs = fs
+        self.hop_seconds = hop_seconds
+        self.gamma = gamma
+        nperseg = int(segment_seconds * fs)
+        hop = max(1, int(hop_seconds * fs))
+        n_segments = max(1, int((window_seconds * fs - nperseg) // hop) + 1)
+        self.psd_engine = StreamingPSD(fs, nperseg, hop, n_segments, detector=detector)
+        self.bandpass = StreamingBandpassFilter(lowcut, highcut, fs, filter_order)
+        self.band = self.psd_engine.band_mask(lowcut, highcut)
+        self.extrema = RollingExtrema(max(1, int(history_seconds / hop_seconds)))
+
+        self.sinks = []
+        self.observers = []
+        self._samples = deque(maxlen=int(10 * window_seconds * fs))
+        self._last_arrival = None
+        self._last_origin = None
+        self._latest = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.stats = {'steps': 0, 'results': 0, 'max_latency': 0.0}
+
+    def add_sink(self, sink):
+        """Agrega una salida: un callable que recibe cada FeedbackResult."""
+        self.sinks.append(sink)
+        return sink
+
+    def add_observer(self, observer):
+        """Agrega un observador (gráficas, registros); se llama después de los sinks."""
+        self.observers.append(observer)
+        return observer
+
+    def _on_raw(self, interface, value):
+        self._samples.append(value)
+        self._last_arrival = time.perf_counter()
+        self._last_origin = interface.raw_value_origin
+
+    def push_samples(self, samples, origin=None):
+        """
+        Agrega muestras directamente, sin NeuroSkyInterface.
+        :param origin: Instante de llegada de la última muestra (LatencyTracer.clock()), si se traza.
+        """
+        self._samples.extend(samples)
+        self._last_arrival = time.perf_counter()
+        self._last_origin = origin
+
+    def start(self):
+        if self._running:
+            return
+        if self.interface is not None:
+            self.interface.raw_value_handlers.append(self._on_raw)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self.interface is not None and self._on_raw in self.interface.raw_value_handlers:
+            self.interface.raw_value_handlers.remove(self._on_raw)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def latest(self):
+        """Último FeedbackResult calculado, o None."""
+        with self._lock:
+            return self._latest
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while self._running:
+            self.step()
+            next_tick += self.hop_seconds
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # El cálculo se atrasó: se reanuda desde ahora en lugar de acumular pasos
+                next_tick = time.perf_counter()
+
+    def step(self):
+        """
+        Procesa las muestras nuevas y, si la PSD está completa, calcula y entrega un resultado.
+        :return: El FeedbackResult entregado, o None.
+        """
+        self.stats['steps'] += 1
+        arrival = self._last_arrival
+        origin = self._last_origin
+        n = len(self._samples)
+        raw_block = np.array([self._samples.popleft() for _ in range(n)], dtype=np.float64)
+        poor_signal = getattr(self.interface, 'poor_signal', None)
+        if not self.psd_engine.push(self.bandpass.process(raw_block), raw=raw_block, poor_signal=poor_signal):
+            return None
+        if not self.psd_engine.ready:
+            return None
+
+        psd = np.maximum(self.psd_engine.psd()[self.band], 1e-10)
+        power = float(psd.mean())
+        log_power = np.log10(power)
+        self.extrema.push(log_power)
+        low, high = self.extrema.min, self.extrema.max
+        if high - low == 0:
+            value = 50
+        else:
+            value = 100 * ((log_power - low) / (high - low)) ** self.gamma
+            value = float(max(0, min(100, value)))
+
+        now = time.perf_counter()
+        latency = now - arrival if arrival is not None else 0.0
+        result = FeedbackResult(time.time(), value, power, latency, self.psd_engine.freqs[self.band], psd, origin)
+        if self.tracer is not None:
+            self.tracer.mark('dsp', origin)
+        with self._lock:
+            self._latest = result
+        for callback in self.sinks + self.observers:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f'Error al entregar el resultado de neurorretroalimentación: {e}')
+        self.stats['results'] += 1
+        self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+        return result
@@ -9,7 +9,7 @@ import threading
 SAMPLE_FREQ = 512.0
 
 class NeuroSkyDataCollector:
-    def __init__(self, sample_freq=SAMPLE_FREQ, port=None, signal_type='raw', graph=False, csv_file='data.csv', save_to_csv=True):
+    def __init__(self, sample_freq=SAMPLE_FREQ, port=None, signal_type='raw', graph=False, csv_file='data.csv', save_to_csv=True, tracer=None):
         """
         Inicializa el recolector de datos del NeuroSky.
         :param sample_freq: Frecuencia de muestreo para la recolección de datos.
@@ -18,6 +18,7 @@ class NeuroSkyDataCollector:
         :param graph: Si es True, se graficarán los datos en tiempo real.
         :param csv_file: Nombre del archivo CSV donde se guardarán los datos.
         :param save_to_csv: Si es True, se guardarán los datos en un archivo CSV.
+        :param tracer: LatencyTracer opcional para medir la latencia hasta la recolección.
         """
         self.port = port
         self.signal_type = signal_type
@@ -32,6 +33,7 @@ class NeuroSkyDataCollector:
         self.data_thread = None  
         self.csv_writer = None  # Variable para manejar el archivo CSV
         self.csv_file_handle = None  # Manejador del archivo CSV
+        self.tracer = tracer
 
     def connect(self):
         """
@@ -41,7 +43,7 @@ class NeuroSkyDataCollector:
             if not self.port:
                 raise ValueError("El puerto serial no ha sido especificado.")
 
-            self.interface = NeuroSkyInterface(self.port)
+            self.interface = NeuroSkyInterface(self.port, tracer=self.tracer)
             print(f"Conectado a NeuroSky en el puerto {self.port}.")
         except serial.SerialException as e:
             raise ConnectionError(f"Error de conexión con el puerto {self.port}: {e}")
@@ -69,6 +71,9 @@ class NeuroSkyDataCollector:
                 while self.running:
                     try:
                         signal_value = self.get_signal_value(self.signal_type)
+                        if self.tracer is not None:
+                            origin = self.interface.raw_value_origin if self.signal_type == 'raw' else self.interface.packet_origin
+                            self.tracer.mark('collector', origin)
                         self.raw_data.append(signal_value)
 
                         # Guardar en el CSV el valor con el tiempo actual (si se ha habilitado)
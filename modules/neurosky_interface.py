@@ -25,6 +25,9 @@ class NeuroSkyInterface:
     RAW_VALUE = b'\x80'
     ASIC_EEG_POWER = b'\x83'
 
+    # Bandas del paquete ASIC_EEG_POWER, en el orden en que llegan
+    ASIC_BANDS = ['delta', 'theta', 'low-alpha', 'high-alpha', 'low-beta', 'high-beta', 'low-gamma', 'mid-gamma']
+
     STATUS_CONNECTED = 'connected'
     STATUS_SCANNING = 'scanning'
     STATUS_STANDBY = 'standby'
@@ -54,7 +57,11 @@ class NeuroSkyInterface:
 
             while self.interface.running:
                 try:
-                    if s.read() == NeuroSkyInterface.SYNC and s.read() == NeuroSkyInterface.SYNC:
+                    byte = s.read()
+                    # Instante de llegada del primer byte del paquete, si se traza la latencia
+                    tracer = self.interface.tracer
+                    origin = tracer.clock() if tracer is not None else None
+                    if byte == NeuroSkyInterface.SYNC and s.read() == NeuroSkyInterface.SYNC:
                         # Longitud del paquete
                         while True:
                             plength = int.from_bytes(s.read(), byteorder='big')
@@ -66,13 +73,21 @@ class NeuroSkyInterface:
                         # Lee el payload
                         payload = s.read(plength)
 
-                        # Verifica el checksum
-                        val = sum(b for b in payload[:-1])
+                        # Verifica el checksum: complemento a uno de la suma del payload completo
+                        val = sum(payload)
                         val &= 0xff
                         val = ~val & 0xff
                         chksum = int.from_bytes(s.read(), byteorder='big')
+                        if len(payload) != plength or chksum != val:
+                            self.interface.bad_packets += 1
+                            continue
 
-                        self.parse_payload(payload)
+                        if tracer is not None:
+                            tracer.mark('packet', origin)
+                        self.interface.packet_origin = origin
+                        if not self.parse_payload(payload, origin):
+                            # Payload truncado con checksum válido: se descarta el resto sin detener el listener
+                            self.interface.bad_packets += 1
                 except serial.SerialException:
                     break
                 except OSError:
@@ -82,32 +97,33 @@ class NeuroSkyInterface:
             if s and s.isOpen():
                 s.close()
 
-        def parse_payload(self, payload):
-            """Procesa el payload recibido."""
+        def parse_payload(self, payload, origin=None):
+            """
+            Procesa el payload recibido.
+            :param origin: Instante de llegada del paquete (LatencyTracer.clock()), si se traza la latencia.
+            :return: False si el payload termina a mitad de un valor; lo ya decodificado se conserva.
+            """
+            tracer = self.interface.tracer if origin is not None else None
             while payload:
                 excode = 0
-                try:
-                    code, payload = payload[0], payload[1:]
-                    code_char = struct.pack('B', code)
-                    self.interface.count = self.counter
-                    self.counter += 1
-                    if self.counter >= 100:
-                        self.counter = 0
-                except IndexError:
-                    pass
+                code, payload = payload[0], payload[1:]
+                code_char = struct.pack('B', code)
+                self.interface.count = self.counter
+                self.counter += 1
+                if self.counter >= 100:
+                    self.counter = 0
 
                 while code_char == NeuroSkyInterface.EXCODE:
+                    if not payload:
+                        return False
                     excode += 1
-                    try:
-                        code, payload = payload[0], payload[1:]
-                    except IndexError:
-                        pass
+                    code, payload = payload[0], payload[1:]
+                    code_char = struct.pack('B', code)
 
+                if not payload:
+                    return False
                 if code < 0x80:
-                    try:
-                        value, payload = payload[0], payload[1:]
-                    except IndexError:
-                        pass
+                    value, payload = payload[0], payload[1:]
                     if code_char == NeuroSkyInterface.POOR_SIGNAL:
                         old_poor_signal = self.interface.poor_signal
                         self.interface.poor_signal = value
@@ -132,10 +148,9 @@ class NeuroSkyInterface:
                         for handler in self.interface.blink_handlers:
                             handler(self.interface, self.interface.blink)
                 else:
-                    try:
-                        vlength, payload = payload[0], payload[1:]
-                    except IndexError:
-                        continue
+                    vlength, payload = payload[0], payload[1:]
+                    if vlength > len(payload):
+                        return False
                     value, payload = payload[:vlength], payload[vlength:]
 
                     if code_char == NeuroSkyInterface.RAW_VALUE and len(value) >= 2:
@@ -143,25 +158,30 @@ class NeuroSkyInterface:
                         if raw >= 32768:
                             raw -= 65536
                         self.interface.raw_value = raw
+                        self.interface.raw_value_origin = origin
+                        if tracer is not None:
+                            tracer.mark('decode', origin)
                         for handler in self.interface.raw_value_handlers:
                             handler(self.interface, self.interface.raw_value)
+                        if tracer is not None:
+                            tracer.mark('handlers', origin)
                     if code_char == NeuroSkyInterface.HEADSET_CONNECTED:
                         run_handlers = self.interface.status != NeuroSkyInterface.STATUS_CONNECTED
                         self.interface.status = NeuroSkyInterface.STATUS_CONNECTED
-                        self.interface.headset_id = value.encode('hex')
+                        self.interface.headset_id = value.hex()
                         if run_handlers:
                             for handler in self.interface.headset_connected_handlers:
                                 handler(self.interface)
                     elif code_char == NeuroSkyInterface.HEADSET_NOT_FOUND:
                         if vlength > 0:
-                            not_found_id = value.encode('hex')
+                            not_found_id = value.hex()
                             for handler in self.interface.headset_notfound_handlers:
                                 handler(self.interface, not_found_id)
                         else:
                             for handler in self.interface.headset_notfound_handlers:
                                 handler(self.interface, None)
                     elif code_char == NeuroSkyInterface.HEADSET_DISCONNECTED:
-                        headset_id = value.encode('hex')
+                        headset_id = value.hex()
                         for handler in self.interface.headset_disconnected_handlers:
                             handler(self.interface, headset_id)
                     elif code_char == NeuroSkyInterface.REQUEST_DENIED:
@@ -185,15 +205,25 @@ class NeuroSkyInterface:
                                 for handler in self.interface.standby_handlers:
                                     handler(self.interface)
                     elif code_char == NeuroSkyInterface.ASIC_EEG_POWER:
+                        if len(value) < 3 * len(NeuroSkyInterface.ASIC_BANDS):
+                            return False
                         j = 0
-                        for i in ['delta', 'theta', 'low-alpha', 'high-alpha', 'low-beta', 'high-beta', 'low-gamma', 'mid-gamma']:
-                            self.interface.waves[i] = value[j] * 255 * 255 + value[j + 1] * 255 + value[j + 2]
+                        for i in NeuroSkyInterface.ASIC_BANDS:
+                            # Cada banda es un entero sin signo de 3 bytes big-endian
+                            self.interface.waves[i] = (value[j] << 16) | (value[j + 1] << 8) | value[j + 2]
                             j += 3
                         for handler in self.interface.waves_handlers:
                             handler(self.interface, self.interface.waves)
+            return True
 
-    def __init__(self, device, headset_id=None, open_serial=True):
-        """Inicializa la interfaz con el dispositivo."""
+    def __init__(self, device, headset_id=None, open_serial=True, tracer=None):
+        """
+        Inicializa la interfaz con el dispositivo.
+        :param device: Puerto (por ejemplo 'COM10' o '/dev/ttyUSB0') o un objeto compatible con
+                       serial.Serial ya abierto, como FakeSerialPort.
+        :param tracer: LatencyTracer opcional; registra la llegada de cada paquete, su
+                       decodificación y la ejecución de los manejadores de la señal cruda.
+        """
         self.dongle = None
         self.listener = None
         self.device = device
@@ -206,7 +236,12 @@ class NeuroSkyInterface:
         self.waves = {}
         self.status = None
         self.count = 0
+        self.bad_packets = 0  # Paquetes descartados por checksum o formato inválido
         self.running = False
+        self.tracer = tracer
+        # Instante de llegada del último paquete y del que trajo el último valor crudo (con tracer)
+        self.packet_origin = None
+        self.raw_value_origin = None
 
         # Manejadores de eventos
         self.poor_signal_handlers = []
@@ -229,9 +264,12 @@ class NeuroSkyInterface:
     def serial_open(self):
         """Abre la conexión serial y comienza a escuchar los datos."""
         if not self.dongle or not self.dongle.isOpen():
-            self.dongle = serial.Serial(self.device, 115200)
+            if isinstance(self.device, str):
+                self.dongle = serial.Serial(self.device, 115200)
+            else:
+                self.dongle = self.device
 
-        if not self.listener or not self.listener.isAlive():
+        if not self.listener or not self.listener.is_alive():
             self.listener = self.SerialListener(self)
             self.listener.daemon = True
             self.listener.start()
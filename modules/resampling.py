@@ -0,0 +1,209 @@
+import os
+import numpy as np
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays
+
+RESAMPLE_FREQ = 512.0  # [Hz] Frecuencia real de la señal cruda del ThinkGear
+MAX_GAP_SECONDS = 0.1  # [s] Huecos más largos no se interpolan
+GAP_FILL_VALUE = 0.0  # Valor de los huecos largos (igual que una desconexión)
+REPEAT_WINDOW = 0.5  # [periodos de la fuente] Una lectura repetida más cercana que esto es la misma muestra
+RESAMPLE_CHUNK_SAMPLES = 1 << 20  # Muestras de entrada por bloque
+UNIFORM_TOLERANCE = 1e-6  # [s] Desviación máxima de los intervalos para considerar una rejilla uniforme
+NOMINAL_SAMPLE_FREQ = 500.0  # [Hz]
+
+
+def real_sample_rate(timestamps, nominal=NOMINAL_SAMPLE_FREQ):
+    """Frecuencia de muestreo media según los timestamps, o la nominal si no es plausible."""
+    if len(timestamps) < 2:
+        return nominal
+    time_diffs = np.diff(timestamps)
+    if np.any(time_diffs <= 0):
+        return nominal
+    rate = 1 / np.mean(time_diffs)
+    if rate > nominal * 1.5 or rate < nominal * 0.5:
+        return nominal
+    return rate
+
+
+class UniformResampler:
+    """
+    Lleva muestras con timestamps irregulares (leídas por sondeo) a una rejilla exacta de fs Hz.
+    Procesa la señal por bloques conservando la última muestra del bloque anterior, así que el
+    resultado no depende del tamaño de los bloques.
+
+    En cada bloque: se descartan las lecturas repetidas (mismo valor que la lectura anterior y a
+    menos de REPEAT_WINDOW periodos de ella, es decir, la misma muestra de la fuente leída dos
+    veces) y los timestamps que no avanzan, y los
+    puntos de la rejilla se interpolan linealmente. Los puntos que caen en un hueco de más de
+    max_gap segundos se llenan con gap_value y se cuentan en stats.
+    """
+
+    def __init__(self, fs=RESAMPLE_FREQ, max_gap=MAX_GAP_SECONDS, drop_repeats=True, gap_value=GAP_FILL_VALUE):
+        """
+        :param fs: Frecuencia de la rejilla de salida [Hz].
+        :param max_gap: Duración máxima [s] de un hueco que se interpola.
+        :param drop_repeats: Si es True se descartan las lecturas con el mismo valor que la anterior
+                             leídas antes de que la fuente pudiera producir otra muestra. Un tramo
+                             plano o saturado conserva sus muestras y no se convierte en hueco.
+        :param gap_value: Valor de los puntos dentro de huecos largos.
+        """
+        self.fs = fs
+        self.max_gap = max_gap
+        self.drop_repeats = drop_repeats
+        self.gap_value = gap_value
+        self.start_time = None
+        self._next = 0  # Índice del siguiente punto de la rejilla
+        self._last = None  # Última muestra aceptada (timestamp, valor)
+        self._last_read = None  # Última lectura (timestamp, valor), aceptada o no
+        self.stats = {'input': 0, 'duplicates': 0, 'gaps': 0, 'gap_points': 0, 'output': 0}
+
+    def process(self, timestamps, raw_values):
+        """
+        :return: (tiempos de la rejilla, valores) de los puntos que el bloque permite calcular.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        raw_values = np.asarray(raw_values, dtype=np.float64)
+        self.stats['input'] += timestamps.size
+        if timestamps.size == 0:
+            return np.empty(0), np.empty(0)
+
+        keep = np.ones(timestamps.size, dtype=bool)
+        if self.drop_repeats:
+            previous_time, previous_value = (np.nan, np.nan) if self._last_read is None else self._last_read
+            repeated = raw_values == np.r_[previous_value, raw_values[:-1]]
+            elapsed = timestamps - np.r_[previous_time, timestamps[:-1]]
+            keep &= ~(repeated & (elapsed < REPEAT_WINDOW / self.fs))
+        self._last_read = (timestamps[-1], raw_values[-1])
+        floor = -np.inf if self._last is None else self._last[0]
+        # Solo se aceptan timestamps mayores que todos los anteriores
+        running_max = np.maximum.accumulate(np.r_[floor, np.where(keep, timestamps, -np.inf)])
+        keep &= timestamps > running_max[:-1]
+        self.stats['duplicates'] += int(keep.size - np.count_nonzero(keep))
+        timestamps, raw_values = timestamps[keep], raw_values[keep]
+
+        if self._last is not None:
+            timestamps = np.r_[self._last[0], timestamps]
+            raw_values = np.r_[self._last[1], raw_values]
+        if timestamps.size == 0:
+            return np.empty(0), np.empty(0)
+        if self.start_time is None:
+            self.start_time = timestamps[0]
+        self._last = (timestamps[-1], raw_values[-1])
+
+        last = int(np.floor((timestamps[-1] - self.start_time) * self.fs + 1e-9))
+        if last < self._next:
+            return np.empty(0), np.empty(0)
+        grid = self.start_time + np.arange(self._next, last + 1) / self.fs
+        self._next = last + 1
+
+        values = np.interp(grid, timestamps, raw_values)
+        intervals = np.diff(timestamps)
+        if intervals.size and intervals.max() > self.max_gap:
+            self.stats['gaps'] += int(np.count_nonzero(intervals > self.max_gap))
+            position = np.clip(np.searchsorted(timestamps, grid, side='right') - 1, 0, intervals.size - 1)
+            in_gap = (intervals[position] > self.max_gap) & (grid > timestamps[position])
+            values[in_gap] = self.gap_value
+            self.stats['gap_points'] += int(np.count_nonzero(in_gap))
+        self.stats['output'] += grid.size
+        return grid, values
+
+
+def is_uniform(timestamps, fs, tolerance=UNIFORM_TOLERANCE, chunk_samples=RESAMPLE_CHUNK_SAMPLES):
+    """True si los timestamps ya están en una rejilla de fs Hz. Se revisan por bloques."""
+    for start in range(0, max(0, len(timestamps) - 1), chunk_samples):
+        intervals = np.diff(timestamps[start:start + chunk_samples + 1])
+        if np.abs(intervals - 1 / fs).max() > tolerance:
+            return False
+    return True
+
+
+def _grid_length(timestamps, fs, chunk_samples):
+    # Puntos de la rejilla entre la primera muestra y el timestamp máximo: cota superior exacta
+    # salvo por las lecturas descartadas al final
+    if len(timestamps) == 0:
+        return 0
+    last = max(float(np.max(timestamps[i:i + chunk_samples])) for i in range(0, len(timestamps), chunk_samples))
+    return max(0, int(np.floor((last - float(timestamps[0])) * fs + 1e-9)) + 1)
+
+
+def _truncate_npy(path, length):
+    """Reduce en el sitio un .npy 1D a sus primeros length elementos."""
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        _, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order, 'shape': (length,)}
+        f.seek(0)
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(f, header)
+        else:
+            np.lib.format.write_array_header_2_0(f, header)
+        if f.tell() != offset:
+            raise ValueError(f'No se pudo reescribir la cabecera de {path}.')
+        f.truncate(offset + length * dtype.itemsize)
+
+
+def resample_session(session_data, fs=RESAMPLE_FREQ, chunk_samples=RESAMPLE_CHUNK_SAMPLES, directory=None, **kwargs):
+    """
+    Remuestrea una sesión completa a una rejilla uniforme de fs Hz, por bloques. Con SessionArrays
+    la salida se reserva una sola vez y cada bloque se escribe en su lugar, sin listas intermedias.
+    :param session_data: SessionArrays (puede estar mapeado en memoria) o iterable de pares
+                         (timestamps, raw_values), por ejemplo backend.iter_session_chunks(id).
+    :param directory: Si se indica, el resultado se escribe en directory/timestamps.npy y
+                      directory/raw_values.npy y se devuelve mapeado en memoria (solo con SessionArrays).
+    :param kwargs: Parámetros de UniformResampler (max_gap, drop_repeats, gap_value).
+    :return: SessionArrays con timestamps uniformes y valores float32.
+    """
+    resampler = UniformResampler(fs, **kwargs)
+    if not isinstance(session_data, SessionArrays):
+        if directory is not None:
+            raise ValueError('resample_session solo escribe en disco sesiones SessionArrays.')
+        times = []
+        values = []
+        for chunk_timestamps, chunk_values in session_data:
+            grid, resampled = resampler.process(chunk_timestamps, chunk_values)
+            times.append(grid)
+            values.append(resampled.astype(np.float32))
+        if not times:
+            return SessionArrays(np.empty(0), np.empty(0, dtype=np.float32))
+        return SessionArrays(np.concatenate(times), np.concatenate(values))
+
+    timestamps, raw_values = session_data
+    length = _grid_length(timestamps, fs, chunk_samples)
+    if directory is None:
+        out = SessionArrays(np.empty(length), np.empty(length, dtype=np.float32))
+    else:
+        out = SessionArrays(*(np.lib.format.open_memmap(os.path.join(directory, f'{part}.npy'), mode='w+',
+                                                        dtype=dtype, shape=(length,))
+                              for part, dtype in zip(SessionArrays._fields, (np.float64, np.float32))))
+    n = 0
+    for i in range(0, len(timestamps), chunk_samples):
+        grid, resampled = resampler.process(timestamps[i:i + chunk_samples], raw_values[i:i + chunk_samples])
+        out.timestamps[n:n + grid.size] = grid
+        out.raw_values[n:n + grid.size] = resampled
+        n += grid.size
+    if directory is None:
+        return SessionArrays(out.timestamps[:n], out.raw_values[:n])
+    for array in out:
+        array.flush()
+    del array, out
+    for part in SessionArrays._fields:
+        if n < length:
+            _truncate_npy(os.path.join(directory, f'{part}.npy'), n)
+    return SessionArrays(*(np.load(os.path.join(directory, f'{part}.npy'), mmap_mode='r')
+                           for part in SessionArrays._fields))
+
+
+def resample_cached(session_data, fs=RESAMPLE_FREQ, **kwargs):
+    """
+    resample_session para arreglos servidos por SessionDataCache: el resultado se guarda en esa
+    caché, se calcula una vez por versión de la sesión y se devuelve mapeado en memoria. Con otros
+    arreglos equivale a resample_session.
+    """
+    cache = getattr(session_data, 'cache', None)
+    if cache is None:
+        return resample_session(session_data, fs, **kwargs)
+    # REPEAT_WINDOW forma parte del nombre para no reutilizar resultados calculados con otro criterio
+    name = f'resample|{float(fs)!r}|{REPEAT_WINDOW!r}|{sorted(kwargs.items())}'
+    return cache.derived_arrays(session_data, name,
+                                lambda directory: resample_session(session_data, fs, directory=directory, **kwargs))
@@ -0,0 +1,192 @@
+import json
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+from neurosky_mm2_headset.modules.band_power import EEG_BANDS, epoch_band_powers
+from neurosky_mm2_headset.modules.artifact_detection import ArtifactDetector
+from neurosky_mm2_headset.modules.resampling import RESAMPLE_FREQ, real_sample_rate, resample_session
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays
+from pymongo import ASCENDING, errors
+
+AGGREGATE_VERSION = 4  # Incrementar cuando cambie el cálculo de los agregados
+EPOCH_SECONDS = 2.0  # [s] Duración de cada epoch para la potencia por banda
+
+TREND_BANDS = EEG_BANDS
+
+
+class SessionAggregateCache:
+    """
+    Calcula una sola vez los agregados por sesión (potencia media por banda, duración, etc.) y los
+    guarda en la colección 'session_aggregates', indexados por sesión y conjunto de parámetros.
+    Las consultas de tendencia entre sesiones se responden desde esa colección con agregaciones
+    de MongoDB, sin volver a leer las muestras.
+    """
+
+    def __init__(self, db_manager, bands=None, epoch_seconds=EPOCH_SECONDS, version=AGGREGATE_VERSION,
+                 reject_artifacts=True, resample_freq=RESAMPLE_FREQ):
+        """
+        :param db_manager: MongoDBManager con las sesiones.
+        :param bands: Diccionario nombre -> (frecuencia baja, frecuencia alta) en Hz.
+        :param epoch_seconds: Duración en segundos de cada epoch sobre el que se calcula la potencia.
+        :param version: Versión del algoritmo; los agregados de otra versión se consideran obsoletos.
+        :param reject_artifacts: Si es True los epochs con artefactos no entran en la potencia media.
+        :param resample_freq: Frecuencia [Hz] a la que se remuestrea la sesión antes de calcular
+                              (None para usar las muestras tal como se guardaron).
+        """
+        self.db_manager = db_manager
+        self.bands = dict(bands or TREND_BANDS)
+        self.epoch_seconds = epoch_seconds
+        self.version = version
+        self.reject_artifacts = reject_artifacts
+        self.resample_freq = resample_freq
+        self.params = {'bands': self.bands, 'epoch_seconds': epoch_seconds, 'reject_artifacts': reject_artifacts,
+                       'resample_freq': resample_freq}
+        self.params_key = self._params_key()
+        self.aggregates = None
+        if db_manager.client is not None:
+            self.aggregates = db_manager.db.session_aggregates
+            try:
+                self.aggregates.create_index([('session_id', ASCENDING), ('params_key', ASCENDING)], unique=True)
+                self.aggregates.create_index([('user_id', ASCENDING), ('params_key', ASCENDING),
+                                              ('start_time', ASCENDING)])
+            except errors.PyMongoError as e:
+                print(f'Error al crear los índices de agregados: {e}')
+
+    def _params_key(self):
+        payload = json.dumps({'params': self.params, 'version': self.version}, sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def compute_metrics(self, arrays):
+        """
+        Calcula los agregados de una sesión a partir de sus arreglos (timestamps, raw_values).
+        :return: Diccionario con la potencia media por banda y estadísticas de la señal.
+        """
+        sample_count = len(arrays[1])
+        if self.resample_freq:
+            arrays = resample_session(SessionArrays(*arrays), self.resample_freq)
+        timestamps, raw_values = arrays
+        raw_values = np.asarray(raw_values, dtype=np.float64)
+        n = raw_values.shape[0]
+        fs = self.resample_freq or real_sample_rate(timestamps)
+        metrics = {
+            'sample_count': int(sample_count),
+            'duration': float(n / fs),
+            'sample_rate': float(fs),
+            'raw_mean': float(raw_values.mean()) if n else None,
+            'raw_std': float(raw_values.std()) if n else None,
+        }
+        n_epochs = n // int(self.epoch_seconds * fs)
+        detector = ArtifactDetector(fs) if self.reject_artifacts else None
+        powers = np.empty((0, len(self.bands)))
+        if n_epochs:
+            _, powers = epoch_band_powers(raw_values, fs, self.epoch_seconds, self.bands, detector=detector)
+        metrics['rejected_epochs'] = (1 - len(powers) / n_epochs) if n_epochs else None
+        for i, band in enumerate(self.bands):
+            metrics[band] = float(powers[:, i].mean()) if len(powers) else None
+        return metrics
+
+    def ensure_sessions(self, sessions):
+        """
+        Calcula y guarda los agregados de las sesiones que aún no los tienen en caché para la
+        versión y los parámetros actuales.
+        :param sessions: Documentos de sesión con al menos _id, user_id y start_time.
+        :return: Número de sesiones calculadas.
+        """
+        if self.aggregates is None:
+            return 0
+        sessions = [s for s in sessions if s.get('end_time') is not None]
+        ids = [s['_id'] for s in sessions]
+        cached = {d['session_id'] for d in self.aggregates.find(
+            {'session_id': {'$in': ids}, 'params_key': self.params_key}, {'session_id': 1})}
+
+        computed = 0
+        for session in sessions:
+            if session['_id'] in cached:
+                continue
+            arrays = self.db_manager.get_session_arrays(session['_id'])
+            if arrays is None:
+                continue
+            self.aggregates.replace_one(
+                {'session_id': session['_id'], 'params_key': self.params_key},
+                {
+                    'session_id': session['_id'],
+                    'user_id': session['user_id'],
+                    'start_time': session['start_time'],
+                    'params_key': self.params_key,
+                    'params': self.params,
+                    'algorithm_version': self.version,
+                    'metrics': self.compute_metrics(arrays),
+                    'computed_at': datetime.now(timezone.utc),
+                },
+                upsert=True
+            )
+            computed += 1
+        return computed
+
+    def invalidate_stale(self):
+        """Elimina los agregados calculados con otra versión del algoritmo."""
+        if self.aggregates is None:
+            return 0
+        return self.aggregates.delete_many({'algorithm_version': {'$ne': self.version}}).deleted_count
+
+    def invalidate_session(self, session_id):
+        """Elimina los agregados de una sesión (por ejemplo, si sus datos cambiaron)."""
+        if self.aggregates is None:
+            return 0
+        return self.aggregates.delete_many({'session_id': session_id}).deleted_count
+
+    def trend(self, user_id, metric, start=None, end=None, granularity=None):
+        """
+        Serie temporal de un agregado para un usuario.
+        :param user_id: Usuario.
+        :param metric: Nombre del agregado ('high-beta', 'duration', etc.).
+        :param start: Fecha inicial (datetime) o None.
+        :param end: Fecha final (datetime) o None.
+        :param granularity: None para un punto por sesión, o 'day', 'week', 'month' para agrupar
+                            con media, mínimo, máximo y número de sesiones.
+        :return: Lista de diccionarios ordenada por fecha.
+        """
+        if self.aggregates is None:
+            return []
+
+        time_filter = {}
+        if start is not None:
+            time_filter['$gte'] = start
+        if end is not None:
+            time_filter['$lte'] = end
+
+        session_query = {'user_id': user_id, 'end_time': {'$ne': None}}
+        if time_filter:
+            session_query['start_time'] = time_filter
+        try:
+            sessions = list(self.db_manager.sessions.find(
+                session_query, {'user_id': 1, 'start_time': 1, 'end_time': 1}))
+            self.ensure_sessions(sessions)
+
+            match = {'user_id': user_id, 'params_key': self.params_key, f'metrics.{metric}': {'$ne': None}}
+            if time_filter:
+                match['start_time'] = time_filter
+            pipeline = [{'$match': match}, {'$sort': {'start_time': 1}}]
+
+            if granularity is None:
+                pipeline.append({'$project': {'_id': 0, 'session_id': 1, 'start_time': 1,
+                                              'value': f'$metrics.{metric}'}})
+            else:
+                pipeline += [
+                    {'$group': {
+                        '_id': {'$dateTrunc': {'date': '$start_time', 'unit': granularity}},
+                        'mean': {'$avg': f'$metrics.{metric}'},
+                        'min': {'$min': f'$metrics.{metric}'},
+                        'max': {'$max': f'$metrics.{metric}'},
+                        'sessions': {'$sum': 1},
+                    }},
+                    {'$sort': {'_id': 1}},
+                    {'$project': {'_id': 0, 'start_time': '$_id', 'mean': 1, 'min': 1, 'max': 1, 'sessions': 1}},
+                ]
+            return list(self.aggregates.aggregate(pipeline))
+        except errors.OperationFailure as e:
+            print(f'Error al consultar la tendencia: {e}')
+            return []
+        except Exception as e:
+            print(f'Error inesperado al consultar la tendencia: {e}')
+            return []
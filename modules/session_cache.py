@@ -0,0 +1,338 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays, arrays_to_samples
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'neurosky_sessions')
+MAX_DISK_BYTES = 2 * 1024 ** 3  # 2 GiB
+MAX_MEMORY_SESSIONS = 8
+
+
+class CachedSessionArrays(SessionArrays):
+    """
+    SessionArrays servidos por SessionDataCache. Recuerdan la caché, la sesión y su versión, de
+    modo que los resultados que se calculan a partir de ellos (remuestreo, tiles del espectrograma)
+    se guardan en la misma caché y se expulsan junto con la sesión.
+    """
+
+    def derived_name(self, name):
+        """Nombre de un resultado derivado de estos arreglos, para SessionDataCache.derived_entry."""
+        return f'{self.name}|{name}' if self.name else name
+
+
+def _tag(arrays, cache, session_id, version, name=''):
+    arrays = CachedSessionArrays(*arrays)
+    arrays.cache = cache
+    arrays.session_id = session_id
+    arrays.version = version
+    arrays.name = name
+    return arrays
+
+
+def _disk_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class SessionDataCache:
+    """
+    Caché transparente de los arreglos decodificados de las sesiones. Se usa en lugar del backend
+    de almacenamiento: get_session_arrays y get_session_data se sirven desde memoria o desde
+    archivos .npy mapeados en memoria, y el resto de métodos se delega al backend.
+
+    Cada entrada se identifica por el id de la sesión y su versión (get_session_version del
+    backend), así que una sesión que recibe datos nuevos o se compacta se vuelve a leer. Los
+    resultados derivados de una sesión (derived_entry) comparten el LRU y el límite de disco, y se
+    borran cuando cambia la versión de la sesión.
+
+    Los archivos expulsados que no se pueden borrar (en Windows, mientras siguen mapeados en
+    memoria) quedan pendientes: cuentan para el límite de disco y se reintentan en cada expulsión
+    y en close().
+    """
+
+    def __init__(self, backend, cache_dir=DEFAULT_CACHE_DIR, max_disk_bytes=MAX_DISK_BYTES,
+                 max_memory_sessions=MAX_MEMORY_SESSIONS):
+        """
+        :param backend: Backend de almacenamiento (StorageBackend).
+        :param cache_dir: Directorio de los archivos de caché.
+        :param max_disk_bytes: Tamaño máximo en disco; se expulsan las entradas usadas hace más tiempo.
+        :param max_memory_sessions: Número de sesiones mapeadas que se mantienen abiertas en memoria.
+        """
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_sessions = max_memory_sessions
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'delete_failures': 0}
+        self._pending_delete = OrderedDict()  # Archivo relativo a cache_dir -> bytes, aún sin borrar
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._index = self._load_index()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            return OrderedDict()
+        # Descarta entradas cuyos archivos ya no existen
+        return OrderedDict((key, entry) for key, entry in index.items()
+                           if all(os.path.exists(os.path.join(self.cache_dir, name))
+                                  for name in self._files(key, entry)))
+
+    def _save_index(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self._index.items()), f)
+        os.replace(tmp_path, self._index_path)
+
+    def _key(self, session_id, version):
+        digest = hashlib.sha1(f'{session_id}|{version}'.encode()).hexdigest()[:16]
+        return f'{session_id}-{digest}'
+
+    def _path(self, key, part):
+        return os.path.join(self.cache_dir, f'{key}.{part}.npy')
+
+    def _files(self, key, entry=None):
+        """Archivos o directorios de una entrada, relativos a cache_dir."""
+        if entry and entry.get('files'):
+            return entry['files']
+        return [os.path.basename(self._path(key, part)) for part in SessionArrays._fields]
+
+    def get_session_arrays(self, session_id):
+        """Arreglos (timestamps, raw_values) de la sesión, mapeados en memoria desde la caché."""
+        version = self.backend.get_session_version(session_id)
+        if version is None:
+            return None
+        key = self._key(session_id, version)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+            if key in self._index:
+                arrays = self._open(key)
+                if arrays is not None:
+                    arrays = _tag(arrays, self, session_id, version)
+                    self._touch(key)
+                    self._remember(key, arrays)
+                    self.stats['disk_hits'] += 1
+                    return arrays
+
+            self.stats['misses'] += 1
+        arrays = self.backend.get_session_arrays(session_id)
+        if arrays is None:
+            return None
+        with self._lock:
+            self._store(session_id, version, key, arrays)
+            cached = self._open(key)
+            if cached is None:
+                return arrays
+            cached = _tag(cached, self, session_id, version)
+            self._remember(key, cached)
+            return cached
+
+    def get_session_data(self, session_id):
+        """Lista de muestras {'timestamp', 'raw_value'}, construida a partir de los arreglos en caché."""
+        arrays = self.get_session_arrays(session_id)
+        if arrays is None:
+            return None
+        return arrays_to_samples(arrays.timestamps, arrays.raw_values)
+
+    def derived_entry(self, session_id, version, name):
+        """
+        Ubicación en la caché de un resultado calculado a partir de una versión de la sesión.
+        :param name: Identifica el resultado y sus parámetros.
+        :return: (key, path, cached). Si cached es False, el resultado se escribe en path (archivo
+                 o directorio) y se registra después con store_derived.
+        """
+        key = self._key(session_id, f'{version}|{name}')
+        path = os.path.join(self.cache_dir, f'{key}.derived')
+        with self._lock:
+            if key in self._index:
+                self._touch(key)
+                return key, path, True
+            self._pending_delete.pop(os.path.basename(path), None)
+        # Restos de un cálculo interrumpido que nunca se registró
+        shutil.rmtree(path, ignore_errors=True)
+        return key, path, False
+
+    def derived_arrays(self, session_data, name, compute):
+        """
+        SessionArrays calculados a partir de arreglos de esta caché (por ejemplo la sesión
+        remuestreada). Se calculan una vez por versión de la sesión y se sirven mapeados en memoria.
+        :param session_data: CachedSessionArrays devueltos por get_session_arrays o derived_arrays.
+        :param name: Identifica el resultado y sus parámetros.
+        :param compute: compute(directory) escribe directory/timestamps.npy y directory/raw_values.npy.
+        """
+        session_id, version = session_data.session_id, session_data.version
+        name = session_data.derived_name(name)
+        key, directory, cached = self.derived_entry(session_id, version, name)
+        with self._lock:
+            if cached and key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not cached:
+            try:
+                os.makedirs(directory)
+                compute(directory)
+            except BaseException:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+            self.store_derived(session_id, version, key, [directory])
+        try:
+            arrays = SessionArrays(*(np.load(os.path.join(directory, f'{part}.npy'), mmap_mode='r')
+                                     for part in SessionArrays._fields))
+        except (OSError, ValueError) as e:
+            print(f'Error al leer {name} de la caché: {e}')
+            with self._lock:
+                self._evict(key)
+                self._save_index()
+            return None
+        arrays = _tag(arrays, self, session_id, version, name)
+        with self._lock:
+            self._remember(key, arrays)
+        return arrays
+
+    def store_derived(self, session_id, version, key, paths):
+        """Registra en el LRU los archivos o directorios ya escritos de un resultado derivado."""
+        with self._lock:
+            self._evict_stale(session_id, version)
+            for path in paths:
+                self._pending_delete.pop(os.path.relpath(path, self.cache_dir), None)
+            self._index[key] = {'bytes': sum(_disk_size(path) for path in paths), 'last_access': time.time(),
+                                'version': version,
+                                'files': [os.path.relpath(path, self.cache_dir) for path in paths]}
+            self._enforce_disk_limit(keep=key)
+            self._save_index()
+
+    def invalidate(self, session_id=None):
+        """Elimina de la caché una sesión (todas sus versiones) o, sin argumentos, todas."""
+        with self._lock:
+            prefix = f'{session_id}-' if session_id is not None else ''
+            for key in [k for k in self._index if k.startswith(prefix)]:
+                self._evict(key)
+            self._retry_pending_deletes()
+            self._save_index()
+
+    def _open(self, key):
+        try:
+            return SessionArrays(*(np.load(self._path(key, part), mmap_mode='r') for part in SessionArrays._fields))
+        except (OSError, ValueError):
+            self._evict(key)
+            return None
+
+    def _evict_stale(self, session_id, version):
+        # Las entradas de versiones anteriores de la misma sesión ya no sirven
+        for old_key in [k for k, entry in self._index.items()
+                        if k.startswith(f'{session_id}-') and entry.get('version') != version]:
+            self._evict(old_key)
+
+    def _store(self, session_id, version, key, arrays):
+        self._evict_stale(session_id, version)
+
+        size = 0
+        for part, values in zip(SessionArrays._fields, arrays):
+            path = self._path(key, part)
+            # Una expulsión anterior de la misma entrada no debe borrar los archivos nuevos
+            self._pending_delete.pop(os.path.basename(path), None)
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(path + '.tmp', path)
+            size += os.path.getsize(path)
+        self._index[key] = {'bytes': size, 'last_access': time.time(), 'version': version}
+        self._enforce_disk_limit(keep=key)
+        self._save_index()
+
+    def _touch(self, key):
+        self._index[key]['last_access'] = time.time()
+        self._index.move_to_end(key)
+
+    def _remember(self, key, arrays):
+        self._memory[key] = arrays
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_sessions:
+            self._memory.popitem(last=False)
+
+    def _enforce_disk_limit(self, keep=None):
+        self._retry_pending_deletes()
+        total = sum(entry['bytes'] for entry in self._index.values()) + sum(self._pending_delete.values())
+        for key in list(self._index):
+            if total <= self.max_disk_bytes:
+                break
+            if key == keep:
+                continue
+            pending = sum(self._pending_delete.values())
+            total -= self._index[key]['bytes']
+            self._evict(key)
+            # Lo que no se pudo borrar sigue ocupando disco
+            total += sum(self._pending_delete.values()) - pending
+            self.stats['evictions'] += 1
+
+    def _evict(self, key):
+        self._memory.pop(key, None)
+        entry = self._index.pop(key, None)
+        for name in self._files(key, entry):
+            path = os.path.join(self.cache_dir, name)
+            if self._remove(path):
+                continue
+            try:
+                size = _disk_size(path)
+            except OSError:
+                size = 0
+            self._pending_delete[name] = size
+            self.stats['delete_failures'] += 1
+
+    @staticmethod
+    def _remove(path):
+        """:return: False si el archivo o directorio sigue en disco."""
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _retry_pending_deletes(self):
+        for name in list(self._pending_delete):
+            if self._remove(os.path.join(self.cache_dir, name)):
+                del self._pending_delete[name]
+
+    def cache_info(self):
+        """Estadísticas de aciertos y fallos junto con el uso actual de memoria y disco."""
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            return dict(self.stats,
+                        hit_rate=hits / lookups if lookups else 0.0,
+                        memory_sessions=len(self._memory),
+                        disk_entries=len(self._index),
+                        disk_bytes=sum(entry['bytes'] for entry in self._index.values()),
+                        pending_deletes=len(self._pending_delete),
+                        pending_bytes=sum(self._pending_delete.values()))
+
+    def close(self):
+        """Suelta los arreglos mapeados, reintenta los borrados pendientes y cierra el backend."""
+        with self._lock:
+            self._memory.clear()
+            self._retry_pending_deletes()
+            if self._pending_delete:
+                print(f'Caché de sesiones: {len(self._pending_delete)} archivos expulsados siguen en uso y no '
+                      f'se pudieron borrar de {self.cache_dir}.')
+        self.backend.close()
@@ -0,0 +1,46 @@
+from collections import namedtuple
+import numpy as np
+
+LAYOUT_LEGACY = 'legacy'
+LAYOUT_CHUNKED = 'chunked'
+CHUNK_SAMPLES = 65536
+TIMESTAMP_DTYPE = np.dtype('<f8')
+RAW_VALUE_DTYPE = np.dtype('<i2')
+
+SessionArrays = namedtuple('SessionArrays', ['timestamps', 'raw_values'])
+
+
+def encode_samples(timestamps, raw_values):
+    """
+    Codifica un bloque de muestras en el formato binario compacto de los chunks:
+    timestamps como float64 little-endian y valores crudos como int16 little-endian.
+    :raises ValueError: Si algún valor no cabe en int16 o las longitudes no coinciden.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    raw_values = np.asarray(raw_values)
+    if timestamps.shape != raw_values.shape:
+        raise ValueError('Los timestamps y los valores crudos deben tener la misma longitud.')
+    if raw_values.size and (raw_values.min() < -32768 or raw_values.max() > 32767):
+        raise ValueError('Hay valores crudos fuera del rango de int16.')
+    return (timestamps.astype(TIMESTAMP_DTYPE, copy=False).tobytes(),
+            raw_values.astype(RAW_VALUE_DTYPE).tobytes())
+
+
+def decode_samples(timestamp_bytes, raw_value_bytes):
+    """Decodifica un chunk binario a los arreglos (timestamps, raw_values)."""
+    timestamps = np.frombuffer(timestamp_bytes, dtype=TIMESTAMP_DTYPE)
+    raw_values = np.frombuffer(raw_value_bytes, dtype=RAW_VALUE_DTYPE)
+    return timestamps, raw_values
+
+
+def samples_to_arrays(session_data):
+    """Convierte una lista de muestras {'timestamp', 'raw_value'} en SessionArrays."""
+    timestamps = np.fromiter((d['timestamp'] for d in session_data), dtype=np.float64, count=len(session_data))
+    raw_values = np.fromiter((d['raw_value'] for d in session_data), dtype=np.int64, count=len(session_data))
+    return SessionArrays(timestamps, raw_values)
+
+
+def arrays_to_samples(timestamps, raw_values):
+    """Convierte arreglos de muestras en la lista de diccionarios del formato por muestra."""
+    return [{'timestamp': t, 'raw_value': v} for t, v in zip(np.asarray(timestamps).tolist(),
+                                                             np.asarray(raw_values).tolist())]
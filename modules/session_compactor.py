@@ -0,0 +1,219 @@
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from pymongo import errors
+from neurosky_mm2_headset.modules.session_chunks import LAYOUT_CHUNKED, CHUNK_SAMPLES, decode_samples
+
+MAX_SAMPLES_PER_SECOND = 500000  # Límite de muestras copiadas por segundo para no saturar la base en vivo
+SESSION_PAUSE = 1.0  # [s] Pausa entre sesiones
+IDLE_INTERVAL = 60.0  # [s] Espera antes de volver a buscar sesiones cuando no hay pendientes
+
+STATE_COPYING = 'copying'
+STATE_VERIFYING = 'verifying'
+STATE_DONE = 'done'
+STATE_SKIPPED = 'skipped'
+
+
+class SessionCompactor:
+    """
+    Reescribe las sesiones antiguas (arreglo 'data' con un subdocumento por muestra) al formato
+    compacto de chunks binarios, verifica la copia muestra a muestra y libera el arreglo original.
+
+    El progreso se guarda en el campo 'compaction' de cada sesión, de modo que un trabajo
+    interrumpido continúa donde se quedó. Solo se compactan sesiones ya finalizadas.
+    """
+
+    def __init__(self, db_manager, chunk_samples=CHUNK_SAMPLES, max_samples_per_second=MAX_SAMPLES_PER_SECOND,
+                 session_pause=SESSION_PAUSE):
+        """
+        :param db_manager: MongoDBManager con la colección de sesiones y de chunks.
+        :param chunk_samples: Número de muestras por chunk binario.
+        :param max_samples_per_second: Límite de muestras copiadas o verificadas por segundo (None para no limitar).
+        :param session_pause: Pausa en segundos entre sesiones.
+        """
+        self.db_manager = db_manager
+        self.chunk_samples = chunk_samples
+        self.max_samples_per_second = max_samples_per_second
+        self.session_pause = session_pause
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'compacted': 0, 'skipped': 0, 'samples': 0}
+
+    def pending_sessions(self):
+        """Identificadores de las sesiones finalizadas que aún usan el formato por muestra."""
+        query = {
+            'end_time': {'$ne': None},
+            'layout': {'$ne': LAYOUT_CHUNKED},
+            'compaction.state': {'$ne': STATE_SKIPPED},
+        }
+        return [s['_id'] for s in self.db_manager.sessions.find(query, {'_id': 1})]
+
+    def start(self, run_forever=False):
+        """Inicia la compactación en un hilo de fondo. Detener con stop()."""
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f'Error inesperado en la compactación: {e}')
+                if not run_forever:
+                    break
+                self._stop_event.wait(IDLE_INTERVAL)
+
+        self.thread = threading.Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Detiene la compactación; el progreso queda guardado para reanudarla después."""
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run_once(self):
+        """Compacta todas las sesiones pendientes y devuelve las estadísticas acumuladas."""
+        if self.db_manager.client is None:
+            print('No se puede compactar: no hay conexión con MongoDB.')
+            return self.stats
+        self.db_manager.ensure_chunk_indexes()
+        for session_id in self.pending_sessions():
+            if self._stop_event.is_set():
+                break
+            try:
+                self.compact_session(session_id)
+            except errors.PyMongoError as e:
+                print(f'Error de MongoDB al compactar la sesión {session_id}: {e}')
+            except Exception as e:
+                print(f'Error inesperado al compactar la sesión {session_id}: {e}')
+            self._stop_event.wait(self.session_pause)
+        return self.stats
+
+    def compact_session(self, session_id):
+        """
+        Compacta una sesión. Devuelve True si la sesión quedó en formato de chunks, False si
+        se omitió o se interrumpió (en cuyo caso puede reanudarse más tarde).
+        """
+        sessions = self.db_manager.sessions
+        session = sessions.find_one({'_id': session_id}, {'compaction': 1, 'layout': 1, 'end_time': 1})
+        if session is None or session.get('layout') == LAYOUT_CHUNKED or session.get('end_time') is None:
+            return False
+
+        total = self._legacy_length(session_id)
+        progress = session.get('compaction') or {}
+        if progress.get('total') != total:
+            # Sesión nueva para el compactador, o el arreglo cambió desde el último intento
+            progress = {'state': STATE_COPYING, 'total': total, 'next_index': 0, 'next_seq': 0}
+            self.db_manager.chunks.delete_many({'session_id': session_id})
+            sessions.update_one({'_id': session_id}, {'$set': {'compaction': progress}})
+
+        if progress['state'] == STATE_COPYING:
+            if not self._copy_chunks(session_id, progress):
+                return False
+            progress['state'] = STATE_VERIFYING
+            sessions.update_one({'_id': session_id}, {'$set': {'compaction.state': STATE_VERIFYING}})
+
+        if not self.verify_session(session_id, total):
+            return False
+
+        result = sessions.update_one(
+            {'_id': session_id, 'data': {'$size': total}},
+            {
+                '$set': {
+                    'layout': LAYOUT_CHUNKED,
+                    'sample_count': total,
+                    # Contadores que MongoDBManager.save_arrays reserva para seguir agregando chunks
+                    'next_index': total,
+                    'next_seq': progress['next_seq'],
+                    'compaction.state': STATE_DONE,
+                    'compaction.finished_at': datetime.now(timezone.utc),
+                },
+                '$unset': {'data': ''},
+            }
+        )
+        if result.modified_count != 1:
+            print(f'La sesión {session_id} cambió durante la compactación; se reintentará más tarde.')
+            sessions.update_one({'_id': session_id}, {'$unset': {'compaction': ''}})
+            return False
+
+        self.stats['compacted'] += 1
+        print(f'Sesión {session_id} compactada ({total} muestras).')
+        return True
+
+    def verify_session(self, session_id, total):
+        """Compara muestra a muestra los chunks escritos con el arreglo original de la sesión."""
+        index = 0
+        for chunk in self.db_manager.chunks.find({'session_id': session_id}).sort('seq', 1):
+            if self._stop_event.is_set():
+                return False
+            timestamps, raw_values = decode_samples(chunk['timestamps'], chunk['raw_values'])
+            if chunk['start_index'] != index:
+                return self._skip(session_id, f'chunk {chunk["seq"]} fuera de orden')
+            legacy = self.db_manager.get_legacy_samples(session_id, index, len(timestamps))
+            legacy_timestamps, legacy_values = self._legacy_arrays(legacy)
+            if legacy_timestamps is None or not (np.array_equal(legacy_timestamps, timestamps)
+                                                 and np.array_equal(legacy_values, raw_values)):
+                return self._skip(session_id, f'diferencias en las muestras {index}-{index + len(timestamps)}')
+            index += len(timestamps)
+            self._throttle(len(timestamps))
+        if index != total:
+            return self._skip(session_id, f'se verificaron {index} de {total} muestras')
+        return True
+
+    def _copy_chunks(self, session_id, progress):
+        index = progress['next_index']
+        seq = progress['next_seq']
+        total = progress['total']
+        while index < total:
+            if self._stop_event.is_set():
+                return False
+            samples = self.db_manager.get_legacy_samples(session_id, index, self.chunk_samples)
+            timestamps, raw_values = self._legacy_arrays(samples)
+            if timestamps is None or len(timestamps) == 0:
+                self._skip(session_id, 'muestras sin timestamp o raw_value')
+                return False
+            try:
+                self.db_manager.save_chunk(session_id, seq, index, timestamps, raw_values)
+            except ValueError as e:
+                self._skip(session_id, str(e))
+                return False
+            index += len(timestamps)
+            seq += 1
+            progress['next_index'], progress['next_seq'] = index, seq
+            self.db_manager.sessions.update_one(
+                {'_id': session_id},
+                {'$set': {'compaction.next_index': index, 'compaction.next_seq': seq}}
+            )
+            self.stats['samples'] += len(timestamps)
+            self._throttle(len(timestamps))
+        return True
+
+    def _legacy_length(self, session_id):
+        result = list(self.db_manager.sessions.aggregate([
+            {'$match': {'_id': session_id}},
+            {'$project': {'n': {'$size': {'$ifNull': ['$data', []]}}}},
+        ]))
+        return result[0]['n'] if result else 0
+
+    def _legacy_arrays(self, samples):
+        try:
+            timestamps = np.array([d['timestamp'] for d in samples], dtype=np.float64)
+            raw_values = np.array([d['raw_value'] for d in samples])
+        except (KeyError, TypeError):
+            return None, None
+        return timestamps, raw_values
+
+    def _skip(self, session_id, reason):
+        print(f'Se omite la compactación de la sesión {session_id}: {reason}.')
+        self.db_manager.chunks.delete_many({'session_id': session_id})
+        self.db_manager.sessions.update_one(
+            {'_id': session_id},
+            {'$set': {'compaction.state': STATE_SKIPPED, 'compaction.reason': reason}}
+        )
+        self.stats['skipped'] += 1
+        return False
+
+    def _throttle(self, samples):
+        if self.max_samples_per_second:
+            self._stop_event.wait(samples / self.max_samples_per_second)
@@ -1,16 +1,24 @@
-from matplotlib import animation
 import serial
 from datetime import datetime
 import time
 import threading
 import csv
 import numpy as np
-from numpy.fft import fft, rfft
-from scipy.signal import spectrogram, butter, filtfilt
+from scipy.signal import spectrogram
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
 from matplotlib.dates import DateFormatter
 from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+from neurosky_mm2_headset.modules.session_chunks import SessionArrays, samples_to_arrays
+from neurosky_mm2_headset.modules.streaming_spectral import StreamingPSD, StreamingSpectrogram
+from neurosky_mm2_headset.modules.session_spectral import (SegmentedPSDCache, pooled_spectrogram,
+                                                          plot_spectrogram_image, welch_psd)
+from neurosky_mm2_headset.modules.spectrogram_tiles import session_tiles
+from neurosky_mm2_headset.modules.resampling import RESAMPLE_FREQ, is_uniform, resample_cached
+from neurosky_mm2_headset.modules.artifact_detection import ArtifactDetector
+from neurosky_mm2_headset.modules.filters import StreamingBandpassFilter
+from neurosky_mm2_headset.modules.live_plots import LiveCurve, LiveImage, LiveLine, animate
+from collections import deque
 
 SAMPLE_ATTEMPT_FREQ = 500.0  # [Hz]
 MAX_LIVE_SAMPLES = 1000
@@ -21,38 +29,35 @@ BATCH_SIZE = 1000
 GRAPH_INTERVAL = 1000
 X_AXIS_TYPE = 'log'
 NORMALIZE_SXX = False
-
-def butter_bandpass(lowcut, highcut, fs, order=4):
-    nyquist = 0.5 * fs  # Frecuencia de Nyquist
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
-
-def apply_bandpass_filter(data, lowcut, highcut, fs, order=4):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
+PSD_SEGMENT = int(SAMPLE_ATTEMPT_FREQ)  # Muestras por segmento de la PSD en vivo (1 s)
+PSD_HOP = PSD_SEGMENT // 4
+LIVE_SPECTROGRAM_SECONDS = 10  # Ancho de la ventana del espectrograma en vivo [s]
+SPECTROGRAM_FMAX = 30  # [Hz]
+SPECTROGRAM_PLOT_FMAX = 100  # [Hz]
+SPECTROGRAM_DISPLAY_COLUMNS = 2000  # Columnas de tiempo del espectrograma de una sesión
+RESAMPLE_SESSION_FREQ = RESAMPLE_FREQ  # [Hz] Rejilla de las sesiones leídas (None para no remuestrear)
 
 class SessionManager:
-    def __init__(self, db_manager, device_port):
+    def __init__(self, db_manager, device_port, tracer=None):
         self.db_manager = db_manager
         self.device_port = device_port
+        self.tracer = tracer  # LatencyTracer opcional
         self.current_session_id = None
         self.is_collecting = False
         self.interface = None
-        self.raw_data = []
+        self.raw_data = deque(maxlen=MAX_LIVE_SAMPLES)
         self.zero_count = 0
         self.collection_thread = None
         self.plot_type = 'raw'
+        self.resample_freq = RESAMPLE_SESSION_FREQ
         self._data_count = 0
-        self.max_Sxx_value = -np.inf
         self.power_lowcut = 12.0 
         self.power_highcut = 30.0  
+        self._new_samples = deque(maxlen=10 * GRAPH_INTERVAL)
 
     def connect_interface(self):
         try:
-            self.interface = NeuroSkyInterface(self.device_port)
+            self.interface = NeuroSkyInterface(self.device_port, tracer=self.tracer)
         except serial.SerialException as e:
             print(f'Error al conectar con el dispositivo NeuroSky: {e}')
             self.interface = None
@@ -74,7 +79,7 @@ class SessionManager:
             return 
 
         self.is_collecting = True
-        self.raw_data = []
+        self.raw_data = deque(maxlen=MAX_LIVE_SAMPLES)
         self.zero_count = 0
         self.collect_data()
 
@@ -98,7 +103,10 @@ class SessionManager:
                 try:
                     current_time = time.time() 
                     raw_value = self.interface.raw_value
+                    if self.tracer is not None:
+                        self.tracer.mark('collector', self.interface.raw_value_origin)
                     self.raw_data.append(raw_value)
+                    self._new_samples.append(raw_value)
 
                     if raw_value == 0:
                         self.zero_count += 1
@@ -147,111 +155,127 @@ class SessionManager:
         self.collection_thread.daemon = True
         self.collection_thread.start()
 
+    def drain_new_samples(self):
+        # Muestras recibidas desde la última llamada, para las vistas que procesan de forma incremental
+        n = len(self._new_samples)
+        return np.array([self._new_samples.popleft() for _ in range(n)], dtype=np.float64)
+
     def set_plot_type(self, plot_type):
         self.plot_type = plot_type
 
     def initialize_plot(self):
+        """
+        Gráfica en vivo del tipo plot_type. Los artistas se crean una sola vez y cada cuadro solo
+        actualiza sus datos con blitting; cada cuadro procesa únicamente las muestras nuevas.
+        """
+        fig, update = self.live_plot()
+        ani = animate(fig, update)
+        plt.show()
+
+    def live_plot(self, window_seconds=None):
+        """
+        Crea la figura de la gráfica en vivo del tipo plot_type sin mostrarla.
+        :param window_seconds: Ventana visible [s]; por defecto MAX_LIVE_SAMPLES muestras para
+                               'raw', GRAPH_INTERVAL muestras para 'frequency' y
+                               LIVE_SPECTROGRAM_SECONDS para 'spectrogram'.
+        :return: (figura, update), donde update(frame) procesa las muestras nuevas y devuelve los
+                 artistas animados.
+        """
         fig, ax = plt.subplots(figsize=(10, 6))
+        self.drain_new_samples()
+        update = lambda frame: ()
         
         if self.plot_type == 'raw':
-            ax.set_xlim(0, MAX_LIVE_SAMPLES)
             ax.set_ylim(-2048, 2047)
             ax.set_title('Señal Cruda del EEG en Tiempo Real')
             ax.set_xlabel('Muestras')
             ax.set_ylabel('Amplitud (µV)')
-            line, = ax.plot([], [], lw=2, color='red')
+            n_samples = MAX_LIVE_SAMPLES if window_seconds is None else int(window_seconds * SAMPLE_ATTEMPT_FREQ)
+            live_line = LiveLine(ax, n_samples, lw=2, color='red')
 
             def update_raw(frame):
-                if len(self.raw_data) > MAX_LIVE_SAMPLES:
-                    self.raw_data.pop(0)
-                line.set_data(range(len(self.raw_data)), self.raw_data)
-                return line,
+                raw_block = self.drain_new_samples()
+                if not raw_block.size:
+                    return live_line.artists()
+                live_line.extend(raw_block)
+                return live_line.update()
 
-            ani = animation.FuncAnimation(fig, update_raw, blit=True, interval=1/SAMPLE_ATTEMPT_FREQ)
+            update = update_raw
 
         elif self.plot_type == 'frequency':
             ax.set_title('Espectro de Potencia en Tiempo Real')
             ax.set_xlabel('Frecuencia (Hz)')
             ax.set_ylabel('Amplitud (dB)') 
 
-            def update_frequency(frame):
-                if len(self.raw_data) >= GRAPH_INTERVAL:
-                    raw_values = np.array(self.raw_data[-GRAPH_INTERVAL:])
-                    self._data_count = 0
-                    Fs = SAMPLE_ATTEMPT_FREQ
-                    filtered_signal = apply_bandpass_filter(raw_values, self.power_lowcut, self.power_highcut, Fs, 6)
-
-                    dt = 1 / Fs  
-                    N = filtered_signal.shape[0]
-                    T = N * dt
-
-                    print(f'Filtered mean: {filtered_signal.mean()}')
-
-                    xf = fft(filtered_signal - filtered_signal.mean())
-                    Sxx = 2 * dt ** 2 / T * (xf * xf.conj())
-                    Sxx = Sxx[:int(len(filtered_signal) / 2)]
-
-                    Sxx = np.maximum(Sxx.real, 1e-10)
-
-                    print(f'Filtered Sxx mean: {Sxx.mean()}')
-
-                    df = 1 / T
-                    fNQ = 1 / dt / 2
-                    faxis = np.arange(0, fNQ, df)
-
-                    limit_index = np.where((faxis >= 12) & (faxis <= 30))[0]
-                    faxis_limited = faxis[limit_index]
-                    Sxx_limited = Sxx[limit_index]
-
-                    print(f'Filtered Sxx_limited mean: {Sxx_limited.mean()}')
+            # Los segmentos con artefactos (detectados sobre la señal sin filtrar) no entran en la PSD
+            n_samples = GRAPH_INTERVAL if window_seconds is None else int(window_seconds * SAMPLE_ATTEMPT_FREQ)
+            psd_engine = StreamingPSD(SAMPLE_ATTEMPT_FREQ, PSD_SEGMENT, PSD_HOP,
+                                      max(1, (n_samples - PSD_SEGMENT) // PSD_HOP + 1),
+                                      detector=ArtifactDetector(SAMPLE_ATTEMPT_FREQ))
+            bandpass = StreamingBandpassFilter(self.power_lowcut, self.power_highcut, SAMPLE_ATTEMPT_FREQ, 6)
+            band = psd_engine.band_mask(self.power_lowcut, self.power_highcut)
+            faxis_limited = psd_engine.freqs[band]
+            ax.set_xscale(X_AXIS_TYPE)
+            ax.set_xlim([self.power_lowcut, self.power_highcut])
+            ax.set_ylim([-60, 0] if NORMALIZE_SXX else [-10, 500])
+            live_curve = LiveCurve(ax, faxis_limited)
 
-                    ax.clear()
-                    ax.set_xlim([12, 30])
-
-                    if NORMALIZE_SXX:
-                        ax.set_ylim([-60, 0])
-                        ax.plot(faxis_limited, 10 * np.log10(Sxx_limited / np.max(Sxx_limited)))
-                    else:
-                        ax.set_ylim([-10, 500])
-                        ax.plot(faxis_limited, Sxx_limited)
-
-                    if X_AXIS_TYPE == 'log':
-                        ax.set_xscale('log')
-                    else:
-                        ax.set_xscale('linear')
-
-                return ax,
+            def update_frequency(frame):
+                raw_block = self.drain_new_samples()
+                if not psd_engine.push(bandpass.process(raw_block), raw=raw_block,
+                                       poor_signal=self.interface.poor_signal) or not psd_engine.ready:
+                    return live_curve.artists()
+                Sxx_limited = np.maximum(psd_engine.psd()[band], 1e-10)
+                if NORMALIZE_SXX:
+                    return live_curve.update(10 * np.log10(Sxx_limited / np.max(Sxx_limited)))
+                return live_curve.update(Sxx_limited)
 
-            ani = animation.FuncAnimation(fig, update_frequency, interval=1000)
+            update = update_frequency
 
         elif self.plot_type == 'spectrogram':
             ax.set_title('Espectrograma en Tiempo Real')
             ax.set_xlabel('Tiempo [s]')
             ax.set_ylabel('Frecuencia [Hz]')
 
-            def update_spectrogram(frame):
-                if (len(self.raw_data) >= GRAPH_INTERVAL):
-                    raw_values = np.array(self.raw_data[-self._data_count:])
-                    self._data_count = 0
-                    Fs = SAMPLE_ATTEMPT_FREQ
-                    f, t, Sxx = spectrogram(raw_values, fs=Fs, nperseg=int(Fs), noverlap=int(Fs*0.95))
-                    self.max_Sxx_value = max(self.max_Sxx_value, np.max(Sxx))
-                    print(self.max_Sxx_value)
-                    ax.clear()
-                    pcm = ax.pcolormesh(t, f, 10 * np.log10(Sxx), cmap='jet', vmin=0, vmax=10 * np.log10(10000))
-                    ax.set_ylim([0, 30])
+            nperseg = int(SAMPLE_ATTEMPT_FREQ)
+            hop = nperseg - int(SAMPLE_ATTEMPT_FREQ * 0.95)
+            seconds = LIVE_SPECTROGRAM_SECONDS if window_seconds is None else window_seconds
+            stft = StreamingSpectrogram(SAMPLE_ATTEMPT_FREQ, nperseg, hop,
+                                        max(1, (int(seconds * SAMPLE_ATTEMPT_FREQ) - nperseg) // hop + 1),
+                                        fmax=SPECTROGRAM_FMAX)
+            live_image = LiveImage(ax, stft.freqs, stft.n_columns, hop / SAMPLE_ATTEMPT_FREQ,
+                                   vmin=0, vmax=10 * np.log10(10000))
+            ax.set_ylim([0, SPECTROGRAM_FMAX])
+            fig.colorbar(live_image.image, ax=ax).set_label('Amplitud (dB)')
 
-                return ax,
-
-            ani = animation.FuncAnimation(fig, update_spectrogram, interval=1000)
-
-        plt.show()
+            def update_spectrogram(frame):
+                n_new = stft.push(self.drain_new_samples())
+                if not n_new:
+                    return live_image.artists()
+                live_image.extend(stft.latest_columns(n_new))
+                return live_image.update()
+
+            update = update_spectrogram
+
+        return fig, update
+
+    def session_arrays(self, session_data):
+        """
+        Arreglos (timestamps, raw_values) de la sesión. Si resample_freq no es None, las muestras
+        leídas por sondeo se llevan a una rejilla uniforme de resample_freq Hz antes del análisis;
+        con sesiones leídas de SessionDataCache el resultado se guarda en la caché.
+        """
+        if not isinstance(session_data, SessionArrays):
+            session_data = samples_to_arrays(session_data)
+        if self.resample_freq and not is_uniform(session_data.timestamps, self.resample_freq):
+            session_data = resample_cached(session_data, self.resample_freq)
+        return session_data
 
     def calculate_real_sample_rate(self, session_data):
-        if len(session_data) < 2:
+        timestamps = self.session_arrays(session_data).timestamps
+        if len(timestamps) < 2:
             return SAMPLE_ATTEMPT_FREQ 
         
-        timestamps = np.array([d['timestamp'] for d in session_data])
         time_diffs = np.diff(timestamps)
         
         if np.any(time_diffs <= 0):
@@ -265,36 +289,48 @@ class SessionManager:
         return real_sample_rate
 
 
-    def plot_power_spectrum(self, session_data):
-        raw_values = np.array([d['raw_value'] for d in session_data])
+    def plot_power_spectrum(self, session_data, show=True):
+        """
+        PSD de Welch de la sesión completa (segmentos de WELCH_SEGMENT_SECONDS, FFT en lotes con
+        todos los núcleos). Los arreglos mapeados en memoria se leen por partes.
+        :param show: Si es False no se llama a plt.show() (por ejemplo, para dibujar sin pantalla).
+        :return: La figura, o None si no se pudo calcular.
+        """
+        session_data = self.session_arrays(session_data)
         Fs = self.calculate_real_sample_rate(session_data)
         if Fs is None:
             print('No hay suficientes datos para calcular la tasa de muestreo.')
             return
-        dt = 1 / Fs  
-        N = raw_values.shape[0]
-        T = N * dt
-
-        xf = fft(raw_values - raw_values.mean())  
-        Sxx = 2 * dt ** 2 / T * (xf * xf.conj())  
-        Sxx = Sxx[:int(len(raw_values) / 2)] 
-
-        Sxx = np.maximum(Sxx.real, 1e-10)
 
-        df = 1 / T
-        fNQ = 1 / dt / 2
-        faxis = np.arange(0, fNQ, df)
+        detector = ArtifactDetector(Fs)
+        result = welch_psd(session_data.raw_values, Fs, detector=detector)
+        if result is None:
+            print('La sesión es demasiado corta (o sin segmentos válidos) para calcular el espectro.')
+            return
+        print(f'Espectro calculado con {result.segments} segmentos en {result.elapsed:.2f} s '
+              f'({detector.stats["rejected"]} descartados por artefactos).')
+        Sxx = np.maximum(result.psd, 1e-10)
 
-        plt.figure(figsize=(10, 6))
+        fig = plt.figure(figsize=(10, 6))
         plt.ylim([-60, 0])
-        plt.plot(faxis, 10 * np.log10(Sxx.real / max(Sxx.real)))  
+        plt.plot(result.freqs, 10 * np.log10(Sxx / Sxx.max()))
         plt.title('Espectro de Potencia')
         plt.xlabel('Frecuencia (Hz)')
         plt.ylabel('Amplitud [dB]')
-        plt.show()
-
-    def plot_spectrogram(self, session_data):
-        raw_values = np.array([d['raw_value'] for d in session_data])
+        if show:
+            plt.show()
+        return fig
+
+    def plot_spectrogram(self, session_data, chunked=True, pooling='mean', show=True):
+        """
+        :param chunked: Si es True la sesión se procesa por bloques y se reduce a
+                        SPECTROGRAM_DISPLAY_COLUMNS columnas (memoria acotada en sesiones largas);
+                        si es False se calcula el espectrograma completo.
+        :param pooling: 'mean' o 'max', cómo se combinan las columnas en el modo por bloques.
+        :param show: Si es False no se llama a plt.show().
+        :return: La figura, o None si no se pudo calcular.
+        """
+        session_data = self.session_arrays(session_data)
         Fs = self.calculate_real_sample_rate(session_data)
         if Fs is None:
             print('No hay suficientes datos para calcular la tasa de muestreo.')
@@ -304,25 +340,43 @@ class SessionManager:
         nperseg = int(Fs)
         noverlap = int(nperseg * 0.95)
 
-        f, t, Sxx = spectrogram(raw_values, fs=Fs, nperseg=nperseg, noverlap=noverlap)
-
-        plt.figure()
-        plt.pcolormesh(t, f, 10 * np.log10(Sxx), cmap='jet')
-        plt.colorbar()
+        fig = plt.figure()
+        if chunked:
+            result = pooled_spectrogram(session_data.raw_values, Fs, nperseg, noverlap,
+                                        n_columns=SPECTROGRAM_DISPLAY_COLUMNS, pooling=pooling,
+                                        fmax=SPECTROGRAM_PLOT_FMAX)
+            if result is None:
+                print('La sesión es demasiado corta para calcular el espectrograma.')
+                return
+            image = plot_spectrogram_image(plt.gca(), *result)
+        else:
+            raw_values = np.asarray(session_data.raw_values, dtype=np.float64)
+            f, t, Sxx = spectrogram(raw_values, fs=Fs, nperseg=nperseg, noverlap=noverlap)
+            image = plt.pcolormesh(t, f, 10 * np.log10(Sxx), cmap='jet')
+        plt.colorbar(image)
         plt.xlabel('Tiempo [s]')
         plt.ylabel('Frecuencia [Hz]')
         plt.title('Espectrograma')
-        plt.ylim([0, 100])  
-        plt.show()
-
-    def plot_power_spectrum_with_sliders(self, session_data):
-        raw_values = np.array([d['raw_value'] for d in session_data])
+        plt.ylim([0, SPECTROGRAM_PLOT_FMAX])  
+        if show:
+            plt.show()
+        return fig
+
+    def plot_power_spectrum_with_sliders(self, session_data, show=True):
+        """
+        :param show: Si es False no se llama a plt.show().
+        :return: (figura, slider de intervalo, slider de posición), o None si no se pudo calcular.
+        """
+        session_data = self.session_arrays(session_data)
+        raw_values = np.asarray(session_data.raw_values, dtype=np.float64)
         Fs = self.calculate_real_sample_rate(session_data)
         if Fs is None:
             print('No hay suficientes datos para calcular la tasa de muestreo.')
             return
         
         total_samples = len(raw_values)
+        # Periodogramas por segmento calculados una vez: cada movimiento del slider cuesta O(bins)
+        psd_cache = SegmentedPSDCache(raw_values, Fs)
         total_time_minutes = total_samples / (Fs * 60)
 
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -344,25 +398,15 @@ class SessionManager:
             if end_idx > total_samples:
                 end_idx = total_samples
 
-            raw_values_subset = raw_values[start_idx:end_idx]
-
-            dt = 1 / Fs  
-            N = raw_values_subset.shape[0]
-            T = N * dt
-
-            xf = fft(raw_values_subset - raw_values_subset.mean())  
-            Sxx = 2 * dt ** 2 / T * (xf * xf.conj())  
-            Sxx = Sxx[:N // 2] 
-
-            Sxx = np.maximum(Sxx.real, 1e-10)
-
-            df = 1 / T
-            fNQ = 1 / dt / 2
-            faxis = np.arange(0, fNQ, df)[:N // 2] 
+            result = psd_cache.psd(start_idx, end_idx)
+            if result is None:
+                return
+            faxis, Sxx = result
+            Sxx = np.maximum(Sxx, 1e-10)
 
             ax.clear()
             ax.set_ylim([-60, 0])  
-            ax.plot(faxis, 10 * np.log10(Sxx.real / max(Sxx.real))) 
+            ax.plot(faxis, 10 * np.log10(Sxx / Sxx.max()))
             ax.set_xlabel('Frecuencia [Hz]')
             ax.set_ylabel('Amplitud [dB]')
             ax.set_title('Espectro de Potencia')
@@ -373,19 +417,29 @@ class SessionManager:
         slider_pos.on_changed(update)
 
         update(None)
-        plt.show()
-
-    def plot_spectrogram_with_sliders(self, session_data):
-        raw_values = np.array([d['raw_value'] for d in session_data])
-        raw_values = raw_values - np.mean(raw_values)
+        if show:
+            plt.show()
+        return fig, slider_interval, slider_pos
+
+    def plot_spectrogram_with_sliders(self, session_data, show=True):
+        """
+        :param show: Si es False no se llama a plt.show().
+        :return: (figura, slider de intervalo, slider de posición), o None si no se pudo calcular.
+        """
+        session_data = self.session_arrays(session_data)
         Fs = self.calculate_real_sample_rate(session_data)
         if Fs is None:
             print('No hay suficientes datos para calcular la tasa de muestreo.')
             return
         
-        total_samples = len(raw_values)
+        total_samples = len(session_data.raw_values)
         total_time_minutes = total_samples / (Fs * 60)
 
+        nperseg = int(Fs)
+        noverlap = int(nperseg * 0.95)
+        # Se calcula una sola vez (o se lee del disco); los sliders solo copian columnas ya calculadas
+        tiles = session_tiles(session_data, Fs, nperseg, noverlap, fmax=SPECTROGRAM_FMAX)
+
         fig, ax = plt.subplots(figsize=(10, 6))
         plt.subplots_adjust(bottom=0.35)
 
@@ -399,34 +453,34 @@ class SessionManager:
             interval_minutes = slider_interval.val
             pos_minutes = slider_pos.val
 
-            start_idx = int(pos_minutes * Fs * 60)
-            end_idx = int(start_idx + interval_minutes * Fs * 60)
-
-            if end_idx > total_samples:
-                end_idx = total_samples
-
-            raw_values_subset = raw_values[start_idx:end_idx]
-
-            nperseg = int(Fs)
-            noverlap = int(nperseg * 0.95)
-
-            f, t, Sxx = spectrogram(raw_values_subset, fs=Fs, nperseg=nperseg, noverlap=noverlap)
+            result = tiles.view(pos_minutes * 60, (pos_minutes + interval_minutes) * 60,
+                                max_columns=SPECTROGRAM_DISPLAY_COLUMNS)
+            if result is None:
+                return
 
             ax.clear()
-            ax.pcolormesh(t, f, 10 * np.log10(Sxx), cmap='jet')
+            plot_spectrogram_image(ax, *result)
             ax.set_xlabel('Tiempo [s]')
             ax.set_ylabel('Frecuencia [Hz]')
             ax.set_title('Espectrograma')
-            ax.set_ylim([0, 30])  
+            ax.set_ylim([0, SPECTROGRAM_FMAX])  
             fig.canvas.draw_idle()
 
         slider_interval.on_changed(update)
         slider_pos.on_changed(update)
 
         update(None)
-        plt.show()
+        if show:
+            plt.show()
+        return fig, slider_interval, slider_pos
 
     def export_session_to_csv(self, session_data, filename):
+        if isinstance(session_data, SessionArrays):
+            with open(filename, 'w', newline='') as output_file:
+                writer = csv.writer(output_file)
+                writer.writerow(['timestamp', 'raw_value'])
+                writer.writerows(zip(session_data.timestamps.tolist(), session_data.raw_values.tolist()))
+            return
         keys = session_data[0].keys()
         with open(filename, 'w', newline='') as output_file:
             dict_writer = csv.DictWriter(output_file, keys)
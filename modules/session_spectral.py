@@ -0,0 +1,252 @@
+import time
+from collections import namedtuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len, rfft, rfftfreq
+from scipy.signal import get_window
+from neurosky_mm2_headset.modules.resampling import real_sample_rate
+from neurosky_mm2_headset.modules.streaming_spectral import SegmentStream, density_scale, segment_periodograms
+
+DISPLAY_COLUMNS = 2000  # Columnas de tiempo del espectrograma que se dibujan
+BLOCK_SEGMENTS = 1024  # Segmentos que se procesan a la vez
+PSD_CACHE_SEGMENT_SECONDS = 2.0  # [s] Duración de los segmentos de SegmentedPSDCache
+WELCH_SEGMENT_SECONDS = 4.0  # [s] Duración de los segmentos de welch_psd
+WELCH_BATCH_SEGMENTS = 2048  # Segmentos por llamada a rfft en welch_psd
+
+# PSD de Welch de una sesión completa: frecuencias, densidad, segmentos promediados y tiempo [s]
+WelchPSD = namedtuple('WelchPSD', ['freqs', 'psd', 'segments', 'elapsed'])
+
+
+def segment_count(n_samples, nperseg, hop):
+    """Número de segmentos completos de nperseg muestras separados por hop."""
+    return (n_samples - nperseg) // hop + 1 if n_samples >= nperseg else 0
+
+
+def spectrogram_blocks(raw_values, fs, nperseg, hop, fmax=None, window=('tukey', 0.25),
+                       block_segments=BLOCK_SEGMENTS):
+    """
+    Columnas del espectrograma (periodogramas de los segmentos) calculadas por bloques, leyendo
+    de raw_values solo las muestras de cada bloque.
+    :return: (freqs, generador de (índice del primer segmento, arreglo segmentos × bins)).
+    """
+    nperseg = int(nperseg)
+    hop = int(hop)
+    window = get_window(window, nperseg)
+    freqs = rfftfreq(nperseg, 1 / fs)
+    n_bins = freqs.size if fmax is None else int(np.searchsorted(freqs, fmax, side='right'))
+    scale = density_scale(window, fs, nperseg)[:n_bins]
+    n_segments = segment_count(len(raw_values), nperseg, hop)
+
+    def blocks():
+        for first in range(0, n_segments, block_segments):
+            last = min(first + block_segments, n_segments)
+            block = np.asarray(raw_values[first * hop:(last - 1) * hop + nperseg], dtype=np.float64)
+            segments = sliding_window_view(block, nperseg)[::hop]
+            yield first, segment_periodograms(segments, window, 1.0)[:, :n_bins] * scale
+
+    return freqs[:n_bins], blocks()
+
+
+def pooled_spectrogram(raw_values, fs, nperseg, noverlap, n_columns=DISPLAY_COLUMNS, pooling='mean',
+                       fmax=None, window=('tukey', 0.25), block_segments=BLOCK_SEGMENTS):
+    """
+    Espectrograma de una sesión completa calculado por bloques y reducido mientras se calcula a
+    n_columns columnas de tiempo, de modo que la memoria máxima depende de n_columns y del tamaño
+    de bloque, no de la duración de la sesión. Con n_columns mayor o igual al número de
+    segmentos el resultado es el mismo que el de scipy.signal.spectrogram.
+    :param raw_values: Señal (arreglo o arreglo mapeado en memoria; se lee por bloques).
+    :param fs: Frecuencia de muestreo [Hz].
+    :param nperseg: Muestras por segmento.
+    :param noverlap: Muestras de solapamiento entre segmentos.
+    :param n_columns: Columnas de tiempo del resultado.
+    :param pooling: 'mean' o 'max': cómo se combinan los segmentos de cada columna.
+    :param fmax: Si se indica, solo se guardan los bins hasta fmax Hz.
+    :param block_segments: Segmentos por bloque.
+    :return: (f, t, Sxx) con Sxx de forma bins × columnas, o None si la señal es más corta que nperseg.
+    """
+    if pooling not in ('mean', 'max'):
+        raise ValueError(f"pooling debe ser 'mean' o 'max', no {pooling!r}.")
+    nperseg = int(nperseg)
+    hop = nperseg - int(noverlap)
+    n_segments = segment_count(len(raw_values), nperseg, hop)
+    if n_segments <= 0:
+        return None
+
+    freqs, blocks = spectrogram_blocks(raw_values, fs, nperseg, hop, fmax, window, block_segments)
+    n_columns = min(int(n_columns), n_segments)
+    edges = np.linspace(0, n_segments, n_columns + 1).astype(int)
+    pooled = np.zeros((n_columns, freqs.size))
+    counts = np.diff(edges)
+
+    for first, periodograms in blocks:
+        # Columna de salida de cada segmento del bloque; son consecutivas, así que basta reduceat
+        columns = np.searchsorted(edges, np.arange(first, first + len(periodograms)), side='right') - 1
+        starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+        targets = columns[starts]
+        if pooling == 'max':
+            pooled[targets] = np.maximum(pooled[targets], np.maximum.reduceat(periodograms, starts, axis=0))
+        else:
+            pooled[targets] += np.add.reduceat(periodograms, starts, axis=0)
+
+    if pooling == 'mean':
+        pooled /= counts[:, None]
+    # Tiempo de cada columna: centro de sus segmentos
+    times = ((edges[:-1] + edges[1:] - 1) / 2 * hop + nperseg / 2) / fs
+    return freqs, times, pooled.T
+
+
+def plot_spectrogram_image(ax, f, t, Sxx, cmap='jet'):
+    """
+    Dibuja un espectrograma en dB como una sola imagen (imshow) en lugar de una malla de
+    cuadriláteros, lo que mantiene el dibujo rápido aunque haya muchas columnas.
+    :return: El AxesImage creado.
+    """
+    dt = t[1] - t[0] if len(t) > 1 else 1.0
+    df = f[1] - f[0] if len(f) > 1 else 1.0
+    extent = (t[0] - dt / 2, t[-1] + dt / 2, f[0] - df / 2, f[-1] + df / 2)
+    return ax.imshow(10 * np.log10(np.maximum(Sxx, 1e-20)), aspect='auto', origin='lower', extent=extent,
+                     cmap=cmap, interpolation='nearest')
+
+
+class SegmentedPSDCache:
+    """
+    PSD promedio de cualquier intervalo de una sesión en O(bins).
+
+    La sesión se divide una sola vez en segmentos consecutivos de nperseg muestras, se calcula
+    el periodograma de cada uno y se guarda su suma acumulada. La PSD de un intervalo es la
+    diferencia de dos filas de la suma acumulada más, si el intervalo no está alineado, el
+    periodograma exacto de los trozos parciales de los extremos (con relleno de ceros hasta
+    nperseg y ponderado por su longitud).
+    """
+
+    def __init__(self, raw_values, fs, nperseg=None, window='hann', fmax=None, block_segments=BLOCK_SEGMENTS):
+        """
+        :param raw_values: Señal de la sesión (arreglo o arreglo mapeado en memoria).
+        :param fs: Frecuencia de muestreo [Hz].
+        :param nperseg: Muestras por segmento (por defecto PSD_CACHE_SEGMENT_SECONDS).
+        :param window: Ventana de scipy.signal.get_window.
+        :param fmax: Si se indica, solo se guardan los bins hasta fmax Hz.
+        :param block_segments: Segmentos que se calculan a la vez al construir la caché.
+        """
+        self.raw_values = raw_values
+        self.fs = fs
+        self.nperseg = int(nperseg or PSD_CACHE_SEGMENT_SECONDS * fs)
+        self.window_name = window
+        self.window = get_window(window, self.nperseg)
+        freqs = rfftfreq(self.nperseg, 1 / fs)
+        self._n_bins = freqs.size if fmax is None else int(np.searchsorted(freqs, fmax, side='right'))
+        self.freqs = freqs[:self._n_bins]
+        self.scale = density_scale(self.window, fs, self.nperseg)[:self._n_bins]
+        self.n_segments = len(raw_values) // self.nperseg
+
+        # Fila i: suma de los periodogramas de los segmentos 0..i-1
+        self._cumulative = np.zeros((self.n_segments + 1, self._n_bins))
+        total = np.zeros(self._n_bins)
+        for first in range(0, self.n_segments, block_segments):
+            last = min(first + block_segments, self.n_segments)
+            block = np.asarray(raw_values[first * self.nperseg:last * self.nperseg], dtype=np.float64)
+            periodograms = segment_periodograms(block.reshape(-1, self.nperseg), self.window, 1.0)
+            cumulative = np.cumsum(periodograms[:, :self._n_bins] * self.scale, axis=0) + total
+            self._cumulative[first + 1:last + 1] = cumulative
+            total = cumulative[-1]
+
+    def _edge_periodogram(self, start, end):
+        """Periodograma exacto de un trozo de menos de nperseg muestras, en la rejilla de freqs."""
+        piece = np.asarray(self.raw_values[start:end], dtype=np.float64)
+        window = get_window(self.window_name, piece.size)
+        spectrum = rfft((piece - piece.mean()) * window, n=self.nperseg)[:self._n_bins]
+        scale = density_scale(window, self.fs, self.nperseg)[:self._n_bins]
+        return (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+
+    def psd(self, start, end):
+        """
+        PSD promedio del intervalo de muestras [start, end).
+        :return: (freqs, psd), o None si el intervalo tiene menos de dos muestras.
+        """
+        start = max(0, int(start))
+        end = min(len(self.raw_values), int(end))
+        if end - start < 2:
+            return None
+
+        first = -(-start // self.nperseg)  # Primer segmento completo dentro del intervalo
+        last = min(end // self.nperseg, self.n_segments)
+        if first > last:
+            # El intervalo cae dentro de un solo segmento
+            return self.freqs, self._edge_periodogram(start, end)
+
+        total = self._cumulative[last] - self._cumulative[first]
+        weight = float(last - first)
+        for edge_start, edge_end in ((start, first * self.nperseg), (last * self.nperseg, end)):
+            if edge_end - edge_start >= 2:
+                edge_weight = (edge_end - edge_start) / self.nperseg
+                total = total + edge_weight * self._edge_periodogram(edge_start, edge_end)
+                weight += edge_weight
+        if weight == 0:
+            return self.freqs, self._edge_periodogram(start, end)
+        return self.freqs, total / weight
+
+
+def welch_psd(raw_chunks, fs, nperseg=None, noverlap=None, window='hann', workers=-1,
+              batch_segments=WELCH_BATCH_SEGMENTS, detector=None):
+    """
+    PSD de Welch de una señal completa que se lee por partes. Los segmentos se calculan en lotes
+    de batch_segments con una llamada a scipy.fft.rfft que usa varios hilos, y la FFT se hace con
+    next_fast_len muestras (relleno de ceros). Solo se acumula la suma de los periodogramas, así
+    que la memoria no depende de la duración de la señal.
+    :param raw_chunks: Arreglo (por ejemplo mapeado en memoria) o iterable de arreglos consecutivos.
+    :param fs: Frecuencia de muestreo [Hz].
+    :param nperseg: Muestras por segmento (por defecto WELCH_SEGMENT_SECONDS).
+    :param noverlap: Solapamiento entre segmentos (por defecto nperseg // 2).
+    :param workers: Hilos de scipy.fft (-1 para todos los núcleos).
+    :param detector: ArtifactDetector opcional; los segmentos con artefactos se omiten.
+    :return: WelchPSD, o None si la señal es más corta que un segmento (o no hay segmentos válidos).
+    """
+    start_time = time.perf_counter()
+    nperseg = int(nperseg or WELCH_SEGMENT_SECONDS * fs)
+    hop = nperseg - (nperseg // 2 if noverlap is None else int(noverlap))
+    nfft = next_fast_len(nperseg, real=True)
+    window = get_window(window, nperseg)
+    scale = density_scale(window, fs, nfft)
+    if isinstance(raw_chunks, np.ndarray):
+        raw_chunks = [raw_chunks]
+
+    stream = SegmentStream(nperseg, hop)
+    total = np.zeros(nfft // 2 + 1)
+    count = 0
+    piece_size = batch_segments * hop
+    for chunk in raw_chunks:
+        for piece_start in range(0, len(chunk), piece_size):
+            # Cada trozo completa a lo sumo batch_segments segmentos
+            segments, _, n_new = stream._new_segments(chunk[piece_start:piece_start + piece_size], None)
+            if not n_new:
+                continue
+            if detector is not None:
+                segments = segments[detector.good(segments)]
+            if len(segments):
+                total += segment_periodograms(segments, window, scale, workers, nfft).sum(axis=0)
+                count += len(segments)
+
+    if count == 0:
+        return None
+    return WelchPSD(rfftfreq(nfft, 1 / fs), total / count, count, time.perf_counter() - start_time)
+
+
+def session_welch_psd(backend, session_id, fs=None, **kwargs):
+    """
+    welch_psd de una sesión leída chunk a chunk desde el backend (iter_session_chunks), sin
+    cargar la sesión completa. Si no se indica fs se estima con los timestamps del primer chunk.
+    :return: WelchPSD, o None si la sesión no existe o es demasiado corta.
+    """
+    chunks = iter(backend.iter_session_chunks(session_id))
+    first = next(chunks, None)
+    if first is None:
+        return None
+    if fs is None:
+        fs = real_sample_rate(first[0])
+
+    def raw_chunks():
+        yield first[1]
+        for _, raw_values in chunks:
+            yield raw_values
+
+    return welch_psd(raw_chunks(), fs, **kwargs)
@@ -0,0 +1,161 @@
+import os
+import json
+import shutil
+import weakref
+import tempfile
+import numpy as np
+from neurosky_mm2_headset.modules.session_spectral import DISPLAY_COLUMNS, segment_count, spectrogram_blocks
+
+TILE_COLUMNS = 1024  # Columnas de resolución completa por tile
+ZOOM_FACTOR = 4  # Columnas de un nivel que se promedian en una columna del siguiente
+ZOOM_LEVELS = 5
+TILE_DTYPE = np.float32
+TILES_VERSION = 1
+
+
+class SpectrogramTileCache:
+    """
+    Espectrograma de una sesión precalculado en varios niveles de resolución temporal y guardado
+    en disco (ver session_tiles para guardarlo en la caché de sesiones).
+
+    El nivel 0 tiene una columna por segmento de la STFT; cada nivel siguiente promedia
+    ZOOM_FACTOR columnas del anterior. Se calcula tile a tile (TILE_COLUMNS columnas de nivel 0
+    a la vez), así que la memoria no depende de la duración de la sesión, y cada nivel se guarda
+    como un .npy mapeado en memoria. view() elige el nivel según el rango visible y devuelve una
+    copia de las filas correspondientes, sin calcular ninguna FFT.
+    """
+
+    def __init__(self, raw_values, fs, nperseg, noverlap, fmax=None, directory=None,
+                 levels=ZOOM_LEVELS, factor=ZOOM_FACTOR, tile_columns=TILE_COLUMNS):
+        """
+        :param raw_values: Señal de la sesión (arreglo o arreglo mapeado en memoria).
+        :param fs: Frecuencia de muestreo [Hz].
+        :param nperseg: Muestras por segmento de la STFT.
+        :param noverlap: Muestras de solapamiento entre segmentos.
+        :param fmax: Si se indica, solo se guardan los bins hasta fmax Hz.
+        :param directory: Directorio de los tiles. Si ya contiene tiles con los mismos parámetros se
+                          reutilizan. Sin directorio se usa uno temporal que se borra con el objeto.
+        :param levels: Número de niveles de resolución.
+        :param factor: Reducción de columnas entre niveles consecutivos.
+        :param tile_columns: Columnas de nivel 0 por tile; debe ser múltiplo de factor ** (levels - 1).
+        """
+        if tile_columns % factor ** (levels - 1):
+            raise ValueError('tile_columns debe ser múltiplo de factor ** (levels - 1).')
+        self.fs = fs
+        self.nperseg = int(nperseg)
+        self.hop = self.nperseg - int(noverlap)
+        self.factor = factor
+        self.n_columns = segment_count(len(raw_values), self.nperseg, self.hop)
+        self.params = {
+            'fs': float(fs), 'nperseg': self.nperseg, 'hop': self.hop, 'fmax': fmax,
+            'levels': levels, 'factor': factor, 'tile_columns': tile_columns, 'version': TILES_VERSION,
+        }
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='neurosky_tiles_')
+            weakref.finalize(self, shutil.rmtree, directory, True)
+        self.directory = directory
+        self.built = False  # True si los tiles se calcularon en esta instancia
+        self.freqs = None
+        self.levels = self._load()
+        if self.levels is None and self.n_columns > 0:
+            self.levels = self._build(raw_values, fmax, tile_columns)
+
+    def _level_path(self, directory, level):
+        return os.path.join(directory, f'level{level}.npy')
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta['params'] != self.params:
+                return None
+            levels = [np.load(self._level_path(self.directory, level), mmap_mode='r')
+                      for level in range(self.params['levels'])]
+        except (OSError, ValueError, KeyError):
+            return None
+        self.freqs = np.array(meta['freqs'])
+        return levels
+
+    def _build(self, raw_values, fmax, tile_columns):
+        tmp_directory = self.directory + '.tmp'
+        try:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            os.makedirs(tmp_directory)
+            freqs, tiles = spectrogram_blocks(raw_values, self.fs, self.nperseg, self.hop, fmax,
+                                              block_segments=tile_columns)
+            levels = []
+            for level in range(self.params['levels']):
+                size = self.factor ** level
+                levels.append(np.lib.format.open_memmap(
+                    self._level_path(tmp_directory, level), mode='w+', dtype=TILE_DTYPE,
+                    shape=(-(-self.n_columns // size), freqs.size)))
+
+            for first, columns in tiles:
+                for level, array in enumerate(levels):
+                    size = self.factor ** level
+                    # Los tiles están alineados con los grupos de todos los niveles
+                    starts = np.arange(0, len(columns), size)
+                    counts = np.diff(np.r_[starts, len(columns)])
+                    pooled = np.add.reduceat(columns, starts, axis=0) / counts[:, None]
+                    array[first // size:first // size + len(pooled)] = pooled
+
+            for array in levels:
+                array.flush()
+            # Cierra los mapas antes de mover el directorio (necesario en Windows)
+            del array, levels
+            with open(os.path.join(tmp_directory, 'meta.json'), 'w') as f:
+                json.dump({'params': self.params, 'freqs': freqs.tolist()}, f)
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.replace(tmp_directory, self.directory)
+        except OSError as e:
+            print(f'Error al guardar los tiles del espectrograma: {e}')
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            return None
+        self.built = True
+        return self._load()
+
+    def column_times(self, level, first, last):
+        """Tiempo central [s] de las columnas first..last-1 del nivel indicado."""
+        size = self.factor ** level
+        starts = np.arange(first, last) * size
+        ends = np.minimum(starts + size, self.n_columns)
+        return ((starts + ends - 1) / 2 * self.hop + self.nperseg / 2) / self.fs
+
+    def view(self, start, end, max_columns=DISPLAY_COLUMNS):
+        """
+        Espectrograma del rango [start, end] en segundos, con el nivel más fino que no supera
+        max_columns columnas.
+        :return: (f, t, Sxx) con Sxx de forma bins × columnas, o None si no hay columnas en el rango.
+        """
+        if self.levels is None:
+            return None
+        first = max(0, int(np.ceil((start * self.fs - self.nperseg / 2) / self.hop)))
+        last = min(self.n_columns, int(np.floor((end * self.fs - self.nperseg / 2) / self.hop)) + 1)
+        if last <= first:
+            return None
+
+        for level, array in enumerate(self.levels):
+            size = self.factor ** level
+            if -(-(last - first) // size) <= max_columns or level == len(self.levels) - 1:
+                break
+        first //= size
+        last = -(-last // size)
+        Sxx = np.array(array[first:last], dtype=np.float64).T
+        return self.freqs, self.column_times(level, first, last), Sxx
+
+
+def session_tiles(session_data, fs, nperseg, noverlap, fmax=None):
+    """
+    SpectrogramTileCache de una sesión. Si session_data viene de SessionDataCache, los tiles se
+    guardan en esa caché por sesión, versión y parámetros: se calculan una vez y se expulsan con la
+    sesión. Con otros arreglos se usan tiles temporales.
+    """
+    cache = getattr(session_data, 'cache', None)
+    if cache is None:
+        return SpectrogramTileCache(session_data.raw_values, fs, nperseg, noverlap, fmax=fmax)
+    name = session_data.derived_name(f'spectrogram_tiles|{float(fs)!r}|{nperseg}|{noverlap}|{fmax}|{TILES_VERSION}')
+    key, directory, _ = cache.derived_entry(session_data.session_id, session_data.version, name)
+    tiles = SpectrogramTileCache(session_data.raw_values, fs, nperseg, noverlap, fmax=fmax, directory=directory)
+    if tiles.built:
+        cache.store_derived(session_data.session_id, session_data.version, key, [directory])
+    return tiles
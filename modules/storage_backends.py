@@ -0,0 +1,361 @@
+import os
+import abc
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from neurosky_mm2_headset.modules.session_chunks import (
+    CHUNK_SAMPLES, TIMESTAMP_DTYPE, RAW_VALUE_DTYPE, SessionArrays,
+    encode_samples, decode_samples, samples_to_arrays, arrays_to_samples
+)
+
+DEFAULT_SQLITE_PATH = 'neurosky_sessions.db'
+DEFAULT_FILES_PATH = 'neurosky_sessions'
+
+
+class StorageBackend(abc.ABC):
+    """
+    Interfaz común de almacenamiento de sesiones usada por SessionManager y las herramientas
+    de sesiones. Las muestras llegan como lotes de diccionarios {'timestamp', 'raw_value'}
+    (save_data_batch) o como arreglos (save_arrays); las subclases implementan save_arrays y
+    save_data_batch lo usa por defecto.
+    """
+
+    def is_available(self):
+        return True
+
+    @abc.abstractmethod
+    def start_session(self, user_id, start_time=None):
+        pass
+
+    @abc.abstractmethod
+    def end_session(self, session_id, end_time=None):
+        pass
+
+    def save_data_batch(self, session_id, data_batch):
+        if not data_batch:
+            return True
+        try:
+            timestamps, raw_values = samples_to_arrays(data_batch)
+        except (KeyError, TypeError, ValueError) as e:
+            # Solo se guarda la señal cruda; un lote de attention o de bandas no tiene dónde escribirse
+            print(f'Lote inválido para la sesión {session_id}: cada muestra necesita timestamp y raw_value ({e!r}).')
+            return False
+        return self.save_arrays(session_id, timestamps, raw_values)
+
+    @abc.abstractmethod
+    def save_arrays(self, session_id, timestamps, raw_values):
+        pass
+
+    @abc.abstractmethod
+    def get_user_sessions(self, user_id):
+        pass
+
+    def get_session_data(self, session_id):
+        arrays = self.get_session_arrays(session_id)
+        if arrays is None:
+            return None
+        return arrays_to_samples(arrays.timestamps, arrays.raw_values)
+
+    @abc.abstractmethod
+    def get_session_arrays(self, session_id):
+        pass
+
+    def iter_session_chunks(self, session_id):
+        arrays = self.get_session_arrays(session_id)
+        if arrays is not None:
+            yield arrays.timestamps, arrays.raw_values
+
+    @abc.abstractmethod
+    def get_session_version(self, session_id):
+        """
+        Cadena que cambia cada vez que cambian los datos de la sesión (muestras nuevas, cierre o
+        compactación), sin leer las muestras. None si la sesión no existe.
+        """
+
+    def close(self):
+        pass
+
+
+def _to_iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _from_iso(value):
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _concatenate_chunks(chunks):
+    timestamps = [c[0] for c in chunks]
+    raw_values = [c[1] for c in chunks]
+    if not timestamps:
+        return SessionArrays(np.empty(0, dtype=TIMESTAMP_DTYPE), np.empty(0, dtype=RAW_VALUE_DTYPE))
+    return SessionArrays(np.concatenate(timestamps), np.concatenate(raw_values))
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """
+    Almacenamiento local en un archivo SQLite en modo WAL. Las muestras se guardan como chunks
+    BLOB (float64 + int16 por muestra) insertados con executemany.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, chunk_samples=CHUNK_SAMPLES):
+        """
+        :param path: Ruta del archivo de base de datos.
+        :param chunk_samples: Máximo de muestras por chunk BLOB.
+        """
+        self.path = path
+        self.chunk_samples = chunk_samples
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT,
+                sample_count INTEGER NOT NULL DEFAULT 0,
+                next_seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user_id, start_time);
+            CREATE TABLE IF NOT EXISTS chunks (
+                session_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                start_index INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                timestamps BLOB NOT NULL,
+                raw_values BLOB NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+        ''')
+        self.conn.commit()
+
+    def start_session(self, user_id, start_time=None):
+        start_time = start_time or datetime.now(timezone.utc)
+        try:
+            with self._lock, self.conn:
+                cursor = self.conn.execute('INSERT INTO sessions (user_id, start_time) VALUES (?, ?)',
+                                           (user_id, _to_iso(start_time)))
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f'Error al iniciar la sesión en SQLite: {e}')
+            return None
+
+    def end_session(self, session_id, end_time=None):
+        end_time = end_time or datetime.now(timezone.utc)
+        try:
+            with self._lock, self.conn:
+                self.conn.execute('UPDATE sessions SET end_time = ? WHERE id = ?', (_to_iso(end_time), session_id))
+        except sqlite3.Error as e:
+            print(f'Error al finalizar la sesión en SQLite: {e}')
+
+    def save_arrays(self, session_id, timestamps, raw_values):
+        n = len(timestamps)
+        if n == 0:
+            return True
+        try:
+            with self._lock, self.conn:
+                row = self.conn.execute('SELECT sample_count, next_seq FROM sessions WHERE id = ?',
+                                        (session_id,)).fetchone()
+                if row is None:
+                    print(f'La sesión {session_id} no existe en SQLite.')
+                    return False
+                start_index, seq = row
+                rows = []
+                for i in range(0, n, self.chunk_samples):
+                    chunk_timestamps = timestamps[i:i + self.chunk_samples]
+                    timestamp_bytes, raw_value_bytes = encode_samples(chunk_timestamps,
+                                                                      raw_values[i:i + self.chunk_samples])
+                    rows.append((session_id, seq, start_index + i, len(chunk_timestamps),
+                                 timestamp_bytes, raw_value_bytes))
+                    seq += 1
+                self.conn.executemany('INSERT INTO chunks (session_id, seq, start_index, count, timestamps, '
+                                      'raw_values) VALUES (?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('UPDATE sessions SET sample_count = ?, next_seq = ? WHERE id = ?',
+                                  (start_index + n, seq, session_id))
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            print(f'Error al guardar datos en SQLite: {e}')
+            return False
+
+    def get_user_sessions(self, user_id):
+        with self._lock:
+            rows = self.conn.execute('SELECT id, user_id, start_time, end_time, sample_count FROM sessions '
+                                     'WHERE user_id = ? ORDER BY start_time', (user_id,)).fetchall()
+        return [{'_id': r[0], 'user_id': r[1], 'start_time': _from_iso(r[2]), 'end_time': _from_iso(r[3]),
+                 'sample_count': r[4]} for r in rows]
+
+    def get_session_version(self, session_id):
+        with self._lock:
+            row = self.conn.execute('SELECT sample_count, end_time FROM sessions WHERE id = ?',
+                                    (session_id,)).fetchone()
+        if row is None:
+            return None
+        return f'{row[0]}:{row[1]}'
+
+    def iter_session_chunks(self, session_id):
+        with self._lock:
+            rows = self.conn.execute('SELECT timestamps, raw_values FROM chunks WHERE session_id = ? ORDER BY seq',
+                                     (session_id,)).fetchall()
+        for timestamp_bytes, raw_value_bytes in rows:
+            yield decode_samples(timestamp_bytes, raw_value_bytes)
+
+    def get_session_arrays(self, session_id):
+        with self._lock:
+            exists = self.conn.execute('SELECT 1 FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if exists is None:
+            return None
+        return _concatenate_chunks(list(self.iter_session_chunks(session_id)))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class FileStorageBackend(StorageBackend):
+    """
+    Almacenamiento local en un directorio por sesión: meta.json con los datos de la sesión y un
+    archivo binario por chunk (timestamps float64 seguidos de valores int16).
+    """
+
+    def __init__(self, path=DEFAULT_FILES_PATH, chunk_samples=CHUNK_SAMPLES):
+        """
+        :param path: Directorio raíz de las sesiones.
+        :param chunk_samples: Máximo de muestras por archivo de chunk.
+        """
+        self.path = path
+        self.chunk_samples = chunk_samples
+        self._lock = threading.Lock()
+        self._next_seq = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.path, str(session_id))
+
+    def _write_meta(self, session_id, meta):
+        meta_path = os.path.join(self._session_dir(session_id), 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _read_meta(self, session_id):
+        try:
+            with open(os.path.join(self._session_dir(session_id), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _chunk_files(self, session_id):
+        session_dir = self._session_dir(session_id)
+        return sorted(name for name in os.listdir(session_dir) if name.startswith('chunk_') and name.endswith('.bin'))
+
+    def start_session(self, user_id, start_time=None):
+        session_id = uuid.uuid4().hex
+        try:
+            os.makedirs(self._session_dir(session_id))
+            self._write_meta(session_id, {'user_id': user_id,
+                                          'start_time': _to_iso(start_time or datetime.now(timezone.utc)),
+                                          'end_time': None})
+            return session_id
+        except OSError as e:
+            print(f'Error al iniciar la sesión en disco: {e}')
+            return None
+
+    def end_session(self, session_id, end_time=None):
+        meta = self._read_meta(session_id)
+        if meta is None:
+            return
+        meta['end_time'] = _to_iso(end_time or datetime.now(timezone.utc))
+        try:
+            self._write_meta(session_id, meta)
+        except OSError as e:
+            print(f'Error al finalizar la sesión en disco: {e}')
+
+    def save_arrays(self, session_id, timestamps, raw_values):
+        n = len(timestamps)
+        if n == 0:
+            return True
+        try:
+            with self._lock:
+                seq = self._next_seq.get(session_id)
+                if seq is None:
+                    seq = len(self._chunk_files(session_id))
+                for i in range(0, n, self.chunk_samples):
+                    timestamp_bytes, raw_value_bytes = encode_samples(timestamps[i:i + self.chunk_samples],
+                                                                      raw_values[i:i + self.chunk_samples])
+                    chunk_path = os.path.join(self._session_dir(session_id), f'chunk_{seq:08d}.bin')
+                    with open(chunk_path + '.tmp', 'wb') as f:
+                        f.write(timestamp_bytes)
+                        f.write(raw_value_bytes)
+                    os.replace(chunk_path + '.tmp', chunk_path)
+                    seq += 1
+                self._next_seq[session_id] = seq
+            return True
+        except (OSError, ValueError) as e:
+            print(f'Error al guardar datos en disco: {e}')
+            return False
+
+    def get_user_sessions(self, user_id):
+        sessions = []
+        for session_id in os.listdir(self.path):
+            meta = self._read_meta(session_id)
+            if meta is None or meta.get('user_id') != user_id:
+                continue
+            sessions.append({'_id': session_id, 'user_id': meta['user_id'],
+                             'start_time': _from_iso(meta['start_time']), 'end_time': _from_iso(meta['end_time'])})
+        sessions.sort(key=lambda s: s['start_time'])
+        return sessions
+
+    def get_session_version(self, session_id):
+        meta = self._read_meta(session_id)
+        if meta is None:
+            return None
+        session_dir = self._session_dir(session_id)
+        sizes = [os.path.getsize(os.path.join(session_dir, name)) for name in self._chunk_files(session_id)]
+        return f'{len(sizes)}:{sum(sizes)}:{meta["end_time"]}'
+
+    def iter_session_chunks(self, session_id):
+        sample_size = TIMESTAMP_DTYPE.itemsize + RAW_VALUE_DTYPE.itemsize
+        for name in self._chunk_files(session_id):
+            with open(os.path.join(self._session_dir(session_id), name), 'rb') as f:
+                payload = f.read()
+            n = len(payload) // sample_size
+            split = n * TIMESTAMP_DTYPE.itemsize
+            yield decode_samples(payload[:split], payload[split:split + n * RAW_VALUE_DTYPE.itemsize])
+
+    def get_session_arrays(self, session_id):
+        if self._read_meta(session_id) is None:
+            return None
+        return _concatenate_chunks(list(self.iter_session_chunks(session_id)))
+
+
+def open_storage_backend(kind='auto', uri='mongodb://localhost:27017/', path=None, uplink_address=None):
+    """
+    Crea el backend de almacenamiento indicado.
+    :param kind: 'mongo', 'sqlite', 'files', 'uplink' o 'auto' (MongoDB si está disponible, si no SQLite local).
+    :param uri: URI de MongoDB.
+    :param path: Ruta del archivo SQLite, del directorio de sesiones o del journal del uplink.
+    :param uplink_address: 'host:puerto' del servidor de ingesta para 'uplink'.
+    :return: Instancia de StorageBackend.
+    """
+    if kind == 'uplink':
+        from neurosky_mm2_headset.modules.uplink import DEFAULT_JOURNAL_DIR, UPLINK_HOST, UPLINK_PORT, UplinkBackend
+        host, _, port = (uplink_address or '').rpartition(':')
+        return UplinkBackend(host or UPLINK_HOST, int(port) if port else UPLINK_PORT, path or DEFAULT_JOURNAL_DIR)
+    if kind in ('mongo', 'auto'):
+        from neurosky_mm2_headset.modules.db_manager import MongoDBManager
+        backend = MongoDBManager(uri)
+        if backend.is_available() or kind == 'mongo':
+            return backend
+        print('MongoDB no está disponible; se usará almacenamiento local SQLite.')
+        kind = 'sqlite'
+    if kind == 'sqlite':
+        return SQLiteStorageBackend(path or DEFAULT_SQLITE_PATH)
+    if kind == 'files':
+        return FileStorageBackend(path or DEFAULT_FILES_PATH)
+    raise ValueError(f'Tipo de almacenamiento inválido: {kind}. Los tipos válidos son: mongo, sqlite, files, uplink, auto')
@@ -0,0 +1,425 @@
+import os
+import time
+import socket
+import struct
+import selectors
+import threading
+from collections import deque
+import numpy as np
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+
+STREAM_HOST = '127.0.0.1'
+STREAM_PORT = 5331
+RAW_BLOCK_SAMPLES = 32  # Muestras crudas por trama (16 tramas/s a 512 Hz)
+CLIENT_BUFFER_BYTES = 256 * 1024  # Búfer de envío máximo por cliente
+DROP_FRAMES = 'drop'  # Un cliente lento pierde las tramas que no caben en su búfer
+DROP_CLIENT = 'disconnect'  # Un cliente lento se desconecta
+STREAM_SAMPLE_FREQ = 512.0  # [Hz]
+
+# Trama: 0xAA 0xAA, tipo (uint8), longitud del payload (uint32) y payload
+FRAME_SYNC = b'\xaa\xaa'
+FRAME_HEADER = struct.Struct('<2sBI')
+FRAME_RAW = 1  # Payload: timestamp de la primera muestra (float64), poor_signal (uint8), n (uint16), n × int16
+FRAME_ESENSE = 2  # Payload: timestamp (float64), tipo (uint8, ESENSE_KINDS), valor (uint8)
+FRAME_BANDS = 3  # Payload: timestamp (float64), 8 × uint32 en el orden de ASIC_BANDS
+RAW_HEADER = struct.Struct('<dBH')
+ESENSE_PAYLOAD = struct.Struct('<dBB')
+BANDS_PAYLOAD = struct.Struct('<d8I')
+ESENSE_KINDS = ('attention', 'meditation', 'poor_signal', 'blink')
+
+
+def encode_frame(frame_type, payload):
+    return FRAME_HEADER.pack(FRAME_SYNC, frame_type, len(payload)) + payload
+
+
+def encode_raw(timestamp, samples, poor_signal=0):
+    samples = np.asarray(samples, dtype='<i2')
+    return encode_frame(FRAME_RAW, RAW_HEADER.pack(timestamp, min(255, int(poor_signal)), samples.size)
+                        + samples.tobytes())
+
+
+def encode_esense(timestamp, kind, value):
+    return encode_frame(FRAME_ESENSE, ESENSE_PAYLOAD.pack(timestamp, ESENSE_KINDS.index(kind), min(255, int(value))))
+
+
+def encode_bands(timestamp, waves):
+    return encode_frame(FRAME_BANDS, BANDS_PAYLOAD.pack(timestamp, *(int(waves.get(band, 0)) & 0xFFFFFFFF
+                                                                   for band in NeuroSkyInterface.ASIC_BANDS)))
+
+
+def decode_payload(frame_type, payload):
+    """
+    :return: ('raw', timestamp, (samples int16, poor_signal)), ('esense', timestamp, (tipo, valor)),
+             ('bands', timestamp, {banda: potencia}) o None si el tipo es desconocido.
+    """
+    if frame_type == FRAME_RAW:
+        timestamp, poor_signal, n = RAW_HEADER.unpack_from(payload)
+        return 'raw', timestamp, (np.frombuffer(payload, dtype='<i2', count=n, offset=RAW_HEADER.size), poor_signal)
+    if frame_type == FRAME_ESENSE:
+        timestamp, kind, value = ESENSE_PAYLOAD.unpack(payload)
+        return 'esense', timestamp, (ESENSE_KINDS[kind], value)
+    if frame_type == FRAME_BANDS:
+        timestamp, *values = BANDS_PAYLOAD.unpack(payload)
+        return 'bands', timestamp, dict(zip(NeuroSkyInterface.ASIC_BANDS, values))
+    return None
+
+
+def read_frames(sock):
+    """Generador de (tipo, payload) leídos de un socket conectado; termina cuando se cierra."""
+    buffer = bytearray()
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return
+        buffer += data
+        while len(buffer) >= FRAME_HEADER.size:
+            sync, frame_type, length = FRAME_HEADER.unpack_from(buffer)
+            if sync != FRAME_SYNC:
+                # Resincroniza en el siguiente 0xAA 0xAA
+                index = buffer.find(FRAME_SYNC, 1)
+                del buffer[:index if index > 0 else len(buffer)]
+                continue
+            end = FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            payload = bytes(buffer[FRAME_HEADER.size:end])
+            del buffer[:end]
+            yield frame_type, payload
+
+
+class _Client:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+        self.dropped = 0
+        self.writing = False
+
+
+class StreamServer:
+    """
+    Servidor local que reparte la señal decodificada de una NeuroSkyInterface a muchos clientes
+    por TCP o por un socket Unix, con tramas binarias compactas (bloques de señal cruda, valores
+    eSense y potencias de banda).
+
+    Los manejadores de la interfaz solo encolan la trama y despiertan al hilo del servidor, así
+    que la adquisición nunca espera a la red. El hilo del servidor copia cada trama al búfer de
+    cada cliente (acotado a client_buffer bytes) y escribe con sockets no bloqueantes. Si el
+    búfer de un cliente lento se llena, según drop_policy se descartan sus tramas nuevas
+    (DROP_FRAMES) o se le desconecta (DROP_CLIENT); los demás clientes no se ven afectados.
+    """
+
+    def __init__(self, interface=None, host=STREAM_HOST, port=STREAM_PORT, unix_path=None,
+                 raw_block=RAW_BLOCK_SAMPLES, client_buffer=CLIENT_BUFFER_BYTES, drop_policy=DROP_FRAMES):
+        """
+        :param interface: NeuroSkyInterface (o compatible) cuyos manejadores se publican; None para
+                          publicar solo con publish_* .
+        :param host: Dirección TCP (None para no abrir TCP).
+        :param port: Puerto TCP (0 elige uno libre; ver address).
+        :param unix_path: Ruta de un socket Unix adicional.
+        :param raw_block: Muestras crudas por trama.
+        :param client_buffer: Bytes pendientes máximos por cliente.
+        :param drop_policy: DROP_FRAMES o DROP_CLIENT.
+        """
+        if drop_policy not in (DROP_FRAMES, DROP_CLIENT):
+            raise ValueError(f'Política desconocida: {drop_policy}')
+        self.interface = interface
+        self.raw_block = int(raw_block)
+        self.client_buffer = client_buffer
+        self.drop_policy = drop_policy
+        self.unix_path = unix_path
+        self.stats = {'frames': 0, 'bytes_sent': 0, 'clients': 0, 'connections': 0,
+                      'dropped_frames': 0, 'dropped_clients': 0}
+
+        self._selector = selectors.DefaultSelector()
+        self._listeners = []
+        self.address = None
+        if host is not None:
+            listener = socket.create_server((host, port))
+            self.address = listener.getsockname()
+            self._listeners.append(listener)
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(unix_path)
+            listener.listen()
+            self._listeners.append(listener)
+        for listener in self._listeners:
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, 'accept')
+
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ, 'wake')
+        self._frames = deque()
+        self._wake_pending = False
+        self._wake_lock = threading.Lock()
+        self._clients = {}
+        self._raw_samples = []
+        self._raw_time = None
+        self._handlers = []
+        self._running = False
+        self._thread = None
+
+    # Lado de la adquisición: se llama desde el hilo del serial y nunca bloquea
+
+    def publish(self, frame):
+        self._frames.append(frame)
+        with self._wake_lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self._wake_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def publish_raw(self, value):
+        if not self._raw_samples:
+            self._raw_time = time.time()
+        self._raw_samples.append(value)
+        if len(self._raw_samples) >= self.raw_block:
+            poor_signal = getattr(self.interface, 'poor_signal', 0)
+            self.publish(encode_raw(self._raw_time, self._raw_samples, poor_signal))
+            self._raw_samples = []
+
+    def publish_esense(self, kind, value):
+        self.publish(encode_esense(time.time(), kind, value))
+
+    def publish_bands(self, waves):
+        self.publish(encode_bands(time.time(), waves))
+
+    def _attach(self, interface):
+        subscriptions = [
+            (interface.raw_value_handlers, lambda interface, value: self.publish_raw(value)),
+            (interface.attention_handlers, lambda interface, value: self.publish_esense('attention', value)),
+            (interface.meditation_handlers, lambda interface, value: self.publish_esense('meditation', value)),
+            (interface.poor_signal_handlers, lambda interface, value: self.publish_esense('poor_signal', value)),
+            (interface.good_signal_handlers, lambda interface, value: self.publish_esense('poor_signal', value)),
+            (interface.blink_handlers, lambda interface, value: self.publish_esense('blink', value)),
+            (interface.waves_handlers, lambda interface, waves: self.publish_bands(waves)),
+        ]
+        for handlers, handler in subscriptions:
+            handlers.append(handler)
+            self._handlers.append((handlers, handler))
+
+    # Hilo del servidor
+
+    def start(self):
+        if self._running:
+            return
+        if self.interface is not None:
+            self._attach(self.interface)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        for handlers, handler in self._handlers:
+            if handler in handlers:
+                handlers.remove(handler)
+        self._handlers.clear()
+        self._running = False
+        try:
+            self._wake_send.send(b'\0')
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for client in list(self._clients.values()):
+            self._close_client(client)
+        for listener in self._listeners:
+            self._selector.unregister(listener)
+            listener.close()
+        self._listeners.clear()
+        self._selector.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def _run(self):
+        while self._running:
+            for key, events in self._selector.select(timeout=1.0):
+                if key.data == 'accept':
+                    self._accept(key.fileobj)
+                elif key.data == 'wake':
+                    self._drain_wake()
+                else:
+                    client = key.data
+                    if events & selectors.EVENT_READ and not self._read(client):
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self._write(client)
+            self._dispatch()
+
+    def _accept(self, listener):
+        try:
+            sock, address = listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        # El búfer del kernel también se acota, para que un cliente lento no acumule datos fuera de client_buffer
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.client_buffer)
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _Client(sock, address)
+        self._clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+        self.stats['connections'] += 1
+        self.stats['clients'] = len(self._clients)
+
+    def _drain_wake(self):
+        # Primero se vacía el socketpair y después se baja la bandera: si se bajara antes, el byte
+        # de un publish() intermedio se perdería con la bandera en True y no habría más avisos.
+        # Las tramas publicadas antes de bajar la bandera se envían en el _dispatch de esta vuelta.
+        try:
+            while self._wake_recv.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        with self._wake_lock:
+            self._wake_pending = False
+
+    def _dispatch(self):
+        """Copia las tramas publicadas a los búferes de los clientes."""
+        while self._frames:
+            frame = self._frames.popleft()
+            self.stats['frames'] += 1
+            for client in list(self._clients.values()):
+                if len(client.buffer) + len(frame) > self.client_buffer:
+                    if self.drop_policy == DROP_CLIENT:
+                        self.stats['dropped_clients'] += 1
+                        self._close_client(client)
+                    else:
+                        client.dropped += 1
+                        self.stats['dropped_frames'] += 1
+                    continue
+                client.buffer += frame
+        for client in list(self._clients.values()):
+            if client.buffer and not client.writing:
+                self._write(client)
+
+    def _read(self, client):
+        # Los clientes no envían nada; leer solo sirve para detectar que se desconectaron
+        try:
+            if client.sock.recv(4096):
+                return True
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        self._close_client(client)
+        return False
+
+    def _write(self, client):
+        try:
+            sent = client.sock.send(client.buffer)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close_client(client)
+            return
+        del client.buffer[:sent]
+        self.stats['bytes_sent'] += sent
+        writing = bool(client.buffer)
+        if writing != client.writing:
+            client.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self._selector.modify(client.sock, events, client)
+
+    def _close_client(self, client):
+        if self._clients.pop(client.sock.fileno(), None) is None:
+            return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        self.stats['clients'] = len(self._clients)
+
+
+class StreamInterface:
+    """
+    Cliente del StreamServer con los mismos atributos y listas de manejadores que
+    NeuroSkyInterface, de modo que un tablero, un registrador o el motor de
+    neurorretroalimentación pueden usar el auricular compartido sin abrir el puerto serial.
+    """
+
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT, unix_path=None):
+        if unix_path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.poor_signal = 255
+        self.attention = 0
+        self.meditation = 0
+        self.blink = 0
+        self.raw_value = 0
+        self.waves = {}
+        self.running = False
+        self.tracer = None
+        self.packet_origin = None
+        self.raw_value_origin = None
+        self.frames = 0
+
+        self.poor_signal_handlers = []
+        self.good_signal_handlers = []
+        self.attention_handlers = []
+        self.meditation_handlers = []
+        self.blink_handlers = []
+        self.raw_value_handlers = []
+        self.waves_handlers = []
+
+        self.running = True
+        self.listener = threading.Thread(target=self._run, daemon=True)
+        self.listener.start()
+
+    def _run(self):
+        try:
+            for frame_type, payload in read_frames(self.sock):
+                if not self.running:
+                    break
+                decoded = decode_payload(frame_type, payload)
+                if decoded is not None:
+                    self.frames += 1
+                    self._dispatch(*decoded)
+        except OSError:
+            pass
+        self.running = False
+
+    def _dispatch(self, kind, timestamp, data):
+        if kind == 'raw':
+            samples, self.poor_signal = data
+            for value in samples.tolist():
+                self.raw_value = value
+                for handler in self.raw_value_handlers:
+                    handler(self, value)
+        elif kind == 'bands':
+            self.waves = data
+            for handler in self.waves_handlers:
+                handler(self, self.waves)
+        else:
+            name, value = data
+            if name == 'poor_signal':
+                old_poor_signal, self.poor_signal = self.poor_signal, value
+                handlers = self.poor_signal_handlers if value > 0 else self.good_signal_handlers
+                if (value > 0) != (old_poor_signal > 0):
+                    for handler in handlers:
+                        handler(self, value)
+                return
+            setattr(self, name, value)
+            for handler in getattr(self, f'{name}_handlers'):
+                handler(self, value)
+
+    def stop(self):
+        self.running = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
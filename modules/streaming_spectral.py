@@ -0,0 +1,230 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, rfftfreq
+from scipy.signal import get_window
+
+
+def density_scale(window, fs, nperseg):
+    """
+    Factores por bin para convertir |rfft|² de un segmento enventanado en densidad espectral
+    de potencia de un lado (mismo escalado que scipy.signal.welch con scaling='density').
+    """
+    scale = np.full(nperseg // 2 + 1, 1.0 / (fs * np.sum(window ** 2)))
+    if nperseg % 2 == 0:
+        scale[1:-1] *= 2
+    else:
+        scale[1:] *= 2
+    return scale
+
+
+def segment_periodograms(segments, window, scale, workers=None, nfft=None):
+    """
+    Periodogramas de un lote de segmentos (n_segmentos × nperseg) con una sola llamada a rfft.
+    A cada segmento se le resta su media antes de aplicar la ventana.
+    :param nfft: Longitud de la FFT (con relleno de ceros); por defecto nperseg.
+    """
+    segments = np.asarray(segments, dtype=np.float64)
+    segments = (segments - segments.mean(axis=-1, keepdims=True)) * window
+    spectrum = rfft(segments, n=nfft, axis=-1, workers=workers)
+    return (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+
+
+class SegmentStream:
+    """Divide una señal que llega por bloques en segmentos de nperseg muestras separados por hop."""
+
+    def __init__(self, nperseg, hop):
+        self.nperseg = int(nperseg)
+        self.hop = int(hop)
+        self._pending = np.empty(0)
+        self._offset = 0  # Índice absoluto de la primera muestra pendiente
+
+    def _reset_segments(self):
+        self._pending = np.empty(0)
+        self._offset = 0
+
+    def _new_segments(self, samples, keep_last):
+        """
+        Agrega muestras y devuelve (segmentos, índice absoluto del primer segmento, total de
+        segmentos nuevos). Solo se devuelven los últimos keep_last segmentos (todos si es None),
+        como vista sin copia.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        buffer = np.concatenate((self._pending, samples)) if self._pending.size else samples
+        if buffer.size < self.nperseg:
+            self._pending = buffer
+            return None, self._offset, 0
+
+        n_new = (buffer.size - self.nperseg) // self.hop + 1
+        first = 0 if keep_last is None else max(0, n_new - keep_last)
+        segments = sliding_window_view(buffer, self.nperseg)[first * self.hop:(n_new - 1) * self.hop + 1:self.hop]
+        start_index = self._offset + first * self.hop
+        self._pending = buffer[n_new * self.hop:].copy()
+        self._offset += n_new * self.hop
+        return segments, start_index, n_new
+
+
+class StreamingPSD(SegmentStream):
+    """
+    Densidad espectral de potencia tipo Welch sobre una ventana deslizante de la señal.
+
+    Guarda el periodograma de cada segmento y su suma, de modo que cada llamada a push() solo
+    calcula los segmentos nuevos y la PSD actual se obtiene en O(bins) con psd().
+    """
+
+    def __init__(self, fs, nperseg, hop=None, n_segments=8, window='hann', detector=None):
+        """
+        :param fs: Frecuencia de muestreo [Hz].
+        :param nperseg: Muestras por segmento.
+        :param hop: Avance entre segmentos consecutivos (por defecto nperseg // 2).
+        :param n_segments: Número de segmentos que se promedian (ventana total ≈ nperseg + (n_segments - 1) * hop).
+        :param window: Ventana de scipy.signal.get_window.
+        :param detector: ArtifactDetector opcional; los segmentos con artefactos no se calculan ni se promedian.
+        """
+        super().__init__(nperseg, hop or int(nperseg) // 2)
+        self.fs = fs
+        self.detector = detector
+        self.n_segments = int(n_segments)
+        self.window = get_window(window, self.nperseg)
+        self.scale = density_scale(self.window, fs, self.nperseg)
+        self.freqs = rfftfreq(self.nperseg, 1 / fs)
+        self._band_masks = {}
+        self.reset()
+
+    def reset(self):
+        """Descarta las muestras y segmentos acumulados."""
+        self._reset_segments()
+        self._raw_stream = SegmentStream(self.nperseg, self.hop)
+        self._segments = np.zeros((self.n_segments, self.freqs.size))
+        self._sum = np.zeros(self.freqs.size)
+        self._count = 0
+        self._next = 0
+        self._since_resync = 0
+
+    @property
+    def ready(self):
+        """True cuando ya hay una ventana completa de segmentos."""
+        return self._count == self.n_segments
+
+    def band_mask(self, low, high):
+        """Máscara booleana (precalculada) de los bins entre low y high Hz."""
+        key = (low, high)
+        if key not in self._band_masks:
+            self._band_masks[key] = (self.freqs >= low) & (self.freqs <= high)
+        return self._band_masks[key]
+
+    def push(self, samples, raw=None, poor_signal=None):
+        """
+        Agrega muestras nuevas y calcula solo los segmentos que completan.
+        :param raw: Señal cruda correspondiente a samples cuando samples está filtrada; el detector
+                    de artefactos la usa en lugar de samples. Si se usa, debe pasarse en cada llamada.
+        :param poor_signal: poor_signal del auricular durante el bloque, para el detector.
+        :return: Número de segmentos nuevos.
+        """
+        segments, _, n_new = self._new_segments(samples, self.n_segments)
+        reference = segments
+        if raw is not None:
+            reference, _, _ = self._raw_stream._new_segments(raw, self.n_segments)
+        if n_new:
+            # Los segmentos que ya no caben en la ventana no se calculan
+            if self.detector is not None:
+                segments = segments[self.detector.good(reference, poor_signal)]
+            if len(segments):
+                self._insert(segment_periodograms(segments, self.window, self.scale))
+        return n_new
+
+    def _insert(self, periodograms):
+        for periodogram in periodograms:
+            if self._count == self.n_segments:
+                self._sum -= self._segments[self._next]
+            else:
+                self._count += 1
+            self._segments[self._next] = periodogram
+            self._sum += periodogram
+            self._next = (self._next + 1) % self.n_segments
+            self._since_resync += 1
+        if self._since_resync >= 64 * self.n_segments:
+            # Evita que se acumule error de redondeo en la suma incremental
+            self._sum = self._segments[:self._count].sum(axis=0)
+            self._since_resync = 0
+
+    def psd(self):
+        """PSD promedio de los segmentos en la ventana actual (arreglo de len(freqs))."""
+        if self._count == 0:
+            return np.zeros_like(self._sum)
+        return self._sum / self._count
+
+    def band_power(self, low, high):
+        """Potencia media de la PSD actual en la banda [low, high] Hz."""
+        return float(self.psd()[self.band_mask(low, high)].mean())
+
+
+class StreamingSpectrogram(SegmentStream):
+    """
+    STFT incremental: cada llamada a push() calcula solo las columnas nuevas y las guarda en un
+    búfer circular de n_columns columnas, de modo que el costo por segundo es constante sin
+    importar la duración de la sesión.
+    """
+
+    def __init__(self, fs, nperseg, hop, n_columns, window=('tukey', 0.25), fmax=None):
+        """
+        :param fs: Frecuencia de muestreo [Hz].
+        :param nperseg: Muestras por columna.
+        :param hop: Avance entre columnas (nperseg - noverlap).
+        :param n_columns: Número de columnas que se conservan (ancho de la ventana de tiempo).
+        :param window: Ventana de scipy.signal.get_window (por defecto la misma que scipy.signal.spectrogram).
+        :param fmax: Si se indica, solo se guardan los bins hasta fmax Hz.
+        """
+        super().__init__(nperseg, hop)
+        self.fs = fs
+        self.n_columns = int(n_columns)
+        self.window = get_window(window, self.nperseg)
+        freqs = rfftfreq(self.nperseg, 1 / fs)
+        self._n_bins = freqs.size if fmax is None else int(np.searchsorted(freqs, fmax, side='right'))
+        self.freqs = freqs[:self._n_bins]
+        self.scale = density_scale(self.window, fs, self.nperseg)[:self._n_bins]
+        self.reset()
+
+    def reset(self):
+        """Descarta las muestras y columnas acumuladas."""
+        self._reset_segments()
+        self._columns = np.zeros((self.n_columns, self._n_bins))
+        self._times = np.zeros(self.n_columns)
+        self._count = 0
+        self._next = 0
+
+    def push(self, samples):
+        """
+        Agrega muestras nuevas y calcula las columnas que completan.
+        :return: Número de columnas nuevas.
+        """
+        segments, start_index, n_new = self._new_segments(samples, self.n_columns)
+        if not n_new:
+            return 0
+        periodograms = segment_periodograms(segments, self.window, 1.0)[:, :self._n_bins] * self.scale
+        times = (start_index + np.arange(len(periodograms)) * self.hop + self.nperseg / 2) / self.fs
+
+        n = len(periodograms)
+        positions = (self._next + np.arange(n)) % self.n_columns
+        self._columns[positions] = periodograms
+        self._times[positions] = times
+        self._next = (self._next + n) % self.n_columns
+        self._count = min(self.n_columns, self._count + n)
+        return n_new
+
+    def columns(self):
+        """Columnas guardadas en orden cronológico: (tiempos, arreglo n_columnas × bins)."""
+        if self._count < self.n_columns:
+            return self._times[:self._count], self._columns[:self._count]
+        order = np.r_[self._next:self.n_columns, 0:self._next]
+        return self._times[order], self._columns[order]
+
+    def latest_columns(self, n):
+        """Las últimas n columnas (como mucho las guardadas), en orden cronológico: arreglo n × bins."""
+        n = min(int(n), self._count)
+        positions = (self._next - n + np.arange(n)) % self.n_columns
+        return self._columns[positions]
+
+    def spectrogram(self):
+        """(f, t, Sxx) con Sxx de forma bins × columnas, igual que scipy.signal.spectrogram."""
+        times, columns = self.columns()
+        return self.freqs, times, columns.T
@@ -0,0 +1,381 @@
+import os
+import threading
+import time
+import numpy as np
+import serial
+from scipy.signal import lfilter
+from neurosky_mm2_headset.modules.neurosky_interface import NeuroSkyInterface
+
+SIM_SAMPLE_FREQ = 512  # [Hz] Paquetes RAW_VALUE por segundo
+SIM_CHUNK_SECONDS = 0.05  # [s] Datos generados por bloque (y granularidad del ritmo en tiempo real)
+RAW_LIMIT = 2048  # La señal cruda del ADC satura en ±2048
+NOISE_AMPLITUDE = 60.0  # Desviación estándar del ruido 1/f
+ALPHA_AMPLITUDE = 50.0
+ALPHA_FREQ = 10.0  # [Hz]
+ALPHA_BURST_RATE = 0.2  # Ráfagas de alfa por segundo
+BLINK_RATE = 0.25  # Parpadeos por segundo
+BLINK_AMPLITUDE = 450.0
+BLINK_SECONDS = 0.3
+SATURATION_RATE = 0.02  # Episodios de saturación (movimiento) por segundo
+SATURATION_SECONDS = 0.5
+POOR_SIGNAL_RATE = 0.0  # Episodios de mala señal por segundo
+POOR_SIGNAL_VALUE = 200
+
+# Filtro que convierte ruido blanco en ruido rosa (1/f), de P. Kellet
+PINK_B = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
+PINK_A = [1, -2.494956002, 2.017265875, -0.522189400]
+
+# Límites [Hz] de las bandas de ASIC_EEG_POWER, en el orden de NeuroSkyInterface.ASIC_BANDS
+ASIC_BAND_LIMITS = [(0.5, 2.75), (3.5, 6.75), (7.5, 9.25), (10, 11.75), (13, 16.75), (18, 29.75), (31, 39.75),
+                    (41, 49.75)]
+
+CORRUPT_FLIP = 'flip'  # Cambia un byte del paquete (checksum inválido)
+CORRUPT_TRUNCATE = 'truncate'  # Corta el paquete
+CORRUPT_GARBAGE = 'garbage'  # Inserta bytes aleatorios entre paquetes
+CORRUPTION_KINDS = (CORRUPT_FLIP, CORRUPT_TRUNCATE, CORRUPT_GARBAGE)
+
+
+def packet_checksum(payload):
+    return ~sum(payload) & 0xFF
+
+
+def encode_packet(payload):
+    """Paquete ThinkGear: 0xAA 0xAA, longitud, payload y checksum."""
+    payload = bytes(payload)
+    return b'\xaa\xaa' + bytes([len(payload)]) + payload + bytes([packet_checksum(payload)])
+
+
+def encode_raw_packets(values):
+    """Paquetes RAW_VALUE (0x80) de un arreglo de valores int16, codificados de una sola vez con numpy."""
+    values = np.asarray(values).astype('>i2')
+    packets = np.empty((len(values), 8), dtype=np.uint8)
+    packets[:, 0:2] = 0xAA
+    packets[:, 2] = 4
+    packets[:, 3] = 0x80
+    packets[:, 4] = 2
+    packets[:, 5:7] = values.view(np.uint8).reshape(-1, 2)
+    packets[:, 7] = ~(0x82 + packets[:, 5].astype(np.int32) + packets[:, 6]) & 0xFF
+    return packets
+
+
+def encode_status_packet(poor_signal, attention, meditation, waves):
+    """Paquete de 1 Hz del casco: POOR_SIGNAL, ASIC_EEG_POWER (8 × uint24), ATTENTION y MEDITATION."""
+    payload = bytearray([0x02, poor_signal, 0x83, 24])
+    for band in NeuroSkyInterface.ASIC_BANDS:
+        payload += min(int(waves[band]), 0xFFFFFF).to_bytes(3, 'big')
+    payload += bytes([0x04, attention, 0x05, meditation])
+    return encode_packet(payload)
+
+
+def encode_blink_packet(strength):
+    return encode_packet([0x16, min(255, int(strength))])
+
+
+class SyntheticEEG:
+    """
+    Señal cruda sintética generada por bloques y con estado continuo entre bloques: ruido 1/f,
+    ráfagas de alfa, parpadeos y episodios de saturación del ADC, en unidades del valor crudo.
+    """
+
+    def __init__(self, fs=SIM_SAMPLE_FREQ, seed=None, alpha_burst_rate=ALPHA_BURST_RATE, blink_rate=BLINK_RATE,
+                 saturation_rate=SATURATION_RATE):
+        self.fs = fs
+        self.rng = np.random.default_rng(seed)
+        self.alpha_burst_rate = alpha_burst_rate
+        self.blink_rate = blink_rate
+        self.saturation_rate = saturation_rate
+        # Normaliza la ganancia del filtro 1/f para que el ruido tenga NOISE_AMPLITUDE de desviación
+        reference = lfilter(PINK_B, PINK_A, np.random.default_rng(0).standard_normal(2 ** 16))
+        self._pink_gain = NOISE_AMPLITUDE / reference.std()
+        self._pink_state = np.zeros(len(PINK_A) - 1)
+        self._n = 0
+        self._phase = self.rng.uniform(0, 2 * np.pi)
+        # Parte de los eventos (ráfagas, parpadeos, saturación) que continúa en el bloque siguiente
+        self._pending_envelope = np.zeros(0)
+        self._pending = np.zeros(0)
+
+    def _events(self, n, rate):
+        return np.flatnonzero(self.rng.random(n) < rate / self.fs)
+
+    def next(self, n):
+        """:return: n valores crudos (int16) y la lista [(índice, intensidad)] de parpadeos."""
+        t = (self._n + np.arange(n)) / self.fs
+        white = self.rng.standard_normal(n)
+        signal, self._pink_state = lfilter(PINK_B, PINK_A, white, zi=self._pink_state)
+        signal *= self._pink_gain
+
+        tail = int(max(1.5, BLINK_SECONDS, SATURATION_SECONDS) * self.fs)
+        envelope = np.zeros(n + tail)
+        envelope[:len(self._pending_envelope)] = self._pending_envelope
+        burst_window = np.hanning(int(1.5 * self.fs))
+        for start in self._events(n, self.alpha_burst_rate):
+            segment = envelope[start:start + len(burst_window)]
+            np.maximum(segment, burst_window, out=segment)
+        self._pending_envelope = envelope[n:].copy()
+        signal += ALPHA_AMPLITUDE * (0.3 + envelope[:n]) * np.sin(2 * np.pi * ALPHA_FREQ * t + self._phase)
+
+        extra = np.zeros(n + tail)
+        extra[:len(self._pending)] = self._pending
+        blinks = []
+        blink_window = np.hanning(int(BLINK_SECONDS * self.fs))
+        for start in self._events(n, self.blink_rate):
+            strength = self.rng.uniform(0.5, 1.0)
+            extra[start:start + len(blink_window)] += BLINK_AMPLITUDE * strength * blink_window
+            blinks.append((int(start), int(strength * 255)))
+        for start in self._events(n, self.saturation_rate):
+            length = int(SATURATION_SECONDS * self.fs)
+            extra[start:start + length] += self.rng.choice([-1, 1]) * 3 * RAW_LIMIT
+
+        signal += extra[:n]
+        self._pending = extra[n:].copy()
+        self._n += n
+        return np.clip(np.round(signal), -RAW_LIMIT, RAW_LIMIT - 1).astype(np.int16), blinks
+
+
+class ThinkGearStream:
+    """
+    Generador del flujo de bytes de un casco MindWave: paquetes RAW_VALUE a fs Hz con señal
+    SyntheticEEG, un paquete por segundo con POOR_SIGNAL, ASIC_EEG_POWER, ATTENTION y MEDITATION,
+    y paquetes BLINK, todos con checksum correcto. Con corruption_rate se corrompen paquetes a
+    propósito para probar la resincronización del parser.
+    """
+
+    def __init__(self, fs=SIM_SAMPLE_FREQ, seed=None, corruption_rate=0.0, corruption_kinds=CORRUPTION_KINDS,
+                 poor_signal_rate=POOR_SIGNAL_RATE, **eeg_kwargs):
+        """
+        :param seed: Semilla para reproducir el mismo flujo.
+        :param corruption_rate: Fracción de paquetes corrompidos.
+        :param corruption_kinds: Tipos de corrupción usados (CORRUPTION_KINDS).
+        :param poor_signal_rate: Episodios por segundo en que el casco informa mala señal.
+        :param eeg_kwargs: Argumentos de SyntheticEEG.
+        """
+        self.fs = fs
+        self.eeg = SyntheticEEG(fs, seed, **eeg_kwargs)
+        self.rng = np.random.default_rng(None if seed is None else seed + 1)
+        self.corruption_rate = corruption_rate
+        self.corruption_kinds = corruption_kinds
+        self.poor_signal_rate = poor_signal_rate
+        self.samples = 0  # Muestras crudas generadas
+        self.corrupted = 0  # Paquetes corrompidos
+        self.attention = 50
+        self.meditation = 50
+        self.poor_signal = 0
+        self._last_second = np.zeros(fs)
+
+    def _band_powers(self):
+        spectrum = np.abs(np.fft.rfft(self._last_second * np.hanning(self.fs))) ** 2
+        freqs = np.fft.rfftfreq(self.fs, 1 / self.fs)
+        return {band: spectrum[(freqs >= low) & (freqs <= high)].sum() / 100
+                for band, (low, high) in zip(NeuroSkyInterface.ASIC_BANDS, ASIC_BAND_LIMITS)}
+
+    def _status_packet(self):
+        self.attention = int(np.clip(self.attention + self.rng.integers(-8, 9), 1, 100))
+        self.meditation = int(np.clip(self.meditation + self.rng.integers(-8, 9), 1, 100))
+        if self.poor_signal:
+            self.poor_signal = 0
+        elif self.rng.random() < self.poor_signal_rate:
+            self.poor_signal = POOR_SIGNAL_VALUE
+        attention, meditation = (0, 0) if self.poor_signal else (self.attention, self.meditation)
+        return encode_status_packet(self.poor_signal, attention, meditation, self._band_powers())
+
+    def _corrupt(self, packet):
+        self.corrupted += 1
+        kind = self.corruption_kinds[self.rng.integers(len(self.corruption_kinds))]
+        packet = bytearray(packet)
+        if kind == CORRUPT_FLIP:
+            index = self.rng.integers(3, len(packet))
+            packet[index] ^= 1 << int(self.rng.integers(8))
+        elif kind == CORRUPT_TRUNCATE:
+            del packet[self.rng.integers(1, len(packet)):]
+        else:
+            packet[:0] = self.rng.integers(0, 256, int(self.rng.integers(1, 16)), dtype=np.uint8).tobytes()
+        return bytes(packet)
+
+    def next_chunk(self, n):
+        """
+        Genera las siguientes n muestras.
+        :return: (bytes del flujo, valores crudos int16 generados)
+        """
+        values, blinks = self.eeg.next(n)
+        packets = encode_raw_packets(values)
+        extra = {index: encode_blink_packet(strength) for index, strength in blinks}
+        history = np.concatenate([self._last_second, values])
+        for index in range(-self.samples % self.fs, n, self.fs):
+            # El paquete de estado usa el último segundo de señal cruda
+            self._last_second = history[index:index + self.fs]
+            extra[index] = extra.get(index, b'') + self._status_packet()
+        self._last_second = history[-self.fs:]
+        self.samples += n
+
+        corrupted = np.flatnonzero(self.rng.random(n) < self.corruption_rate) if self.corruption_rate else ()
+        if not extra and not len(corrupted):
+            return packets.tobytes(), values
+        parts = []
+        start = 0
+        for index in sorted(set(extra) | set(int(i) for i in corrupted)):
+            parts.append(packets[start:index].tobytes())
+            parts.append(extra.get(index, b''))
+            packet = packets[index].tobytes()
+            parts.append(self._corrupt(packet) if index in corrupted else packet)
+            start = index + 1
+        parts.append(packets[start:].tobytes())
+        return b''.join(parts), values
+
+
+class ReplayStream:
+    """
+    Flujo grabado de un dongle real (los bytes tal como llegan por el puerto) con la misma interfaz
+    que ThinkGearStream, para reproducirlo con FakeSerialPort. El ritmo se calcula suponiendo
+    8 bytes por muestra, el tamaño de un paquete RAW_VALUE.
+    """
+
+    def __init__(self, data, fs=SIM_SAMPLE_FREQ):
+        self.data = bytes(data)
+        self.fs = fs
+        self.samples = 0
+        self.corrupted = 0
+        self._position = 0
+
+    @classmethod
+    def from_file(cls, path, fs=SIM_SAMPLE_FREQ):
+        with open(path, 'rb') as f:
+            return cls(f.read(), fs)
+
+    def next_chunk(self, n):
+        chunk = self.data[self._position:self._position + 8 * n]
+        self._position += len(chunk)
+        self.samples += len(chunk) // 8
+        return chunk, None
+
+
+class FakeSerialPort:
+    """
+    Puerto serial en memoria con la interfaz de serial.Serial que usa NeuroSkyInterface. Entrega
+    el flujo de un ThinkGearStream a speed veces el tiempo real (None: tan rápido como se lea).
+    Al terminar duration segundos de señal, read lanza SerialException y el listener termina.
+    """
+
+    def __init__(self, stream=None, speed=1.0, duration=None, chunk_seconds=SIM_CHUNK_SECONDS):
+        """
+        :param stream: ThinkGearStream; por defecto uno nuevo sin corrupción.
+        :param speed: Factor sobre el tiempo real.
+        :param duration: Segundos de señal a entregar (None: sin fin).
+        :param chunk_seconds: Segundos de señal generados por bloque.
+        """
+        self.stream = stream or ThinkGearStream()
+        self.speed = speed
+        self.chunk_samples = max(1, int(chunk_seconds * self.stream.fs))
+        self.total_samples = None if duration is None else int(duration * self.stream.fs)
+        self.settings = {'rtscts': False}
+        self.written = bytearray()  # Comandos enviados al dongle
+        self.is_open = True
+        self._buffer = b''
+        self._position = 0
+        self._start = None
+        self._lock = threading.Lock()
+
+    def isOpen(self):
+        return self.is_open
+
+    def close(self):
+        self.is_open = False
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def getSettingsDict(self):
+        return dict(self.settings)
+
+    def applySettingsDict(self, settings):
+        self.settings.update(settings)
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer) - self._position
+
+    def _refill(self):
+        if self.total_samples is not None and self.stream.samples >= self.total_samples:
+            raise serial.SerialException('Fin del flujo simulado')
+        n = self.chunk_samples
+        if self.total_samples is not None:
+            n = min(n, self.total_samples - self.stream.samples)
+        if self.speed:
+            if self._start is None:
+                self._start = time.perf_counter()
+            delay = self._start + self.stream.samples / self.stream.fs / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._buffer, _ = self.stream.next_chunk(n)
+        self._position = 0
+        if not self._buffer:
+            raise serial.SerialException('Fin del flujo simulado')
+
+    def read(self, size=1):
+        with self._lock:
+            if not self.is_open:
+                raise serial.SerialException('Puerto simulado cerrado')
+            data = b''
+            while len(data) < size:
+                if self._position >= len(self._buffer):
+                    self._refill()
+                take = min(size - len(data), len(self._buffer) - self._position)
+                data += self._buffer[self._position:self._position + take]
+                self._position += take
+            return data
+
+
+class PtyHeadset:
+    """
+    Casco virtual expuesto como pseudo-terminal (solo POSIX): port es una ruta como /dev/pts/5 que
+    se abre igual que el puerto del dongle, por ejemplo con NeuroSkyInterface(headset.port) o
+    desde otro proceso.
+    """
+
+    def __init__(self, stream=None, speed=1.0, duration=None, chunk_seconds=SIM_CHUNK_SECONDS):
+        import tty
+        self.source = FakeSerialPort(stream, speed, duration, chunk_seconds)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.running = False
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        os.set_blocking(self._master, False)
+        while self.running:
+            try:
+                data = self.source.read(self.source.chunk_samples * 8)
+            except serial.SerialException:
+                break
+            view = memoryview(data)
+            while view and self.running:
+                try:
+                    # Descarta lo que escribe el lector (comandos al dongle)
+                    os.read(self._master, 4096)
+                except (BlockingIOError, OSError):
+                    pass
+                try:
+                    view = view[os.write(self._master, view):]
+                except BlockingIOError:
+                    time.sleep(0.001)
+                except OSError:
+                    self.running = False
+        self.running = False
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,553 @@
+import os
+import json
+import uuid
+import zlib
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+import numpy as np
+from neurosky_mm2_headset.modules.session_chunks import (RAW_VALUE_DTYPE, TIMESTAMP_DTYPE, decode_samples,
+                                                         encode_samples)
+from neurosky_mm2_headset.modules.storage_backends import StorageBackend
+from neurosky_mm2_headset.modules.stream_server import encode_frame, read_frames
+
+UPLINK_HOST = '127.0.0.1'
+UPLINK_PORT = 5332
+DEFAULT_JOURNAL_DIR = 'neurosky_uplink_journal'
+DEFAULT_INGEST_STATE = 'neurosky_ingest_state.json'
+REJECTED_DIR = 'rejected'  # Subdirectorio del journal con los mensajes que el servidor rechazó
+UPLINK_BATCH_SAMPLES = 5120  # Muestras por mensaje (10 s a 512 Hz)
+UPLINK_FLUSH_INTERVAL = 5.0  # [s] Tiempo máximo que una muestra espera antes de enviarse
+UPLINK_MAX_INFLIGHT = 32  # Mensajes enviados sin confirmar antes de esperar un ACK
+RECONNECT_INTERVAL = 2.0  # [s]
+CONNECT_TIMEOUT = 5.0  # [s]
+COMPRESSION_LEVEL = 6
+
+# Tipos de trama (mismo encabezado 0xAA 0xAA, tipo, longitud que el servidor de streaming)
+MSG_HELLO = 16  # Payload: JSON {'edge_id'}
+MSG_START = 17
+MSG_DATA = 18
+MSG_END = 19
+MSG_ACK = 20  # Payload: seq (uint64)
+MSG_REJECT = 21  # Payload: seq (uint64); el servidor no puede aplicar el mensaje y no lo aceptará nunca
+MESSAGE_KINDS = {MSG_START: 'start', MSG_DATA: 'data', MSG_END: 'end'}
+
+SEQ = struct.Struct('<Q')
+HEADER_LENGTH = struct.Struct('<I')
+
+
+def encode_message(msg_type, seq, header, timestamps=None, raw_values=None):
+    """
+    Trama de un mensaje del uplink. El payload es el número de secuencia (uint64) seguido, comprimido
+    con zlib, de la longitud del encabezado JSON (uint32), el encabezado y, en MSG_DATA, las muestras
+    en el formato binario de los chunks (timestamps float64 y valores int16).
+    """
+    body = json.dumps(header).encode()
+    parts = [HEADER_LENGTH.pack(len(body)), body]
+    if timestamps is not None:
+        parts.extend(encode_samples(timestamps, raw_values))
+    return encode_frame(msg_type, SEQ.pack(seq) + zlib.compress(b''.join(parts), COMPRESSION_LEVEL))
+
+
+def decode_message(payload):
+    """:return: (seq, encabezado, (timestamps, raw_values) o None)"""
+    (seq,) = SEQ.unpack_from(payload)
+    body = zlib.decompress(payload[SEQ.size:])
+    (length,) = HEADER_LENGTH.unpack_from(body)
+    header = json.loads(body[HEADER_LENGTH.size:HEADER_LENGTH.size + length])
+    samples = body[HEADER_LENGTH.size + length:]
+    if not samples:
+        return seq, header, None
+    split = header['count'] * TIMESTAMP_DTYPE.itemsize
+    return seq, header, decode_samples(samples[:split], samples[split:split + header['count'] * RAW_VALUE_DTYPE.itemsize])
+
+
+def _time_to_iso(value):
+    return (value or datetime.now(timezone.utc)).isoformat()
+
+
+class UplinkBackend(StorageBackend):
+    """
+    Backend de SessionManager para equipos de campo que envían las sesiones a un IngestServer
+    central por TCP. Las muestras se agrupan en lotes comprimidos y cada mensaje se guarda en un
+    journal local antes de enviarse; se borra solo cuando el servidor confirma (ACK) que lo
+    escribió. Si la conexión se cae, el hilo del uplink reconecta y reenvía todo lo pendiente,
+    también tras reiniciar el programa. Los mensajes que el servidor rechaza (REJECT) se mueven a
+    journal_dir/rejected para no bloquear los siguientes.
+
+    Los métodos de escritura solo encolan en memoria y nunca bloquean la adquisición. Los ids de
+    sesión se generan localmente (uuid), así que start_session funciona sin conexión. Es un backend
+    solo de escritura: las sesiones se leen del almacenamiento central.
+    """
+
+    def __init__(self, host=UPLINK_HOST, port=UPLINK_PORT, journal_dir=DEFAULT_JOURNAL_DIR, edge_id=None,
+                 batch_samples=UPLINK_BATCH_SAMPLES, flush_interval=UPLINK_FLUSH_INTERVAL,
+                 max_inflight=UPLINK_MAX_INFLIGHT, reconnect_interval=RECONNECT_INTERVAL):
+        """
+        :param host: Dirección del IngestServer.
+        :param port: Puerto del IngestServer.
+        :param journal_dir: Directorio del journal de mensajes sin confirmar.
+        :param edge_id: Identificador de este equipo ante el servidor; por defecto se genera uno y se
+                        guarda en el journal.
+        :param batch_samples: Muestras por mensaje.
+        :param flush_interval: Segundos máximos antes de enviar un lote incompleto.
+        :param max_inflight: Mensajes sin confirmar en la conexión antes de esperar ACKs.
+        :param reconnect_interval: Segundos entre intentos de conexión.
+        """
+        self.address = (host, port)
+        self.journal_dir = journal_dir
+        self.batch_samples = batch_samples
+        self.flush_interval = flush_interval
+        self.max_inflight = max_inflight
+        self.reconnect_interval = reconnect_interval
+        self.stats = {'messages': 0, 'samples': 0, 'acked': 0, 'rejected': 0, 'resent': 0, 'connections': 0,
+                      'errors': 0}
+        self.connected = False
+
+        os.makedirs(journal_dir, exist_ok=True)
+        state = self._read_state()
+        self.edge_id = edge_id or state.get('edge_id') or uuid.uuid4().hex
+        self._journal = OrderedDict()  # seq -> ruta, en orden de envío
+        for name in sorted(os.listdir(journal_dir)):
+            if name.endswith('.msg'):
+                self._journal[int(name[:-4])] = os.path.join(journal_dir, name)
+        self._next_seq = max([state.get('next_seq', 1)] + [seq + 1 for seq in self._journal])
+        self._write_state()
+        if self._journal:
+            print(f'Uplink: {len(self._journal)} mensajes pendientes en el journal se reenviarán.')
+
+        self._records = deque()
+        self._pending_samples = 0
+        self._building = False  # Registros sacados de la cola que aún no están en el journal
+        self._condition = threading.Condition()
+        self._sock = None
+        self._sent_upto = 0
+        self._max_sent = 0
+        self._last_connect = 0.0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Interfaz StorageBackend: solo encola
+
+    def _enqueue(self, record, samples=0):
+        with self._condition:
+            self._records.append(record)
+            self._pending_samples += samples
+            if samples == 0 or self._pending_samples >= self.batch_samples:
+                self._condition.notify()
+
+    def start_session(self, user_id, start_time=None):
+        session_id = uuid.uuid4().hex
+        self._enqueue((MSG_START, {'session_id': session_id, 'user_id': user_id,
+                                   'start_time': _time_to_iso(start_time)}))
+        return session_id
+
+    def end_session(self, session_id, end_time=None):
+        self._enqueue((MSG_END, {'session_id': session_id, 'end_time': _time_to_iso(end_time)}))
+
+    def save_arrays(self, session_id, timestamps, raw_values):
+        if len(timestamps) == 0:
+            return True
+        self._enqueue((MSG_DATA, session_id, np.asarray(timestamps, dtype=np.float64), np.asarray(raw_values)),
+                      samples=len(timestamps))
+        return True
+
+    def get_user_sessions(self, user_id):
+        print('El uplink no guarda sesiones localmente; consulta el almacenamiento del servidor de ingesta.')
+        return []
+
+    def get_session_arrays(self, session_id):
+        return None
+
+    def get_session_version(self, session_id):
+        return None
+
+    @property
+    def pending_messages(self):
+        """Mensajes en el journal todavía sin confirmar por el servidor."""
+        with self._condition:
+            return len(self._journal)
+
+    def flush(self, timeout=None):
+        """
+        Envía lo encolado y espera los ACK del servidor.
+        :return: True si no quedó nada pendiente antes de timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._pending_samples = max(self._pending_samples, self.batch_samples)
+            self._condition.notify()
+            while self._records or self._building or self._journal:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        """Intenta vaciar el journal durante timeout segundos; lo que quede se reenvía al reiniciar."""
+        if not self.flush(timeout):
+            print(f'Uplink: quedan {self.pending_messages} mensajes en el journal para el próximo inicio.')
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._disconnect()
+
+    # Journal
+
+    def _read_state(self):
+        try:
+            with open(os.path.join(self.journal_dir, 'uplink.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self):
+        path = os.path.join(self.journal_dir, 'uplink.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'edge_id': self.edge_id, 'next_seq': self._next_seq}, f)
+        os.replace(path + '.tmp', path)
+
+    def _journal_message(self, msg_type, header, timestamps=None, raw_values=None):
+        seq = self._next_seq
+        frame = encode_message(msg_type, seq, header, timestamps, raw_values)
+        path = os.path.join(self.journal_dir, f'{seq:016d}.msg')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(frame)
+        os.replace(path + '.tmp', path)
+        self._next_seq += 1
+        self._write_state()
+        with self._condition:
+            self._journal[seq] = path
+        self.stats['messages'] += 1
+
+    def _build_messages(self, records):
+        """Convierte los registros encolados en mensajes del journal, uniendo lotes de la misma sesión."""
+        batch = []
+
+        def flush_batch():
+            if batch:
+                timestamps = np.concatenate([r[2] for r in batch])
+                raw_values = np.concatenate([r[3] for r in batch])
+                for i in range(0, len(timestamps), self.batch_samples):
+                    count = len(timestamps[i:i + self.batch_samples])
+                    self._journal_message(MSG_DATA, {'session_id': batch[0][1], 'count': count},
+                                          timestamps[i:i + self.batch_samples], raw_values[i:i + self.batch_samples])
+                    self.stats['samples'] += count
+                batch.clear()
+
+        for record in records:
+            try:
+                if record[0] == MSG_DATA:
+                    if batch and batch[0][1] != record[1]:
+                        flush_batch()
+                    batch.append(record)
+                else:
+                    flush_batch()
+                    self._journal_message(*record)
+            except (OSError, ValueError) as e:
+                self.stats['errors'] += 1
+                batch.clear()
+                print(f'Error al escribir en el journal del uplink: {e}')
+        try:
+            flush_batch()
+        except (OSError, ValueError) as e:
+            self.stats['errors'] += 1
+            print(f'Error al escribir en el journal del uplink: {e}')
+
+    # Hilo del uplink
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._condition:
+                if self._running and self._pending_samples < self.batch_samples and not self._has_control_record():
+                    self._condition.wait(max(0.05, min(self.flush_interval - (time.monotonic() - last_flush),
+                                                       self.reconnect_interval)))
+                if not self._running:
+                    break
+                due = (self._pending_samples >= self.batch_samples or self._has_control_record()
+                       or time.monotonic() - last_flush >= self.flush_interval)
+                records = []
+                if due:
+                    records = list(self._records)
+                    self._records.clear()
+                    self._pending_samples = 0
+                    self._building = True
+            if due:
+                last_flush = time.monotonic()
+                self._build_messages(records)
+                with self._condition:
+                    self._building = False
+                    self._condition.notify_all()
+            self._send_pending()
+        with self._condition:
+            records = list(self._records)
+            self._records.clear()
+        self._build_messages(records)
+
+    def _has_control_record(self):
+        return any(record[0] != MSG_DATA for record in self._records)
+
+    def _connect(self):
+        if time.monotonic() - self._last_connect < self.reconnect_interval:
+            return False
+        self._last_connect = time.monotonic()
+        try:
+            sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(encode_frame(MSG_HELLO, json.dumps({'edge_id': self.edge_id}).encode()))
+        except OSError:
+            return False
+        self._sock = sock
+        self._sent_upto = 0
+        self.connected = True
+        self.stats['connections'] += 1
+        threading.Thread(target=self._receive_acks, args=(sock,), daemon=True).start()
+        return True
+
+    def _disconnect(self):
+        sock, self._sock = self._sock, None
+        self.connected = False
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _send_pending(self):
+        with self._condition:
+            if not self._journal:
+                return
+        if self._sock is None and not self._connect():
+            return
+        sock = self._sock
+        with self._condition:
+            to_send = [(seq, path) for seq, path in self._journal.items() if seq > self._sent_upto]
+            inflight = len(self._journal) - len(to_send)
+        for seq, path in to_send[:max(0, self.max_inflight - inflight)]:
+            try:
+                with open(path, 'rb') as f:
+                    frame = f.read()
+                sock.sendall(frame)
+            except FileNotFoundError:
+                continue  # Ya confirmado
+            except OSError:
+                self._disconnect()
+                return
+            if seq <= self._max_sent:
+                self.stats['resent'] += 1
+            self._sent_upto = seq
+            self._max_sent = max(self._max_sent, seq)
+
+    def _receive_acks(self, sock):
+        try:
+            for frame_type, payload in read_frames(sock):
+                if frame_type not in (MSG_ACK, MSG_REJECT):
+                    continue
+                (seq,) = SEQ.unpack(payload)
+                with self._condition:
+                    path = self._journal.pop(seq, None)
+                    self._condition.notify_all()
+                if path is None:
+                    continue
+                if frame_type == MSG_ACK:
+                    self.stats['acked'] += 1
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                else:
+                    self._quarantine(seq, path)
+        except OSError:
+            pass
+        with self._condition:
+            if self._sock is sock:
+                # Se reenvía todo lo no confirmado en la siguiente conexión
+                self._sock = None
+                self.connected = False
+            self._condition.notify_all()
+        sock.close()
+
+    def _quarantine(self, seq, path):
+        """Aparta un mensaje rechazado por el servidor; se conserva para revisarlo o reenviarlo a mano."""
+        self.stats['rejected'] += 1
+        rejected_dir = os.path.join(self.journal_dir, REJECTED_DIR)
+        try:
+            os.makedirs(rejected_dir, exist_ok=True)
+            os.replace(path, os.path.join(rejected_dir, os.path.basename(path)))
+        except OSError as e:
+            print(f'Error al apartar el mensaje rechazado {seq}: {e}')
+            return
+        print(f'El servidor rechazó el mensaje {seq}; se movió a {rejected_dir}.')
+
+
+class IngestServer:
+    """
+    Servidor central que recibe los mensajes de varios UplinkBackend y los escribe en un
+    StorageBackend (SQLite, archivos o MongoDB). Las muestras llegan como arreglos y se guardan con
+    save_arrays, sin pasar por diccionarios por muestra. Cada mensaje se confirma con un ACK solo
+    después de escribirse; los reenvíos se reconocen por el número de secuencia de cada equipo y
+    no se duplican. Si falla la escritura se cierra la conexión sin ACK para que el equipo reenvíe
+    desde ese mensaje. Los mensajes de una sesión cuyo inicio no se conoce (por ejemplo, si se
+    perdió state_path) nunca podrán aplicarse: se responden con REJECT y se cuentan en
+    stats['rejected'], y el equipo los aparta sin detener el resto del envío.
+    """
+
+    def __init__(self, storage, host=UPLINK_HOST, port=UPLINK_PORT, state_path=DEFAULT_INGEST_STATE):
+        """
+        :param storage: StorageBackend donde se escriben las sesiones.
+        :param host: Dirección de escucha.
+        :param port: Puerto de escucha (0 elige uno libre; ver address).
+        :param state_path: Archivo JSON donde se guardan las secuencias aplicadas y los ids de sesión,
+                           para no duplicar datos tras reiniciar el servidor. Con None el estado
+                           solo vive en memoria y, tras reiniciar, los mensajes de las sesiones ya
+                           iniciadas se rechazan.
+        """
+        self.storage = storage
+        self.state_path = state_path
+        self.stats = {'messages': 0, 'samples': 0, 'duplicates': 0, 'rejected': 0, 'errors': 0, 'connections': 0}
+        self._lock = threading.Lock()
+        self._applied = {}  # edge_id -> última secuencia aplicada
+        self._sessions = {}  # id de sesión del equipo -> id en el almacenamiento
+        self._load_state()
+        self._listener = socket.create_server((host, port))
+        self.address = self._listener.getsockname()
+        self._connections = set()
+        self._running = False
+        self._thread = None
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Error al leer el estado del servidor de ingesta: {e}')
+            return
+        self._applied = state.get('applied', {})
+        self._sessions = {key: self._decode_id(value) for key, value in state.get('sessions', {}).items()}
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        state = {'applied': self._applied,
+                 'sessions': {key: self._encode_id(value) for key, value in self._sessions.items()}}
+        try:
+            with open(self.state_path + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.replace(self.state_path + '.tmp', self.state_path)
+        except OSError as e:
+            print(f'Error al guardar el estado del servidor de ingesta: {e}')
+
+    @staticmethod
+    def _encode_id(session_id):
+        # SQLite usa enteros y el backend de archivos cadenas; MongoDB usa ObjectId
+        return session_id if isinstance(session_id, (int, str)) else {'oid': str(session_id)}
+
+    @staticmethod
+    def _decode_id(value):
+        if isinstance(value, dict):
+            from bson import ObjectId
+            return ObjectId(value['oid'])
+        return value
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for sock in list(self._connections):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                break
+            self.stats['connections'] += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        self._connections.add(sock)
+        edge_id = None
+        try:
+            for frame_type, payload in read_frames(sock):
+                if frame_type == MSG_HELLO:
+                    edge_id = json.loads(payload)['edge_id']
+                    continue
+                if frame_type not in MESSAGE_KINDS or edge_id is None:
+                    continue
+                seq, header, samples = decode_message(payload)
+                reply = self._apply(edge_id, frame_type, seq, header, samples)
+                if reply is None:
+                    break
+                sock.sendall(encode_frame(reply, SEQ.pack(seq)))
+        except (OSError, ValueError, KeyError, zlib.error) as e:
+            self.stats['errors'] += 1
+            print(f'Error en la conexión del uplink {edge_id}: {e}')
+        self._connections.discard(sock)
+        sock.close()
+
+    def _apply(self, edge_id, msg_type, seq, header, samples):
+        """
+        Escribe un mensaje en el almacenamiento.
+        :return: MSG_ACK si se aplicó (o ya estaba aplicado), MSG_REJECT si no podrá aplicarse nunca, o
+                 None si falló la escritura y hay que cortar la conexión para que el equipo reenvíe.
+        """
+        with self._lock:
+            if seq <= self._applied.get(edge_id, 0):
+                self.stats['duplicates'] += 1
+                return MSG_ACK
+            key = f"{edge_id}:{header['session_id']}"
+            if msg_type == MSG_START:
+                session_id = self.storage.start_session(header['user_id'],
+                                                        datetime.fromisoformat(header['start_time']))
+                ok = session_id is not None
+                if ok:
+                    self._sessions[key] = session_id
+            elif key not in self._sessions:
+                # Sesión iniciada antes de un reinicio sin estado: reenviarla no sirve de nada
+                self.stats['rejected'] += 1
+                print(f'Sesión desconocida del uplink {edge_id}: {header["session_id"]}; '
+                      f'se rechaza el mensaje {seq}.')
+                return MSG_REJECT
+            elif msg_type == MSG_DATA:
+                ok = self.storage.save_arrays(self._sessions[key], *samples) is not False
+                if ok:
+                    self.stats['samples'] += len(samples[0])
+            else:
+                self.storage.end_session(self._sessions.pop(key), datetime.fromisoformat(header['end_time']))
+                ok = True
+            if not ok:
+                self.stats['errors'] += 1
+                print(f'No se pudo escribir el mensaje {seq} del uplink {edge_id}; se esperará el reenvío.')
+                return None
+            self._applied[edge_id] = seq
+            self.stats['messages'] += 1
+            self._save_state()
+            return MSG_ACK
@@ -0,0 +1,27 @@
+import os
+import sys
+from unittest import mock
+import pytest
+
+# El repositorio es el propio paquete neurosky_mm2_headset: se importa desde el directorio que lo contiene
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+@pytest.fixture
+def mongo_manager():
+    """MongoDBManager sobre mongomock; se omite la prueba si mongomock no está instalado."""
+    mongomock = pytest.importorskip('mongomock')
+    from neurosky_mm2_headset.modules import db_manager
+    with mock.patch.object(db_manager, 'MongoClient', mongomock.MongoClient):
+        yield db_manager.MongoDBManager()
+
+
+@pytest.fixture(params=['sqlite', 'files', 'mongo'])
+def backend(request, tmp_path):
+    """Cada StorageBackend que puede recibir sesiones importadas."""
+    if request.param == 'mongo':
+        return request.getfixturevalue('mongo_manager')
+    from neurosky_mm2_headset.modules.storage_backends import open_storage_backend
+    storage = open_storage_backend(request.param, path=str(tmp_path / 'sessions'))
+    request.addfinalizer(storage.close)
+    return storage
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from neurosky_mm2_headset.modules.csv_importer import CollectorCSVImporter
+from neurosky_mm2_headset.modules.storage_backends import SQLiteStorageBackend
+
+
+def write_csv(path, signal, rows):
+    with open(path, 'w') as f:
+        f.write(f'Timestamp,{signal}\n')
+        for timestamp, value in rows:
+            f.write(f'{timestamp},{value}\n')
+    return str(path)
+
+
+@pytest.mark.parametrize('signal', ['Attention', 'Low-alpha'])
+def test_non_raw_csv_is_rejected_without_creating_a_session(backend, tmp_path, signal):
+    csv_file = write_csv(tmp_path / 'signal.csv', signal, [(1.0, 50), (2.0, 60)])
+
+    result = CollectorCSVImporter(backend).import_file(csv_file, 'user')
+
+    assert not result['ok']
+    assert result['session_id'] is None
+    assert list(backend.get_user_sessions('user')) == []
+
+
+def test_raw_csv_round_trip(backend, tmp_path):
+    timestamps = 1000.0 + np.arange(5) / 512
+    values = [10, -20, 30, -2048, 2047]
+    csv_file = write_csv(tmp_path / 'raw.csv', 'Raw', zip(timestamps.tolist(), values))
+
+    result = CollectorCSVImporter(backend, batch_size=2).import_file(csv_file, 'user')
+
+    assert result['ok'] and result['rows'] == 5
+    arrays = backend.get_session_arrays(result['session_id'])
+    np.testing.assert_array_equal(arrays.timestamps, timestamps)
+    np.testing.assert_array_equal(arrays.raw_values, values)
+    sessions = list(backend.get_user_sessions('user'))
+    assert len(sessions) == 1 and sessions[0]['end_time'] is not None
+
+
+class FailingBackend(SQLiteStorageBackend):
+    def save_arrays(self, session_id, timestamps, raw_values):
+        if self.calls:
+            raise RuntimeError('fallo de escritura')
+        self.calls += 1
+        return super().save_arrays(session_id, timestamps, raw_values)
+
+
+def test_session_is_closed_when_a_write_raises(tmp_path):
+    storage = FailingBackend(str(tmp_path / 'sessions.db'))
+    storage.calls = 0
+    csv_file = write_csv(tmp_path / 'raw.csv', 'Raw', [(1.0, 1), (2.0, 2), (3.0, 3)])
+
+    with pytest.raises(RuntimeError):
+        CollectorCSVImporter(storage, batch_size=2).import_file(csv_file, 'user')
+
+    (session,) = storage.get_user_sessions('user')
+    assert session['end_time'] is not None
+    assert session['sample_count'] == 2
+    storage.close()
@@ -0,0 +1,35 @@
+import numpy as np
+from neurosky_mm2_headset.modules.resampling import UniformResampler
+
+FS = 512.0
+
+
+def test_saturated_stretch_is_kept():
+    timestamps = np.arange(0, 2, 1 / FS)
+    values = np.round(100 * np.sin(2 * np.pi * 5 * timestamps))
+    values[300:700] = 2047  # Más largo que MAX_GAP_SECONDS
+
+    resampler = UniformResampler(FS)
+    _, resampled = resampler.process(timestamps, values)
+
+    assert resampler.stats['gap_points'] == 0
+    np.testing.assert_allclose(resampled, values[:len(resampled)])
+
+
+def test_repeated_reads_are_dropped_in_any_block_size():
+    timestamps = np.arange(0, 1, 1 / FS)
+    values = np.arange(timestamps.size, dtype=np.float64)
+    # Cada 7 muestras, la misma muestra leída dos veces por el sondeo
+    reads = np.r_[timestamps, timestamps[::7] + 0.3 / FS]
+    order = np.argsort(reads, kind='stable')
+    read_values = np.r_[values, values[::7]][order]
+    reads = reads[order]
+
+    outputs = []
+    for block in (reads.size, 100):
+        resampler = UniformResampler(FS)
+        outputs.append(np.concatenate([resampler.process(reads[i:i + block], read_values[i:i + block])[1]
+                                       for i in range(0, reads.size, block)]))
+        assert resampler.stats['duplicates'] == values[::7].size
+    np.testing.assert_allclose(outputs[0], values[:outputs[0].size])
+    np.testing.assert_array_equal(outputs[0], outputs[1])
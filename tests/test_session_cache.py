@@ -0,0 +1,35 @@
+import os
+from unittest import mock
+import numpy as np
+from neurosky_mm2_headset.modules.session_cache import SessionDataCache
+from neurosky_mm2_headset.modules.storage_backends import SQLiteStorageBackend
+
+SAMPLES = 10000
+
+
+def test_undeletable_files_count_toward_the_disk_limit(tmp_path):
+    storage = SQLiteStorageBackend(str(tmp_path / 'sessions.db'))
+    session_ids = []
+    for _ in range(3):
+        session_id = storage.start_session('user')
+        storage.save_arrays(session_id, np.arange(float(SAMPLES)), np.zeros(SAMPLES, dtype=np.int16))
+        storage.end_session(session_id)
+        session_ids.append(session_id)
+    cache = SessionDataCache(storage, str(tmp_path / 'cache'), max_disk_bytes=250000)
+    remove = os.remove
+
+    def locked_remove(path):
+        # Como en Windows con el archivo todavía mapeado en memoria
+        if os.path.basename(path).startswith(f'{session_ids[0]}-'):
+            raise PermissionError(13, 'Archivo en uso', path)
+        remove(path)
+
+    with mock.patch('os.remove', locked_remove):
+        for session_id in session_ids:
+            cache.get_session_arrays(session_id)
+        info = cache.cache_info()
+    assert info['pending_deletes'] == 2 and info['delete_failures'] == 2
+    assert info['disk_bytes'] + info['pending_bytes'] <= cache.max_disk_bytes
+
+    cache.close()
+    assert not [name for name in os.listdir(tmp_path / 'cache') if name.startswith(f'{session_ids[0]}-')]
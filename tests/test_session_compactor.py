@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+import numpy as np
+from neurosky_mm2_headset.modules.session_compactor import SessionCompactor
+
+
+def test_append_after_compaction(mongo_manager):
+    now = datetime.now(timezone.utc)
+    session_id = mongo_manager.sessions.insert_one({
+        'user_id': 'user', 'start_time': now, 'end_time': now,
+        'data': [{'timestamp': float(i), 'raw_value': i} for i in range(2500)],
+    }).inserted_id
+
+    assert SessionCompactor(mongo_manager, chunk_samples=1000, max_samples_per_second=None,
+                            session_pause=0).compact_session(session_id)
+    assert mongo_manager.save_arrays(session_id, np.array([3000.0, 3001.0]), np.array([7, 8]))
+
+    arrays = mongo_manager.get_session_arrays(session_id)
+    np.testing.assert_array_equal(arrays.timestamps, np.r_[np.arange(2500.0), 3000.0, 3001.0])
+    np.testing.assert_array_equal(arrays.raw_values[-3:], [2499, 7, 8])
+    seqs = sorted(chunk['seq'] for chunk in mongo_manager.chunks.find({'session_id': session_id}))
+    assert seqs == [0, 1, 2, 3]
@@ -0,0 +1,45 @@
+import os
+from neurosky_mm2_headset.modules.storage_backends import SQLiteStorageBackend
+from neurosky_mm2_headset.modules.uplink import REJECTED_DIR, IngestServer, UplinkBackend
+
+FLUSH_TIMEOUT = 10.0  # [s]
+
+
+def test_restart_with_lost_server_state(tmp_path):
+    storage = SQLiteStorageBackend(str(tmp_path / 'central.db'))
+    state_path = str(tmp_path / 'ingest_state.json')
+    server = IngestServer(storage, port=0, state_path=state_path)
+    server.start()
+    port = server.address[1]
+    journal_dir = str(tmp_path / 'journal')
+    uplink = UplinkBackend(port=port, journal_dir=journal_dir, reconnect_interval=0.1, flush_interval=0.1)
+    try:
+        first = uplink.start_session('user')
+        uplink.save_arrays(first, [1.0, 2.0], [3, 4])
+        assert uplink.flush(FLUSH_TIMEOUT)
+
+        # El servidor se reinicia sin su archivo de estado: ya no conoce la sesión abierta
+        server.stop()
+        os.remove(state_path)
+        server = IngestServer(storage, port=port, state_path=state_path)
+        server.start()
+
+        uplink.save_arrays(first, [5.0], [6])
+        uplink.end_session(first)
+        second = uplink.start_session('user')
+        uplink.save_arrays(second, [7.0, 8.0], [1, 2])
+        uplink.end_session(second)
+
+        # Los mensajes huérfanos se apartan y no bloquean la sesión siguiente
+        assert uplink.flush(FLUSH_TIMEOUT)
+        assert uplink.pending_messages == 0
+        assert uplink.stats['rejected'] == 2 and server.stats['rejected'] == 2
+        assert len(os.listdir(os.path.join(journal_dir, REJECTED_DIR))) == 2
+        sessions = storage.get_user_sessions('user')
+        assert len(sessions) == 2
+        assert storage.get_session_arrays(sessions[1]['_id']).timestamps.tolist() == [7.0, 8.0]
+        assert sessions[1]['end_time'] is not None
+    finally:
+        uplink.close()
+        server.stop()
+        storage.close()